@@ -96,6 +96,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'main.context_processors.notifications',
             ],
         },
     },
@@ -214,6 +215,10 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@aime-rdc.org')
+# Délai maximal d'une opération SMTP (worker send_outbox, voir main/outbox.py)
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+# Destinataire des alertes du site (chat, avis visiteurs)
+CONTACT_EMAIL = config('CONTACT_EMAIL', default='contact@aime-rdc.org')
 
 # ==============================================================================
 # AUTHENTICATION
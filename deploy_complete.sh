@@ -20,6 +20,7 @@ NC='\033[0m' # No Color
 DEPLOY_PATH="/home/aime/public_html"
 PYTHON_CMD="python3.9"
 BACKUP_DIR="/home/aime/backups"
+LOG_DIR="/home/aime/logs"
 TIMESTAMP=$(date +%Y%m%d_%H%M%S)
 
 # ========================================================================
@@ -171,10 +172,23 @@ chmod 755 "$DEPLOY_PATH/tmp"
 print_success "Permissions configurées"
 
 # ========================================================================
-# 8. PASSENGER RESTART
+# 8. TÂCHES PLANIFIÉES (CRON)
 # ========================================================================
 
-print_header "ETAPE 8: Redémarrage Passenger"
+print_header "ETAPE 8: Tâches planifiées (cron)"
+
+# Les emails (outbox) ne partent que si send_outbox tourne : chaque minute,
+# sans doublon si le script est relancé
+mkdir -p "$LOG_DIR"
+OUTBOX_CRON="* * * * * cd $DEPLOY_PATH && $(command -v $PYTHON_CMD) manage.py send_outbox --settings=aimesite.production_settings >> $LOG_DIR/send_outbox.log 2>&1"
+( crontab -l 2>/dev/null | grep -v "manage.py send_outbox" ; echo "$OUTBOX_CRON" ) | crontab -
+print_success "Cron send_outbox installé (chaque minute)"
+
+# ========================================================================
+# 9. PASSENGER RESTART
+# ========================================================================
+
+print_header "ETAPE 9: Redémarrage Passenger"
 
 touch "$DEPLOY_PATH/tmp/restart.txt"
 print_success "Fichier de redémarrage créé"
@@ -182,10 +196,10 @@ print_info "Le serveur Passenger se redémarrera automatiquement..."
 sleep 2
 
 # ========================================================================
-# 9. VALIDATION POST-DEPLOY
+# 10. VALIDATION POST-DEPLOY
 # ========================================================================
 
-print_header "ETAPE 9: Validation post-déploiement"
+print_header "ETAPE 10: Validation post-déploiement"
 
 # Vérifier que le site est accessible
 DOMAIN=$(grep "^ALLOWED_HOSTS=" "$DEPLOY_PATH/.env" | cut -d= -f2 | awk -F, '{print $1}')
@@ -201,7 +215,7 @@ else
 fi
 
 # ========================================================================
-# 10. RAPPORT FINAL
+# 11. RAPPORT FINAL
 # ========================================================================
 
 print_header "DÉPLOIEMENT TERMINÉ!"
@@ -216,6 +230,7 @@ ${BLUE}Informations${NC}:
   • Répertoire: $DEPLOY_PATH
   • Backup BD: $BACKUP_DIR/db_backup_$TIMESTAMP.sql
   • Static files: $DEPLOY_PATH/staticfiles
+  • Cron emails: send_outbox chaque minute ($LOG_DIR/send_outbox.log)
 
 ${BLUE}Prochaines étapes${NC}:
   1. Vérifier https://aime-rdc.org
@@ -0,0 +1,169 @@
+"""
+Journal des activités utilisateur : table vive et archives mensuelles
+
+- UserActivity ne garde que les mois récents ; la commande archive_activities
+  déplace les lignes plus anciennes dans UserActivityArchive, une ligne par
+  utilisateur et par mois (liste JSON compressée par zlib), par tranches
+  (mémoire bornée, une transaction par tranche) ;
+- ActivityHistoryPaginator lit les deux sources comme une seule liste
+  triée par (timestamp, id) décroissants : le dashboard ne voit pas la
+  différence entre une activité vive et une activité archivée.
+
+Les ids d'origine sont conservés dans l'archive : les curseurs restent
+valides après un archivage.
+"""
+import datetime
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserActivity, UserActivityArchive
+from .pagination import CursorPaginator
+
+ARCHIVE_CHUNK_SIZE = 5000
+ACTIVITY_TYPE_LABELS = dict(UserActivity.ACTIVITY_TYPES)
+
+
+class ArchivedActivity:
+    """Activité lue dans une archive, avec les attributs utilisés par les gabarits"""
+    is_archived = True
+
+    def __init__(self, id, user_id, activity_type, description, timestamp):
+        self.id = self.pk = id
+        self.user_id = user_id
+        self.activity_type = activity_type
+        self.description = description
+        self.timestamp = timestamp
+
+    def get_activity_type_display(self):
+        return ACTIVITY_TYPE_LABELS.get(self.activity_type, self.activity_type)
+
+
+# --- Format des archives : [[id, type, description, timestamp ISO], ...] trié du plus récent au plus ancien ---
+def pack_activities(rows):
+    rows = sorted(rows, key=lambda row: (datetime.datetime.fromisoformat(row[3]), row[0]), reverse=True)
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode(), 6)
+
+
+def unpack_activities(data):
+    return json.loads(zlib.decompress(bytes(data)).decode())
+
+
+def month_start(value):
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return datetime.date(value.year, value.month, 1)
+
+
+def archive_cutoff(months, now=None):
+    """Début du mois situé months mois avant le mois courant"""
+    current = month_start(now or timezone.now())
+    index = current.year * 12 + current.month - 1 - months
+    start = datetime.datetime(index // 12, index % 12 + 1, 1)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def _store_buckets(buckets):
+    """Écrit les archives {(user_id, mois): lignes}, en fusionnant avec celles qui existent"""
+    user_ids = {user_id for user_id, _ in buckets}
+    months = {month for _, month in buckets}
+    existing = {
+        (archive.user_id, archive.month): archive
+        for archive in UserActivityArchive.objects.filter(user_id__in=user_ids, month__in=months)
+    }
+    created, updated = [], []
+    for key, rows in buckets.items():
+        archive = existing.get(key)
+        if archive is None:
+            created.append(UserActivityArchive(
+                user_id=key[0], month=key[1], activity_count=len(rows), data=pack_activities(rows),
+            ))
+        else:
+            # Tranche à cheval sur un mois déjà archivé, ou lignes arrivées en retard
+            rows = unpack_activities(archive.data) + rows
+            archive.data = pack_activities(rows)
+            archive.activity_count = len(rows)
+            archive.updated_at = timezone.now()
+            updated.append(archive)
+    UserActivityArchive.objects.bulk_create(created)
+    UserActivityArchive.objects.bulk_update(updated, ['data', 'activity_count', 'updated_at'])
+
+
+def archive_activities(months=12, chunk_size=ARCHIVE_CHUNK_SIZE, dry_run=False):
+    """
+    Déplace vers UserActivityArchive les activités antérieures au début du
+    mois situé months mois en arrière. Générateur : produit le nombre de
+    lignes traitées par tranche (en dry_run : le nombre de lignes à archiver).
+    """
+    cutoff = archive_cutoff(months)
+    if dry_run:
+        yield UserActivity.objects.filter(timestamp__lt=cutoff).count()
+        return
+
+    last_user_id = 0
+    while True:
+        # Parcours dans l'ordre de l'index (user, -timestamp, -id) ; les lignes
+        # archivées sont supprimées, la reprise se fait depuis le dernier utilisateur
+        rows = list(
+            UserActivity.objects.filter(timestamp__lt=cutoff, user_id__gte=last_user_id)
+            .order_by('user_id', '-timestamp', '-id')
+            .values_list('id', 'user_id', 'activity_type', 'description', 'timestamp')[:chunk_size]
+        )
+        if not rows:
+            return
+        buckets = {}
+        for activity_id, user_id, activity_type, description, timestamp in rows:
+            buckets.setdefault((user_id, month_start(timestamp)), []).append(
+                [activity_id, activity_type, description, timestamp.isoformat()]
+            )
+        with transaction.atomic():
+            _store_buckets(buckets)
+            UserActivity.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        last_user_id = rows[-1][1]
+        yield len(rows)
+
+
+class ActivityHistoryPaginator(CursorPaginator):
+    """Pagination par curseur sur les activités vives et archivées d'un utilisateur"""
+
+    def __init__(self, user, activity_type=None, per_page=20):
+        queryset = UserActivity.objects.filter(user=user)
+        if activity_type:
+            queryset = queryset.filter(activity_type=activity_type)
+        super().__init__(queryset, ordering=('-timestamp', '-id'), per_page=per_page)
+        self.user = user
+        self.activity_type = activity_type
+
+    def _archived_rows(self, values, direction, limit):
+        forward = direction != 'previous'
+        archives = UserActivityArchive.objects.filter(user=self.user)
+        if values is not None:
+            bound = month_start(values[0])
+            archives = archives.filter(month__lte=bound) if forward else archives.filter(month__gte=bound)
+        archives = archives.order_by('-month' if forward else 'month').values_list('data', flat=True)
+
+        position = (values[0], values[1]) if values is not None else None
+        found = []
+        # Les mois sont disjoints : on s'arrête dès que limit lignes sont réunies
+        for data in archives.iterator(chunk_size=4):
+            rows = []
+            for activity_id, activity_type, description, timestamp in unpack_activities(data):
+                if self.activity_type and activity_type != self.activity_type:
+                    continue
+                key = (datetime.datetime.fromisoformat(timestamp), activity_id)
+                if position is not None and (key >= position if forward else key <= position):
+                    continue
+                rows.append(ArchivedActivity(activity_id, self.user.pk, activity_type, description, key[0]))
+            if not forward:
+                rows.reverse()
+            found.extend(rows)
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+    def fetch_rows(self, values, direction, limit):
+        rows = super().fetch_rows(values, direction, limit) + self._archived_rows(values, direction, limit)
+        rows.sort(key=lambda row: (row.timestamp, row.id), reverse=direction != 'previous')
+        return rows[:limit]
@@ -1,15 +1,24 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
 from .models import (
     UserProfile, Category, Project, MutotoBikeChallenge, MBCParticipant,
     MutoScienceAdventure, Event, Donation, ContactMessage, 
-    NewsletterSubscription, UserActivity, Staff, VisitorFeedback, DailyInformation
+    NewsletterSubscription, UserActivity, Staff, VisitorFeedback, DailyInformation, UserBadge,
+    OutboundEmail
 )
+from .utils import invalidate_page_cache
+from .notifications import notify_many
+from .outbox import BACKLOG_WARNING_DELAY, backlog
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'role', 'phone', 'is_active_member', 'points']
     list_filter = ['role', 'is_active_member']
     search_fields = ['user__username', 'user__email', 'phone']
+    # Modifiés seulement par gamification.award() (voir UserProfile.COUNTER_FIELDS)
+    readonly_fields = ['points', 'level', 'unread_notifications']
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -18,10 +27,12 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ['name', 'status', 'start_date', 'raised_amount', 'goal_amount']
+    list_display = ['name', 'status', 'start_date', 'raised_amount', 'goal_amount', 'donor_count']
     list_filter = ['status', 'category']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
+    # Tenus à jour par les dons (voir reconcile_project_totals)
+    readonly_fields = ['raised_amount', 'donor_count']
 
 @admin.register(MutotoBikeChallenge)
 class MutotoBikeChallengeAdmin(admin.ModelAdmin):
@@ -47,6 +58,20 @@ class EventAdmin(admin.ModelAdmin):
     list_filter = ['event_type', 'is_active']
     search_fields = ['title', 'description']
     prepopulated_fields = {'slug': ('title',)}
+    actions = ['announce_to_members']
+    
+    def announce_to_members(self, request, queryset):
+        members = User.objects.filter(is_active=True)
+        for event in queryset:
+            notify_many(members, 'event_announcement', {
+                'event_id': event.pk,
+                'event': event.title,
+                'date': timezone.localtime(event.date).strftime('%d/%m/%Y %H:%M'),
+                'location': event.location,
+                'url': request.build_absolute_uri(reverse('main:event_detail', args=[event.slug])),
+            }, background=True)
+        self.message_user(request, f"Annonce de {queryset.count()} événement(s) en cours d'envoi aux membres.")
+    announce_to_members.short_description = "Annoncer aux membres (notification)"
 
 @admin.register(Donation)
 class DonationAdmin(admin.ModelAdmin):
@@ -65,6 +90,13 @@ class NewsletterSubscriptionAdmin(admin.ModelAdmin):
     list_display = ['email', 'is_active', 'subscribed_at']
     list_filter = ['is_active']
 
+@admin.register(UserBadge)
+class UserBadgeAdmin(admin.ModelAdmin):
+    list_display = ['user', 'code', 'awarded_at']
+    list_filter = ['code']
+    search_fields = ['user__username', 'user__email']
+    raw_id_fields = ['user']
+
 @admin.register(UserActivity)
 class UserActivityAdmin(admin.ModelAdmin):
     list_display = ['user', 'activity_type', 'description', 'timestamp']
@@ -136,11 +168,13 @@ class DailyInformationAdmin(admin.ModelAdmin):
     
     def publish_articles(self, request, queryset):
         updated = queryset.update(is_published=True)
+        invalidate_page_cache('daily_information')  # update() ne déclenche pas les signaux
         self.message_user(request, f"{updated} article(s) publié(s).")
     publish_articles.short_description = "Publier les articles sélectionnés"
     
     def unpublish_articles(self, request, queryset):
         updated = queryset.update(is_published=False)
+        invalidate_page_cache('daily_information')  # update() ne déclenche pas les signaux
         self.message_user(request, f"{updated} article(s) dépublié(s).")
     unpublish_articles.short_description = "Dépublier les articles sélectionnés"
     
@@ -151,3 +185,34 @@ class DailyInformationAdmin(admin.ModelAdmin):
         self.message_user(request, f"{queryset.count()} article(s) mis à jour.")
     toggle_featured.short_description = "Basculer l'épinglage des articles"
 
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'to']
+    readonly_fields = ['attempts', 'claim_token', 'claimed_at', 'last_error', 'created_at', 'sent_at']
+    date_hierarchy = 'created_at'
+    
+    actions = ['requeue']
+    
+    def requeue(self, request, queryset):
+        # Les emails en échec définitif repartent pour MAX_ATTEMPTS tentatives (voir outbox.py)
+        updated = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), claim_token='', last_error=''
+        )
+        self.message_user(request, f"{updated} email(s) remis en file d'envoi.")
+    requeue.short_description = "Remettre en file d'envoi"
+    
+    def changelist_view(self, request, extra_context=None):
+        # La file n'est vidée que par le cron send_outbox : un retard signale un cron arrêté
+        waiting, delay = backlog()
+        if delay is not None and delay > BACKLOG_WARNING_DELAY:
+            self.message_user(
+                request,
+                f"{waiting} email(s) en attente d'envoi, le plus ancien depuis "
+                f"{int(delay.total_seconds() // 60)} min : vérifier le cron send_outbox.",
+                messages.WARNING,
+            )
+        return super().changelist_view(request, extra_context)
@@ -3,7 +3,9 @@ from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.contrib.auth.models import User
-from .models import UserProfile, UserActivity, UserNotification
+from .models import UserProfile, UserActivity
+from .gamification import award
+from .notifications import notify
 
 class SignUpForm(UserCreationForm):
     class Meta:
@@ -40,7 +42,7 @@ def signup_view(request):
             )
             
             # Ajouter badge de bienvenue
-            profile.add_badge('new_member')
+            award(user, badges=['new_member'])
             
             # Enregistrer l'activité
             UserActivity.objects.create(
@@ -49,13 +51,8 @@ def signup_view(request):
                 description='Inscription sur la plateforme AIME'
             )
             
-            # Notification de bienvenue
-            UserNotification.objects.create(
-                user=user,
-                title='Bienvenue chez AIME !',
-                message='Merci de rejoindre notre communauté. Découvrez votre tableau de bord et nos projets.',
-                notification_type='success'
-            )
+            # Notification de bienvenue (déjà envoyée par le signal : dédupliquée)
+            notify(user, 'welcome', {'name': user.first_name or user.username})
             
             # Connexion automatique
             login(request, user)
@@ -0,0 +1,393 @@
+"""
+Sauvegarde de la base en flux (commande backup_database)
+
+Une sauvegarde est un répertoire backups/backup_<horodatage>/ :
+- un fichier <app>.<modèle>.jsonl.gz par modèle : une ligne JSON par objet,
+  au format du sérialiseur jsonl de Django (lisible par loaddata), écrite
+  dans gzip au fil de la lecture ;
+- manifest.json : modèles dans l'ordre des dépendances (ordre de
+  restauration), nombre de lignes, taille et sha256 de chaque fichier.
+
+Les lignes sont lues par lots de chunk_size en pagination par clé primaire
+(WHERE pk > dernier ORDER BY pk LIMIT n) : la mémoire reste constante quelle
+que soit la taille des tables. QuerySet.iterator() ne suffit pas sous MySQL,
+dont le pilote charge tout le résultat en mémoire.
+
+Avec jobs=1, toutes les tables sont lues dans une transaction (instantané
+cohérent sous MySQL InnoDB et SQLite). Avec jobs>1, chaque table est écrite
+par un processus d'un pool : plus rapide, mais sans instantané commun.
+
+Le répertoire est écrit sous le nom backup_<horodatage>.partial puis renommé :
+une sauvegarde interrompue n'est jamais prise pour une sauvegarde complète.
+
+restore_backup relit chaque fichier en flux (une ligne à la fois, insertion
+par lots) : la mémoire reste constante à la restauration aussi.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import django
+from django.apps import apps
+from django.core import serializers
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.core.serializers import jsonl, python
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.utils import timezone
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 2000
+MANIFEST_NAME = 'manifest.json'
+PARTIAL_SUFFIX = '.partial'
+FILE_SUFFIX = '.jsonl.gz'
+COMPRESS_LEVEL = 6
+
+# Tables recréées par migrate (avec d'autres id) : non sauvegardées,
+# référencées par clé naturelle, comme dumpdata --natural-foreign
+EXCLUDED_MODELS = {'contenttypes.ContentType', 'auth.Permission'}
+
+# Signaux débranchés pendant une restauration (receivers de l'application seulement)
+MODEL_SIGNALS = (pre_save, post_save, pre_delete, post_delete, m2m_changed)
+
+
+class BackupSerializer(jsonl.Serializer):
+    """Sérialiseur jsonl : clés naturelles seulement vers les tables exclues, id partout ailleurs"""
+
+    def _natural(self, field):
+        return field.remote_field.model._meta.label in EXCLUDED_MODELS
+
+    def handle_fk_field(self, obj, field):
+        self.use_natural_foreign_keys = self._natural(field)
+        super().handle_fk_field(obj, field)
+
+    def handle_m2m_field(self, obj, field):
+        self.use_natural_foreign_keys = self._natural(field)
+        super().handle_m2m_field(obj, field)
+
+
+class HashingWriter:
+    """Fichier en écriture qui calcule le sha256 et la taille de ce qui y passe"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+def backup_models():
+    """Modèles sauvegardés, dans l'ordre des dépendances (comme dumpdata)"""
+    app_list = [(config, None) for config in apps.get_app_configs() if config.models_module is not None]
+    return [
+        model for model in serializers.sort_dependencies(app_list, allow_cycles=True)
+        if not model._meta.proxy and model._meta.label not in EXCLUDED_MODELS
+    ]
+
+
+def model_filename(label):
+    return f'{label.lower()}{FILE_SUFFIX}'
+
+
+def _chunks(model, chunk_size):
+    """Objets du modèle par lots, en pagination par clé primaire"""
+    queryset = model._base_manager.order_by('pk')
+    # Relations vers les tables exclues : chargées avec l'objet (clé naturelle sans requête par ligne)
+    natural_fks = [
+        field.name for field in model._meta.concrete_fields
+        if field.is_relation and field.remote_field.model._meta.label in EXCLUDED_MODELS
+    ]
+    if natural_fks:
+        queryset = queryset.select_related(*natural_fks)
+    for field in model._meta.many_to_many:
+        if not field.remote_field.through._meta.auto_created:
+            continue
+        if field.remote_field.model._meta.label == 'auth.Permission':
+            queryset = queryset.prefetch_related(f'{field.name}__content_type')
+        else:
+            queryset = queryset.prefetch_related(field.name)
+
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1].pk
+
+
+def dump_model(label, directory, chunk_size=CHUNK_SIZE):
+    """Écrit un modèle dans directory ; retourne son entrée de manifeste"""
+    started = time.perf_counter()
+    model = apps.get_model(label)
+    filename = model_filename(label)
+    rows = 0
+    serializer = BackupSerializer()
+    with open(os.path.join(directory, filename), 'wb') as raw:
+        writer = HashingWriter(raw)
+        # mtime=0 : fichier identique pour des données identiques
+        compressed = gzip.GzipFile(fileobj=writer, mode='wb', compresslevel=COMPRESS_LEVEL, mtime=0)
+        with io.TextIOWrapper(compressed, encoding='utf-8') as stream:
+            for chunk in _chunks(model, chunk_size):
+                serializer.serialize(chunk, stream=stream)
+                rows += len(chunk)
+    return {
+        'model': label,
+        'file': filename,
+        'rows': rows,
+        'bytes': writer.size,
+        'sha256': writer.sha256.hexdigest(),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def _init_worker():
+    # Processus du pool : Django initialisé, connexions ouvertes à la demande
+    django.setup()
+
+
+def create_backup(output_dir, chunk_size=CHUNK_SIZE, jobs=1, progress=None):
+    """
+    Crée une sauvegarde dans output_dir ; retourne (chemin, manifeste).
+    progress(entrée) est appelé après chaque modèle écrit.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    path = os.path.join(output_dir, f'backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+    work = path + PARTIAL_SUFFIX
+    os.makedirs(work)
+    labels = [model._meta.label for model in backup_models()]
+
+    entries = []
+    try:
+        if jobs > 1:
+            # Pas de connexion héritée par les processus du pool
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+                futures = [pool.submit(dump_model, label, work, chunk_size) for label in labels]
+                for future in futures:
+                    entries.append(future.result())
+                    if progress:
+                        progress(entries[-1])
+        else:
+            with transaction.atomic():
+                for label in labels:
+                    entries.append(dump_model(label, work, chunk_size))
+                    if progress:
+                        progress(entries[-1])
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+
+    manifest = {
+        'format': 'aime-backup-jsonl',
+        'version': FORMAT_VERSION,
+        'created_at': timezone.now().isoformat(),
+        'django': django.get_version(),
+        'chunk_size': chunk_size,
+        'jobs': jobs,
+        'consistent_snapshot': jobs == 1,
+        'seconds': round(time.perf_counter() - started, 3),
+        # Ordre des dépendances : ordre de restauration
+        'models': entries,
+    }
+    with open(os.path.join(work, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(work, path)
+    return path, manifest
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_NAME), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def verify_file(path, entry):
+    """True si le fichier du modèle a la taille et le sha256 du manifeste"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(os.path.join(path, entry['file']), 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+            size += len(block)
+    return size == entry['bytes'] and digest.hexdigest() == entry['sha256']
+
+
+# --- Restauration ---
+class InvalidBackup(ValueError):
+    """Sauvegarde illisible, incomplète ou incompatible avec le schéma actuel"""
+
+
+class HashingReader:
+    """Fichier en lecture qui calcule le sha256 et la taille de ce qui en sort"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+
+def _receiver_module(receiver):
+    if isinstance(receiver, weakref.ReferenceType):
+        receiver = receiver()
+    return getattr(receiver, '__module__', None) or ''
+
+
+@contextmanager
+def app_signals_disabled(app_label='main'):
+    """
+    Débranche les receivers de signaux de modèle définis par l'application
+    le temps du bloc (profils, notifications, points d'impact, statistiques...),
+    puis les rebranche tels quels, même en cas d'erreur.
+    """
+    prefix = apps.get_app_config(app_label).name + '.'
+    saved = []
+    try:
+        for signal in MODEL_SIGNALS:
+            with signal.lock:
+                saved.append((signal, signal.receivers))
+                signal.receivers = [
+                    entry for entry in signal.receivers if not _receiver_module(entry[1]).startswith(prefix)
+                ]
+                signal.sender_receivers_cache.clear()
+        yield
+    finally:
+        for signal, receivers in saved:
+            with signal.lock:
+                signal.receivers = receivers
+                signal.sender_receivers_cache.clear()
+
+
+def _records(path, entry):
+    """Objets du fichier d'un modèle, ligne par ligne ; taille et sha256 vérifiés en fin de lecture"""
+    with open(os.path.join(path, entry['file']), 'rb') as raw:
+        reader = HashingReader(raw)
+        with io.TextIOWrapper(gzip.GzipFile(fileobj=reader, mode='rb'), encoding='utf-8') as stream:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+        reader.read()
+    if reader.size != entry['bytes'] or reader.sha256.hexdigest() != entry['sha256']:
+        raise InvalidBackup(f'{entry["file"]} : taille ou sha256 différent du manifeste')
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(model, objs, using):
+    """
+    INSERT groupé en mode raw, comme save_base(raw=True) de loaddata :
+    bulk_create recalculerait les champs auto_now / auto_now_add.
+    """
+    fields = model._meta.local_concrete_fields
+    size = max(connections[using].ops.bulk_batch_size(fields, objs), 1)
+    queryset = model._base_manager.using(using)
+    for start in range(0, len(objs), size):
+        queryset._insert(objs[start:start + size], fields=fields, using=using, raw=True)
+
+
+def _insert_m2m(model, deserialized, using):
+    """Lignes des tables de liaison auto-créées (les autres sont des modèles sauvegardés à part)"""
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        if not through._meta.auto_created:
+            continue
+        source = through._meta.get_field(field.m2m_field_name()).attname
+        target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+        links = [
+            through(**{source: item.object.pk, target: pk})
+            for item in deserialized for pk in item.m2m_data.get(field.name, ())
+        ]
+        if links:
+            through._base_manager.using(using).bulk_create(links)
+
+
+def load_model(path, entry, chunk_size=CHUNK_SIZE, using=DEFAULT_DB_ALIAS, progress=None):
+    """
+    Charge le fichier d'un modèle par lots de chunk_size ; retourne le nombre
+    de lignes. progress(modèle, lignes, total) est appelé après chaque lot.
+    """
+    model = apps.get_model(entry['model'])
+    objects = python.Deserializer(_records(path, entry), using=using, ignorenonexistent=True)
+    rows = 0
+    for chunk in _batches(objects, chunk_size):
+        _insert(model, [item.object for item in chunk], using)
+        _insert_m2m(model, chunk, using)
+        rows += len(chunk)
+        if progress:
+            progress(entry['model'], rows, entry['rows'])
+    if rows != entry['rows']:
+        raise InvalidBackup(f'{entry["file"]} : {rows} ligne(s) lue(s), {entry["rows"]} attendue(s)')
+    return rows
+
+
+def restore_backup(path, chunk_size=CHUNK_SIZE, using=DEFAULT_DB_ALIAS, progress=None):
+    """
+    Restaure une sauvegarde de create_backup dans une base migrée et vide ;
+    retourne le manifeste. Tout est chargé dans une transaction, modèle par
+    modèle dans l'ordre du manifeste, sans signaux de l'application : les
+    tables dérivées (statistiques, agrégats de carte, index de recherche,
+    classement) font partie de la sauvegarde.
+
+    Clés étrangères vérifiées une seule fois à la fin, comme loaddata :
+    désactivées pendant le chargement sous MySQL (foreign_key_checks),
+    différées au commit sous SQLite et PostgreSQL (contraintes créées
+    DEFERRABLE par Django), puis check_constraints sur les tables chargées.
+    """
+    manifest = read_manifest(path)
+    if manifest.get('format') != 'aime-backup-jsonl' or manifest.get('version', 0) > FORMAT_VERSION:
+        raise InvalidBackup(f'{path} : format de sauvegarde non reconnu')
+    try:
+        models = [apps.get_model(entry['model']) for entry in manifest['models']]
+    except LookupError as e:
+        raise InvalidBackup(f'{path} : {e}') from e
+
+    connection = connections[using]
+    with app_signals_disabled(), transaction.atomic(using=using):
+        with connection.constraint_checks_disabled():
+            for entry in manifest['models']:
+                load_model(path, entry, chunk_size=chunk_size, using=using, progress=progress)
+        connection.check_constraints(table_names=[model._meta.db_table for model in models])
+        # Clés primaires insérées explicitement : séquences recalées (PostgreSQL)
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    # Pages et statistiques en cache calculées sur les anciennes données
+    cache.clear()
+    return manifest
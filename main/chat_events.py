@@ -0,0 +1,231 @@
+"""
+Diffusion des messages de chat en temps réel (Server-Sent Events)
+
+- broker : pub/sub en mémoire du processus. Chaque flux ouvert attend un
+  asyncio.Event, réveillé au commit d'un ChatMessage (signal post_save) ;
+  une connexion inactive ne coûte donc ni CPU ni requête SQL ;
+- filet de sécurité multi-processus : tant qu'il y a des abonnés, une seule
+  tâche par processus lit les nouveaux ids de ChatMessage toutes les
+  WATCH_SECONDS secondes et réveille les conversations concernées (un
+  message écrit par un autre worker est ainsi livré quand même) ;
+- le flux reprend après le dernier id reçu (paramètre after ou en-tête
+  Last-Event-ID envoyé par EventSource à la reconnexion).
+
+Servi en ASGI, le flux reste ouvert jusqu'à STREAM_MAX_SECONDS. En WSGI,
+Django ne sait pas streamer une réponse asynchrone : le flux renvoie alors
+les messages disponibles et se ferme, EventSource se reconnecte après
+RETRY_MILLISECONDS (équivalent d'un polling court).
+"""
+import asyncio
+import json
+import threading
+
+from django.core import signing
+from django.db import transaction
+
+from .models import ChatMessage
+
+ALL_CONVERSATIONS = '*'
+HEARTBEAT_SECONDS = 15
+WATCH_SECONDS = 2
+STREAM_MAX_SECONDS = 300
+RETRY_MILLISECONDS = 3000
+BATCH_SIZE = 100
+
+# v2 : révoque les jetons émis quand le visiteur était retrouvé par son seul email
+VISITOR_TOKEN_SALT = 'main.chat.visitor.v2'
+VISITOR_TOKEN_MAX_AGE = 30 * 24 * 3600
+IDENTITY_TOKEN_SALT = 'main.chat.identity'
+IDENTITY_TOKEN_MAX_AGE = 365 * 24 * 3600
+
+
+# --- Jeton visiteur : donne accès au flux d'une seule conversation ---
+def visitor_token(conversation_id):
+    return signing.dumps({'c': conversation_id}, salt=VISITOR_TOKEN_SALT, compress=True)
+
+
+def read_visitor_token(token):
+    """Id de la conversation du jeton, ou None s'il est invalide ou expiré"""
+    try:
+        return signing.loads(token, salt=VISITOR_TOKEN_SALT, max_age=VISITOR_TOKEN_MAX_AGE)['c']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+# --- Jeton d'identité : désigne le ChatVisitor du navigateur, sans lecture en base ---
+def identity_token(visitor_id):
+    return signing.dumps({'v': visitor_id}, salt=IDENTITY_TOKEN_SALT, compress=True)
+
+
+def read_identity_token(token):
+    """Id du ChatVisitor du jeton, ou None s'il est invalide ou expiré"""
+    try:
+        return signing.loads(token, salt=IDENTITY_TOKEN_SALT, max_age=IDENTITY_TOKEN_MAX_AGE)['v']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+class Subscription:
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # boucle fermée : l'abonné a disparu
+
+    async def wait(self, timeout):
+        """True si un message a été publié, False après timeout secondes"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.event.clear()
+
+    def __enter__(self):
+        self.broker._add(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.broker._remove(self)
+
+
+class ChatBroker:
+    """Abonnés par conversation (ou ALL_CONVERSATIONS), réveillables depuis n'importe quel thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._watchers = {}  # boucle -> tâche de relecture en base
+
+    def subscribe(self, channels):
+        return Subscription(self, tuple(channels))
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._subscribers.values())) if self._subscribers else 0
+
+    def _add(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+            if subscription.loop not in self._watchers:
+                self._watchers[subscription.loop] = subscription.loop.create_task(self._watch())
+
+    def _remove(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, *conversation_ids):
+        with self._lock:
+            targets = set(self._subscribers.get(ALL_CONVERSATIONS, ()))
+            for conversation_id in conversation_ids:
+                targets.update(self._subscribers.get(conversation_id, ()))
+        for subscription in targets:
+            subscription.notify()
+
+    async def _watch(self):
+        """Relecture périodique des nouveaux messages (écrits par un autre processus)"""
+        loop = asyncio.get_running_loop()
+        last_id = await _latest_message_id()
+        try:
+            while True:
+                await asyncio.sleep(WATCH_SECONDS)
+                with self._lock:
+                    if not any(sub.loop is loop for subs in self._subscribers.values() for sub in subs):
+                        return
+                rows = [
+                    row async for row in ChatMessage.objects.filter(id__gt=last_id)
+                    .order_by('id').values_list('id', 'conversation_id')[:BATCH_SIZE * 10]
+                ]
+                if rows:
+                    last_id = rows[-1][0]
+                    self.publish(*{conversation_id for _, conversation_id in rows})
+        finally:
+            with self._lock:
+                self._watchers.pop(loop, None)
+
+
+broker = ChatBroker()
+
+
+def publish_message(message):
+    """Réveille les flux de la conversation après le commit du message"""
+    conversation_id = message.conversation_id
+    transaction.on_commit(lambda: broker.publish(conversation_id))
+
+
+async def _latest_message_id():
+    latest = await ChatMessage.objects.order_by('-id').values_list('id', flat=True).afirst()
+    return latest or 0
+
+
+async def _messages_after(conversation_id, after_id):
+    messages = ChatMessage.objects.filter(id__gt=after_id)
+    if conversation_id is not None:
+        messages = messages.filter(conversation_id=conversation_id)
+    rows = messages.order_by('id').values(
+        'id', 'conversation_id', 'content', 'is_assistant', 'timestamp', 'sender_id',
+        'sender__first_name', 'sender__last_name', 'sender__username', 'conversation__user_id',
+        'conversation__visitor__name',
+    )[:BATCH_SIZE]
+    return [row async for row in rows]
+
+
+def _format_event(row):
+    sender = ' '.join(filter(None, [row['sender__first_name'], row['sender__last_name']])) or row['sender__username']
+    payload = {
+        'id': row['id'],
+        'conversation': row['conversation_id'],
+        'content': row['content'],
+        'timestamp': row['timestamp'].isoformat(),
+        'sender': 'Assistant' if row['is_assistant'] else (sender or row['conversation__visitor__name'] or 'Visiteur'),
+        # Message du visiteur : sans expéditeur (ChatVisitor) ou envoyé par l'utilisateur de la conversation
+        'from_visitor': not row['is_assistant'] and row['sender_id'] in (None, row['conversation__user_id']),
+    }
+    return f"id: {row['id']}\nevent: message\ndata: {json.dumps(payload)}\n\n"
+
+
+async def message_stream(conversation_id=None, after_id=None, max_seconds=STREAM_MAX_SECONDS):
+    """
+    Générateur SSE des messages postérieurs à after_id (tous les messages
+    si conversation_id est None, réservé au staff).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    if after_id is None:
+        after_id = await _latest_message_id()
+    channel = ALL_CONVERSATIONS if conversation_id is None else conversation_id
+
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'
+    if max_seconds <= 0:
+        # Pas d'attente (WSGI) : messages disponibles, puis reconnexion du navigateur
+        for row in await _messages_after(conversation_id, after_id):
+            yield _format_event(row)
+        return
+
+    with broker.subscribe([channel]) as subscription:
+        while True:
+            rows = await _messages_after(conversation_id, after_id)
+            for row in rows:
+                after_id = row['id']
+                yield _format_event(row)
+            if len(rows) == BATCH_SIZE:
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            if not await subscription.wait(min(HEARTBEAT_SECONDS, remaining)):
+                # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                yield ': ping\n\n'
@@ -0,0 +1,14 @@
+"""
+Processeurs de contexte des gabarits
+"""
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_count
+
+
+def notifications(request):
+    """Nombre de notifications non lues pour le badge de base.html (évalué seulement s'il est affiché)"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_notifications_count': SimpleLazyObject(lambda: unread_count(user))}
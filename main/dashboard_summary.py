@@ -0,0 +1,163 @@
+"""
+Résumé du tableau de bord utilisateur (dashboard_home)
+
+Au lieu d'une dizaine de requêtes indépendantes par affichage :
+- les compteurs personnels (dons, événements, challenges, badges) et le
+  rang sont calculés en une seule requête sur UserProfile, par
+  sous-requêtes corrélées, puis mis en cache par utilisateur avec les
+  activités récentes ;
+- le nombre de notifications non lues est lu sur le profil
+  (UserProfile.unread_notifications, hors cache) ;
+- les parties communes (prochains événements, challenges actifs) sont mises
+  en cache une fois pour tous les utilisateurs ;
+- les deux caches sont lus en un seul get_many.
+
+En régime établi, la page coûte 2 requêtes : le get_many et le profil.
+Les caches sont invalidés par les signaux (voir signals.py).
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import (
+    UserProfile, Donation, EventParticipation, MBCParticipant, UserActivity,
+    Event, MutotoBikeChallenge, LeaderboardEntry, UserBadge
+)
+from .leaderboard import rank_for_points
+from .utils import aggregate_subquery
+
+GLOBAL_CACHE_KEY = 'dashboard_global_v1'
+USER_CACHE_KEY = 'dashboard_user_v1:{user_id}'
+CACHE_TIMEOUT = 300
+
+RECENT_ACTIVITIES_LIMIT = 10
+UPCOMING_EVENTS_LIMIT = 5
+ACTIVE_CHALLENGES_LIMIT = 3
+
+# Modèles dont dépend le résumé personnel, et champ qui désigne l'utilisateur
+# (son id, ou son email pour les dons et inscriptions MBC faits sans compte)
+USER_DEPENDENCIES = {
+    UserProfile: 'user_id',
+    EventParticipation: 'user_id',
+    UserActivity: 'user_id',
+    Donation: 'donor_email',
+    MBCParticipant: 'participant_email',
+}
+GLOBAL_DEPENDENCIES = (Event, MutotoBikeChallenge)
+
+
+class DashboardSummary:
+    """Contexte de dashboard_home pour un utilisateur"""
+
+    def __init__(self, user):
+        self.user = user
+
+    @staticmethod
+    def user_cache_key(user_id):
+        return USER_CACHE_KEY.format(user_id=user_id)
+
+    @staticmethod
+    def counter_annotations():
+        """Compteurs personnels, en sous-requêtes corrélées sur le profil"""
+        by_email = Donation.objects.filter(donor_email=OuterRef('user__email'))
+        return {
+            'summary_donation_total': aggregate_subquery(
+                by_email, 'SUM', 'amount', DecimalField(max_digits=12, decimal_places=2)
+            ),
+            'summary_donation_count': aggregate_subquery(by_email, 'COUNT'),
+            'summary_events_participated': aggregate_subquery(
+                EventParticipation.objects.filter(
+                    user_id=OuterRef('user_id'), status__in=['confirmed', 'attended']
+                ),
+                'COUNT',
+            ),
+            'summary_challenges_completed': aggregate_subquery(
+                MBCParticipant.objects.filter(participant_email=OuterRef('user__email'), status='confirmed'),
+                'COUNT',
+            ),
+            'summary_badges_count': aggregate_subquery(
+                UserBadge.objects.filter(user_id=OuterRef('user_id')),
+                'COUNT',
+            ),
+            # Rang lu dans l'instantané du classement (voir leaderboard.py)
+            'summary_rank': Subquery(
+                LeaderboardEntry.objects.filter(user_id=OuterRef('user_id')).values('rank')[:1]
+            ),
+        }
+
+    def _load_profile(self, with_counters):
+        profiles = UserProfile.objects.filter(user=self.user)
+        if with_counters:
+            profiles = profiles.annotate(**self.counter_annotations())
+        profile = profiles.first()
+        if profile is None:
+            UserProfile.objects.get_or_create(user=self.user)
+            profile = profiles.first()
+        # Évite une requête lorsque le gabarit affiche profile.user
+        profile.user = self.user
+        return profile
+
+    def _user_part(self, profile):
+        return {
+            'total_donations': {
+                'total': profile.summary_donation_total,
+                'count': profile.summary_donation_count,
+            },
+            'events_participated': profile.summary_events_participated,
+            'challenges_completed': profile.summary_challenges_completed,
+            'badges_count': profile.summary_badges_count,
+            'user_ranking': profile.summary_rank or rank_for_points(profile.points),
+            'recent_activities': list(
+                UserActivity.objects.filter(user=self.user).order_by('-timestamp', '-id')[:RECENT_ACTIVITIES_LIMIT]
+            ),
+        }
+
+    @staticmethod
+    def _global_part():
+        now = timezone.now()
+        return {
+            'upcoming_events': list(
+                Event.objects.filter(date__gte=now, is_active=True).order_by('date')[:UPCOMING_EVENTS_LIMIT]
+            ),
+            'active_challenges': list(
+                MutotoBikeChallenge.objects.filter(is_active=True, date__gte=now).order_by('date')[:ACTIVE_CHALLENGES_LIMIT]
+            ),
+        }
+
+    def get_context(self):
+        user_key = self.user_cache_key(self.user.pk)
+        cached = cache.get_many([GLOBAL_CACHE_KEY, user_key])
+        user_part = cached.get(user_key)
+        global_part = cached.get(GLOBAL_CACHE_KEY)
+
+        profile = self._load_profile(with_counters=user_part is None)
+
+        to_cache = {}
+        if user_part is None:
+            user_part = to_cache[user_key] = self._user_part(profile)
+        if global_part is None:
+            global_part = to_cache[GLOBAL_CACHE_KEY] = self._global_part()
+        if to_cache:
+            cache.set_many(to_cache, CACHE_TIMEOUT)
+
+        # Compteur tenu à jour sur le profil (voir notifications.py), hors cache
+        return {'profile': profile, 'unread_notifications': profile.unread_notifications, **user_part, **global_part}
+
+    # --- Invalidation (appelée par les signaux, après commit) ---
+    @classmethod
+    def invalidate_users(cls, user_ids):
+        keys = [cls.user_cache_key(user_id) for user_id in user_ids if user_id]
+        if keys:
+            transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @classmethod
+    def invalidate_emails(cls, *emails):
+        emails = [email for email in emails if email]
+        if emails:
+            cls.invalidate_users(User.objects.filter(email__in=emails).values_list('id', flat=True))
+
+    @staticmethod
+    def invalidate_global():
+        transaction.on_commit(lambda: cache.delete(GLOBAL_CACHE_KEY))
@@ -7,11 +7,16 @@ from django.http import JsonResponse
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.core.paginator import Paginator
+from .pagination import CursorPaginator, CURSOR_PARAM
+from .activity_log import ActivityHistoryPaginator
+from .dashboard_summary import DashboardSummary
+from .leaderboard import LEADERBOARD_ROLES, get_user_rank
+from .gamification import BADGES, award
+from .notifications import notify, mark_read, unread_count
 from .models import (
     UserProfile, Donation, Event, EventParticipation, 
     MutotoBikeChallenge, MBCParticipant, UserNotification, 
-    UserActivity, Project, ChatConversation, ChatMessage
+    UserActivity, Project, ChatConversation, ChatMessage, LeaderboardEntry
 )
 from .forms import UserProfileForm
 import json
@@ -45,59 +50,8 @@ import json
 
 @login_required
 def dashboard_home(request):
-    """Page principale du tableau de bord"""
-    user = request.user
-    profile, created = UserProfile.objects.get_or_create(user=user)
-    
-    # Statistiques utilisateur
-    total_donations = Donation.objects.filter(donor_email=user.email).aggregate(
-        total=Sum('amount'), count=Count('id')
-    )
-    
-    events_participated = EventParticipation.objects.filter(
-        user=user, status__in=['confirmed', 'attended']
-    ).count()
-    
-    challenges_completed = MBCParticipant.objects.filter(
-        participant_email=user.email, status='confirmed'
-    ).count()
-    
-    # Activités récentes
-    recent_activities = UserActivity.objects.filter(user=user)[:10]
-    
-    # Notifications non lues
-    unread_notifications = UserNotification.objects.filter(
-        user=user, is_read=False
-    ).count()
-    
-    # Prochains événements
-    upcoming_events = Event.objects.filter(
-        date__gte=timezone.now(),
-        is_active=True
-    ).order_by('date')[:5]
-    
-    # Challenges actifs
-    active_challenges = MutotoBikeChallenge.objects.filter(
-        is_active=True,
-        date__gte=timezone.now()
-    ).order_by('date')[:3]
-    
-    # Classement utilisateur (basé sur les points)
-    user_ranking = UserProfile.objects.filter(
-        points__gt=profile.points
-    ).count() + 1
-    
-    context = {
-        'profile': profile,
-        'total_donations': total_donations,
-        'events_participated': events_participated,
-        'challenges_completed': challenges_completed,
-        'recent_activities': recent_activities,
-        'unread_notifications': unread_notifications,
-        'upcoming_events': upcoming_events,
-        'active_challenges': active_challenges,
-        'user_ranking': user_ranking,
-    }
+    """Page principale du tableau de bord (voir dashboard_summary.DashboardSummary)"""
+    context = DashboardSummary(request.user).get_context()
     
     return render(request, 'main/dashboard/home.html', context)
 
@@ -131,21 +85,19 @@ def dashboard_profile(request):
 @login_required
 def dashboard_donations(request):
     """Historique des donations"""
-    donations = Donation.objects.filter(donor_email=request.user.email).order_by('-created_at')
+    donations = Donation.objects.filter(donor_email=request.user.email)
     
-    # Pagination
-    paginator = Paginator(donations, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur (pas de COUNT ni d'OFFSET)
+    paginator = CursorPaginator(donations, ordering=('-created_at', '-id'), per_page=10)
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
     
     # Statistiques
-    total_donated = donations.aggregate(total=Sum('amount'))['total'] or 0
-    donation_count = donations.count()
+    totals = donations.aggregate(total=Sum('amount'), count=Count('id'))
     
     context = {
         'page_obj': page_obj,
-        'total_donated': total_donated,
-        'donation_count': donation_count,
+        'total_donated': totals['total'] or 0,
+        'donation_count': totals['count'],
     }
     
     return render(request, 'main/dashboard/donations.html', context)
@@ -182,17 +134,17 @@ def dashboard_notifications(request):
     
     # Marquer comme lues si demandé
     if request.GET.get('mark_read'):
-        notifications.filter(is_read=False).update(is_read=True)
+        mark_read(request.user)
         return redirect('main:dashboard_notifications')
     
-    # Pagination
-    paginator = Paginator(notifications, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur
+    paginator = CursorPaginator(notifications, ordering=('-created_at', '-id'), per_page=15)
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
     
     context = {
         'page_obj': page_obj,
-        'unread_count': notifications.filter(is_read=False).count(),
+        'notifications': page_obj,
+        'unread_count': unread_count(request.user),
     }
     
     return render(request, 'main/dashboard/notifications.html', context)
@@ -203,67 +155,56 @@ def dashboard_badges(request):
     profile, created = UserProfile.objects.get_or_create(user=request.user)
     
     # Badges disponibles
-    available_badges = {
-        'first_donation': {
-            'name': 'Premier Don',
-            'description': 'Effectué votre premier don',
-            'icon': 'fas fa-heart',
-            'color': 'text-danger'
-        },
-        'generous_donor': {
-            'name': 'Donateur Généreux',
-            'description': 'Plus de 5 donations',
-            'icon': 'fas fa-hand-holding-heart',
-            'color': 'text-success'
-        },
-        'event_participant': {
-            'name': 'Participant Actif',
-            'description': 'Participé à un événement',
-            'icon': 'fas fa-calendar-check',
-            'color': 'text-primary'
-        },
-        'bike_challenger': {
-            'name': 'Cycliste AIME',
-            'description': 'Participé au Mutoto Bike Challenge',
-            'icon': 'fas fa-bicycle',
-            'color': 'text-warning'
-        },
-        'volunteer': {
-            'name': 'Bénévole',
-            'description': 'Inscrit comme bénévole',
-            'icon': 'fas fa-hands-helping',
-            'color': 'text-info'
-        },
-        'level_5': {
-            'name': 'Expert AIME',
-            'description': 'Atteint le niveau 5',
-            'icon': 'fas fa-star',
-            'color': 'text-warning'
-        }
-    }
+    available_badges = BADGES
     
     user_badges = profile.get_badges_list()
     
-    # Classement général
-    leaderboard = UserProfile.objects.filter(
-        points__gt=0
-    ).order_by('-points')[:10]
+    # Classement général (instantané précalculé, voir leaderboard.py)
+    leaderboard = LeaderboardEntry.objects.select_related('user').filter(points__gt=0).order_by('rank', 'id')[:10]
     
     # Position de l'utilisateur
-    user_position = UserProfile.objects.filter(
-        points__gt=profile.points
-    ).count() + 1
+    user_position = get_user_rank(request.user)
     
     context = {
         'profile': profile,
         'available_badges': available_badges,
         'user_badges': user_badges,
+        'earned_badges': user_badges,
+        'badges_count': len(user_badges),
         'leaderboard': leaderboard,
         'user_position': user_position,
+        'user_ranking': user_position,
     }
     
     return render(request, 'main/dashboard/badges.html', context)
 
+@login_required
+def dashboard_leaderboard(request):
+    """Classement des utilisateurs, global ou par rôle"""
+    role = request.GET.get('role')
+    if role not in LEADERBOARD_ROLES:
+        role = None
+    
+    entries = LeaderboardEntry.objects.select_related('user')
+    if role:
+        entries = entries.filter(role=role)
+        ordering = ('role_rank', 'id')
+    else:
+        ordering = ('rank', 'id')
+    
+    paginator = CursorPaginator(entries, ordering=ordering, per_page=25)
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
+    
+    role_labels = dict(UserProfile.ROLE_CHOICES)
+    context = {
+        'page_obj': page_obj,
+        'current_role': role,
+        'roles': [(code, role_labels[code]) for code in LEADERBOARD_ROLES],
+        'user_ranking': get_user_rank(request.user, role=role),
+    }
+    
+    return render(request, 'main/dashboard/leaderboard.html', context)
+
 @login_required
 def dashboard_settings(request):
     """Paramètres et préférences"""
@@ -304,24 +245,20 @@ def dashboard_settings(request):
 
 @login_required
 def dashboard_activities(request):
-    """Historique des activités"""
-    activities = UserActivity.objects.filter(user=request.user)
-    
+    """Historique des activités (table vive et archives, voir activity_log.py)"""
     # Filtrage par type d'activité
     activity_type = request.GET.get('type')
-    if activity_type:
-        activities = activities.filter(activity_type=activity_type)
     
-    # Pagination
-    paginator = Paginator(activities, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur
+    paginator = ActivityHistoryPaginator(request.user, activity_type=activity_type, per_page=20)
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
     
     # Types d'activités pour le filtre
     activity_types = UserActivity.ACTIVITY_TYPES
     
     context = {
         'page_obj': page_obj,
+        'activities': page_obj,
         'activity_types': activity_types,
         'current_filter': activity_type,
     }
@@ -342,25 +279,19 @@ def join_event(request, event_id):
         
         if created:
             # Ajouter des points
-            profile = request.user.userprofile
-            profile.add_points(50)
+            award(request.user, points=50)
             
             # Enregistrer l'activité
             UserActivity.objects.create(
                 user=request.user,
                 activity_type='registration',
-                description=f'Inscription à l\'événement: {event.name}'
+                description=f'Inscription à l\'événement: {event.title}'
             )
             
             # Notification
-            UserNotification.objects.create(
-                user=request.user,
-                title='Inscription confirmée',
-                message=f'Vous êtes inscrit à l\'événement "{event.name}"',
-                notification_type='success'
-            )
+            notify(request.user, 'event_registration', {'event_id': event.pk, 'event': event.title})
             
-            messages.success(request, f'Inscription à "{event.name}" confirmée!')
+            messages.success(request, f'Inscription à "{event.title}" confirmée!')
         else:
             messages.info(request, 'Vous êtes déjà inscrit à cet événement.')
     
@@ -379,9 +310,8 @@ def join_challenge(request, challenge_id):
         ).first()
         
         if not existing:
-            # Créer nouvelle participation
-            participation = MBCParticipant.objects.create(
-                event=challenge,
+            # Créer nouvelle participation (la place est réservée sous verrou)
+            participation = MBCParticipant(
                 participant_name=request.user.get_full_name() or request.user.username,
                 participant_email=request.user.email,
                 participant_phone=getattr(request.user.userprofile, 'phone', ''),
@@ -390,11 +320,12 @@ def join_challenge(request, challenge_id):
                 emergency_phone='000000000',
                 status='pending'
             )
-            
-            # Ajouter des points et badge
-            profile = request.user.userprofile
-            profile.add_points(100)
-            profile.add_badge('bike_challenger')
+            if not challenge.register_participant(participation):
+                messages.error(request, f'Le challenge "{challenge.name}" est complet.')
+                return redirect('main:dashboard_events')
+
+            # Ajouter des points et badge (une seule transaction)
+            award(request.user, points=100, badges=['bike_challenger'])
             
             # Enregistrer l'activité
             UserActivity.objects.create(
@@ -404,12 +335,7 @@ def join_challenge(request, challenge_id):
             )
             
             # Notification
-            UserNotification.objects.create(
-                user=request.user,
-                title='Challenge MBC',
-                message=f'Inscription au challenge "{challenge.name}" confirmée!',
-                notification_type='success'
-            )
+            notify(request.user, 'challenge_registration', {'challenge_id': challenge.pk, 'challenge': challenge.name})
             
             messages.success(request, f'Inscription au challenge "{challenge.name}" confirmée!')
         else:
@@ -421,13 +347,16 @@ def join_challenge(request, challenge_id):
 def mark_notification_read(request, notification_id):
     """Marquer une notification comme lue"""
     if request.method == 'POST':
-        notification = get_object_or_404(
-            UserNotification, 
-            id=notification_id, 
-            user=request.user
-        )
-        notification.is_read = True
-        notification.save()
-        return JsonResponse({'status': 'success'})
+        mark_read(request.user, [notification_id])
+        return JsonResponse({'status': 'success', 'unread_count': unread_count(request.user)})
+    
+    return JsonResponse({'status': 'error'})
+
+@login_required
+def mark_all_notifications_read(request):
+    """Marquer toutes les notifications comme lues (une seule requête UPDATE)"""
+    if request.method == 'POST':
+        updated = mark_read(request.user)
+        return JsonResponse({'status': 'success', 'updated': updated, 'unread_count': 0})
     
     return JsonResponse({'status': 'error'})
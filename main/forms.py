@@ -1,11 +1,16 @@
+from decimal import Decimal
+
 from django import forms
 from django.core.validators import RegexValidator
 from django.contrib.auth.models import User
 from .models import (
     ContactMessage, NewsletterSubscription, MBCParticipant, 
-    Donation, MutotoBikeChallenge, UserProfile, VisitorFeedback
+    Donation, MutotoBikeChallenge, UserProfile, VisitorFeedback, ImpactPoint
 )
 
+COORDINATE_PRECISION = Decimal('0.000001')
+
+
 class UserProfileForm(forms.ModelForm):
     """Formulaire de profil utilisateur"""
     first_name = forms.CharField(
@@ -325,3 +330,20 @@ class VisitorFeedbackForm(forms.ModelForm):
             'contribution_type': 'Comment souhaitez-vous contribuer ? *',
             'contribution_details': 'Détails supplémentaires',
         }
+
+
+class ImpactPointForm(forms.ModelForm):
+    """Validation d'un point d'impact ajouté par l'API de la carte (add_impact_point)"""
+    # Coordonnées GPS reçues avec toute leur précision : arrondies aux 6 décimales de la colonne
+    latitude = forms.FloatField(min_value=-90, max_value=90)
+    longitude = forms.FloatField(min_value=-180, max_value=180)
+
+    class Meta:
+        model = ImpactPoint
+        fields = ['type', 'latitude', 'longitude', 'description', 'value', 'status']
+
+    def clean_latitude(self):
+        return Decimal(self.cleaned_data['latitude']).quantize(COORDINATE_PRECISION)
+
+    def clean_longitude(self):
+        return Decimal(self.cleaned_data['longitude']).quantize(COORDINATE_PRECISION)
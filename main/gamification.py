@@ -0,0 +1,266 @@
+"""
+Gamification : points, niveaux et badges des utilisateurs
+
+award(user, points=..., badges=[...]) est le point d'entrée unique :
+- les points sont ajoutés par un seul UPDATE avec F() (pas de lecture puis
+  réécriture du profil : deux requêtes simultanées ne perdent plus de points),
+  et le niveau est recalculé dans la même requête SQL ;
+- les badges sont insérés en bloc dans UserBadge (contrainte unique
+  user+code : un badge déjà obtenu est ignoré).
+
+evaluate_badges() attribue en lot les badges du catalogue (commande
+evaluate_badges) : les utilisateurs sont parcourus par tranches d'id, et
+chaque règle est évaluée pour toute la tranche par une requête agrégée
+(GROUP BY), au lieu d'une vérification par utilisateur et par requête HTTP.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
+
+from .models import (
+    UserProfile, UserBadge, UserActivity, Donation,
+    EventParticipation, MBCParticipant
+)
+from .leaderboard import update_leaderboard_entry
+from .dashboard_summary import DashboardSummary
+from .notifications import notify_many
+
+# (points minimum, niveau), du plus haut au plus bas
+LEVEL_THRESHOLDS = (
+    (2500, 5),
+    (1000, 4),
+    (500, 3),
+    (100, 2),
+)
+
+# Catalogue des badges (affiché par dashboard_badges)
+BADGES = {
+    'first_donation': {
+        'name': 'Premier Don',
+        'description': 'Effectué votre premier don',
+        'icon': 'fas fa-heart',
+        'color': 'text-danger'
+    },
+    'generous_donor': {
+        'name': 'Donateur Généreux',
+        'description': 'Plus de 5 donations',
+        'icon': 'fas fa-hand-holding-heart',
+        'color': 'text-success'
+    },
+    'event_participant': {
+        'name': 'Participant Actif',
+        'description': 'Participé à un événement',
+        'icon': 'fas fa-calendar-check',
+        'color': 'text-primary'
+    },
+    'bike_challenger': {
+        'name': 'Cycliste AIME',
+        'description': 'Participé au Mutoto Bike Challenge',
+        'icon': 'fas fa-bicycle',
+        'color': 'text-warning'
+    },
+    'volunteer': {
+        'name': 'Bénévole',
+        'description': 'Inscrit comme bénévole',
+        'icon': 'fas fa-hands-helping',
+        'color': 'text-info'
+    },
+    'level_5': {
+        'name': 'Expert AIME',
+        'description': 'Atteint le niveau 5',
+        'icon': 'fas fa-star',
+        'color': 'text-warning'
+    }
+}
+GENEROUS_DONOR_MIN_DONATIONS = 6
+
+
+def level_for_points(points):
+    for minimum, level in LEVEL_THRESHOLDS:
+        if points >= minimum:
+            return level
+    return 1
+
+
+def level_expression(points_expression):
+    """Équivalent SQL de level_for_points (CASE WHEN ...)"""
+    return Case(
+        *[
+            When(GreaterThanOrEqual(points_expression, minimum), then=Value(level))
+            for minimum, level in LEVEL_THRESHOLDS
+        ],
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+
+
+class AwardResult:
+    """Résultat d'un award() : points et niveau après mise à jour, badges nouvellement obtenus"""
+
+    def __init__(self, points, level, new_badges):
+        self.points = points
+        self.level = level
+        self.new_badges = new_badges
+
+
+def award(user, points=0, badges=()):
+    """
+    Ajoute des points et/ou des badges à un utilisateur, dans une seule transaction.
+    Retourne un AwardResult.
+    """
+    badges = list(dict.fromkeys(badges))
+    with transaction.atomic():
+        profiles = UserProfile.objects.filter(user=user)
+        if points:
+            new_points = F('points') + points
+            # L'ordre compte : MySQL évalue les affectations d'un UPDATE de gauche
+            # à droite, level doit donc être calculé avant que points ne change
+            updated = profiles.update(level=level_expression(new_points), points=new_points)
+            if not updated:
+                UserProfile.objects.get_or_create(user=user)
+                profiles.update(level=level_expression(new_points), points=new_points)
+
+        new_badges = []
+        if badges:
+            owned = set(UserBadge.objects.filter(user=user, code__in=badges).values_list('code', flat=True))
+            new_badges = [code for code in badges if code not in owned]
+            # ignore_conflicts : un award simultané du même badge ne fait pas échouer la transaction
+            UserBadge.objects.bulk_create(
+                [UserBadge(user=user, code=code) for code in new_badges], ignore_conflicts=True
+            )
+
+        profile = profiles.only('id', 'user_id', 'role', 'points', 'level').first()
+        if profile is None:
+            profile, _ = UserProfile.objects.get_or_create(user=user)
+        if points:
+            # UPDATE sans signal post_save : classement et résumé du dashboard à la main
+            update_leaderboard_entry(profile)
+        if points or new_badges:
+            DashboardSummary.invalidate_users([user.pk])
+
+    return AwardResult(profile.points, profile.level, new_badges)
+
+
+# --- Règles d'attribution en lot ---
+# Chaque règle reçoit une tranche d'utilisateurs {id: email} et retourne
+# {code du badge: ids des utilisateurs qui y ont droit}, en une requête.
+
+def _donation_badges(users):
+    ids_by_email = {email: user_id for user_id, email in users.items() if email}
+    counts = (
+        Donation.objects.filter(status='completed', donor_email__in=list(ids_by_email))
+        .values('donor_email')
+        .annotate(total=Count('id'))
+        .values_list('donor_email', 'total')
+    )
+    earned = {'first_donation': set(), 'generous_donor': set()}
+    for email, total in counts:
+        user_id = ids_by_email[email]
+        earned['first_donation'].add(user_id)
+        if total >= GENEROUS_DONOR_MIN_DONATIONS:
+            earned['generous_donor'].add(user_id)
+    return earned
+
+
+def _event_badges(users):
+    participants = (
+        EventParticipation.objects.filter(user_id__in=list(users), status__in=['confirmed', 'attended'])
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    return {'event_participant': set(participants)}
+
+
+def _challenge_badges(users):
+    ids_by_email = {email: user_id for user_id, email in users.items() if email}
+    emails = (
+        MBCParticipant.objects.filter(participant_email__in=list(ids_by_email))
+        .exclude(status='cancelled')
+        .values_list('participant_email', flat=True)
+        .distinct()
+    )
+    return {'bike_challenger': {ids_by_email[email] for email in emails}}
+
+
+def _profile_badges(users):
+    profiles = (
+        UserProfile.objects.filter(user_id__in=list(users))
+        .filter(Q(role='volunteer') | Q(level__gte=5))
+        .values_list('user_id', 'role', 'level')
+    )
+    earned = {'volunteer': set(), 'level_5': set()}
+    for user_id, role, level in profiles:
+        if role == 'volunteer':
+            earned['volunteer'].add(user_id)
+        if level >= 5:
+            earned['level_5'].add(user_id)
+    return earned
+
+
+BADGE_RULES = (_donation_badges, _event_badges, _challenge_badges, _profile_badges)
+
+
+def _award_chunk(users, dry_run):
+    """Évalue les règles pour une tranche ; retourne {code: nombre de nouveaux badges}"""
+    earned = {}
+    for rule in BADGE_RULES:
+        for code, user_ids in rule(users).items():
+            earned.setdefault(code, set()).update(user_ids)
+
+    candidates = set().union(*earned.values()) if earned else set()
+    if not candidates:
+        return {}
+    owned = set(
+        UserBadge.objects.filter(user_id__in=list(candidates), code__in=list(earned))
+        .values_list('user_id', 'code')
+    )
+    new = sorted(
+        (user_id, code)
+        for code, user_ids in earned.items()
+        for user_id in user_ids
+        if (user_id, code) not in owned
+    )
+    if not new:
+        return {}
+    by_code = {}
+    for user_id, code in new:
+        by_code.setdefault(code, []).append(user_id)
+
+    if not dry_run:
+        with transaction.atomic():
+            UserBadge.objects.bulk_create(
+                [UserBadge(user_id=user_id, code=code) for user_id, code in new], ignore_conflicts=True
+            )
+            UserActivity.objects.bulk_create([
+                UserActivity(
+                    user_id=user_id, activity_type='badge_earned',
+                    description=f"Badge obtenu : {BADGES[code]['name']}"[:200],
+                )
+                for user_id, code in new
+            ])
+            # Une notification rendue par badge, écrite en bloc (invalide aussi le dashboard)
+            for code, user_ids in by_code.items():
+                notify_many(user_ids, 'badge_earned', {'code': code, **BADGES[code]})
+
+    return {code: len(user_ids) for code, user_ids in by_code.items()}
+
+
+def evaluate_badges(chunk_size=2000, dry_run=False):
+    """
+    Attribue les badges du catalogue à tous les utilisateurs qui y ont droit
+    et ne les possèdent pas encore. Relançable sans effet de bord : un badge
+    déjà obtenu n'est ni réinséré ni renotifié.
+
+    Générateur : produit (id du dernier utilisateur traité, {code: nouveaux badges})
+    pour chaque tranche, ce qui permet d'afficher la progression.
+    """
+    last_id = 0
+    while True:
+        users = dict(
+            User.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'email')[:chunk_size]
+        )
+        if not users:
+            return
+        last_id = max(users)
+        yield last_id, _award_chunk(users, dry_run)
@@ -0,0 +1,483 @@
+"""
+Points de la carte d'impact, regroupés côté serveur
+
+La carte ne reçoit plus tous les ImpactPoint dans la page : elle demande
+/api/impact-points/?bbox=ouest,sud,est,nord&zoom=z à chaque déplacement.
+
+- les points sont regroupés sur une grille fixe : au zoom z, cellules de
+  360 / 2^z / GRID_CELLS_PER_TILE degrés alignées sur 0, si bien qu'une
+  cellule du zoom z-1 réunit exactement 2x2 cellules du zoom z ;
+- jusqu'à AGGREGATE_MAX_ZOOM, les cellules sont lues dans MapAggregateCell
+  (nombre, somme des valeurs et des coordonnées, par type), construite par
+  la commande build_map_aggregates puis ajustée par les signaux
+  d'ImpactPoint (record_point_change) : seules les cellules contenant
+  l'ancienne et la nouvelle position du point sont modifiées ;
+- au-delà, ou avec un filtre de période, le regroupement est fait en SQL
+  sur ImpactPoint (une requête GROUP BY sur l'index (latitude, longitude)) ;
+- une cellule d'un seul point renvoie le point lui-même, les autres un
+  groupe (nombre, somme des valeurs, répartition par type, emprise) ;
+- au-delà de CLUSTER_MAX_ZOOM les points sont renvoyés un par un ;
+- le nombre de cellules d'une réponse est borné (MAX_CELLS) : une emprise
+  trop large pour le zoom demandé est lue à un zoom inférieur.
+
+La réponse est du GeoJSON (FeatureCollection).
+
+/api/impact-data/ (impact_changes) sert les points créés ou modifiés après
+un curseur (updated_at, id) : la carte l'interroge périodiquement et ne
+recharge sa zone que si un changement la concerne.
+"""
+import math
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Min, Q, Sum
+from django.db.models.functions import Cast, Floor
+from django.utils import timezone
+
+from .models import ImpactPoint, MapAggregateCell, SiteStatistics
+from .pagination import CursorPaginator
+
+GRID_CELLS_PER_TILE = 4  # tuile de 256 px : cellules d'environ 64 px
+AGGREGATE_MAX_ZOOM = 12
+CLUSTER_MAX_ZOOM = 16
+MAX_ZOOM = 22
+MAX_CELLS = 4096
+MAX_POINTS = 2000
+MAX_SINGLE_LOOKUPS = 200
+BUILD_BATCH_SIZE = 5000
+
+FEED_ORDERING = ('updated_at', 'id')
+FEED_BATCH_SIZE = 100
+FEED_MAX_BATCH_SIZE = 500
+FEED_LAG = timedelta(seconds=5)
+
+PERIODS = {
+    'today': timedelta(days=1),
+    'week': timedelta(days=7),
+    'month': timedelta(days=30),
+}
+
+
+def parse_bbox(value):
+    """'ouest,sud,est,nord' -> (ouest, sud, est, nord) ; ValueError si invalide"""
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        raise ValueError("bbox attendu : ouest,sud,est,nord")
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        raise ValueError("bbox invalide")
+    west, east = max(west, -180.0), min(east, 180.0)
+    south, north = max(south, -90.0), min(north, 90.0)
+    if west >= east or south >= north:
+        raise ValueError("bbox vide")
+    return west, south, east, north
+
+
+def cell_size(zoom):
+    """Côté d'une cellule de regroupement, en degrés"""
+    return 360.0 / (2 ** zoom) / GRID_CELLS_PER_TILE
+
+
+def mapped_points(types=None, period=None):
+    """ImpactPoint placés sur la carte (coordonnées renseignées et non nulles)"""
+    points = ImpactPoint.objects.filter(latitude__isnull=False, longitude__isnull=False).exclude(
+        latitude=0, longitude=0
+    )
+    if types:
+        points = points.filter(type__in=types)
+    if period in PERIODS:
+        points = points.filter(created_at__gte=timezone.now() - PERIODS[period])
+    return points
+
+
+def _cell_range(bbox, size):
+    """Lignes et colonnes de grille couvertes par l'emprise (bornes incluses)"""
+    west, south, east, north = bbox
+    return (
+        math.floor(south / size), math.floor(north / size),
+        math.floor(west / size), math.floor(east / size),
+    )
+
+
+def _cell_bounds(cell_y, cell_x, size):
+    return cell_x * size, cell_y * size, (cell_x + 1) * size, (cell_y + 1) * size
+
+
+def _in_bounds(points, west, south, east, north):
+    # Plage sur latitude puis longitude : parcours de l'index (latitude, longitude)
+    return points.filter(latitude__gte=south, latitude__lte=north, longitude__gte=west, longitude__lte=east)
+
+
+def point_feature(point):
+    return {
+        'type': 'Feature',
+        'geometry': (
+            {'type': 'Point', 'coordinates': [float(point.longitude), float(point.latitude)]}
+            if point.latitude is not None and point.longitude is not None else None
+        ),
+        'properties': {
+            'cluster': False,
+            'id': point.pk,
+            'type': point.type,
+            'title': point.description[:80] or point.get_type_display(),
+            'description': point.description,
+            'value': float(point.value) if point.value is not None else None,
+            'status': point.status,
+            'date': timezone.localtime(point.created_at).strftime('%d/%m/%Y'),
+        },
+    }
+
+
+def _cluster_feature(cell):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [round(cell['lng'], 6), round(cell['lat'], 6)]},
+        'properties': {
+            'cluster': True,
+            'count': cell['count'],
+            'value': round(cell['value'], 2),
+            'types': cell['types'],
+            'bbox': cell['bbox'],
+        },
+    }
+
+
+# --- Lecture des cellules : lignes (cell_y, cell_x, type, count, value_sum, latitude_sum, longitude_sum) ---
+def _live_rows(points, zoom):
+    """Regroupement SQL des points (une requête GROUP BY)"""
+    size = cell_size(zoom)
+    return points.annotate(
+        cell_y=Floor(Cast('latitude', FloatField()) / size),
+        cell_x=Floor(Cast('longitude', FloatField()) / size),
+    ).values('cell_y', 'cell_x', 'type').annotate(
+        count=Count('id'),
+        value_sum=Sum(Cast('value', FloatField())),
+        latitude_sum=Sum(Cast('latitude', FloatField())),
+        longitude_sum=Sum(Cast('longitude', FloatField())),
+        first_id=Min('id'),
+    ).order_by()
+
+
+def _aggregate_rows(bbox, zoom, types):
+    """Cellules précalculées de l'emprise (index unique zoom, cell_y, cell_x, type)"""
+    min_y, max_y, min_x, max_x = _cell_range(bbox, cell_size(zoom))
+    cells = MapAggregateCell.objects.filter(
+        zoom=zoom, cell_y__gte=min_y, cell_y__lte=max_y, cell_x__gte=min_x, cell_x__lte=max_x, count__gt=0,
+    )
+    if types:
+        cells = cells.filter(type__in=types)
+    return cells.values('cell_y', 'cell_x', 'type', 'count', 'value_sum', 'latitude_sum', 'longitude_sum')
+
+
+def _merge_cells(rows, size):
+    """Lignes par type -> {(ligne, colonne): cellule tous types confondus}"""
+    cells = {}
+    for row in rows:
+        key = (int(row['cell_y']), int(row['cell_x']))
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = {
+                'count': 0, 'lat': 0.0, 'lng': 0.0, 'value': 0.0, 'types': {}, 'first_id': row.get('first_id'),
+            }
+        cell['count'] += row['count']
+        cell['lat'] += row['latitude_sum']
+        cell['lng'] += row['longitude_sum']
+        cell['value'] += row['value_sum'] or 0.0
+        cell['types'][row['type']] = cell['types'].get(row['type'], 0) + row['count']
+    for (y, x), cell in cells.items():
+        cell['lat'] /= cell['count']
+        cell['lng'] /= cell['count']
+        cell['bbox'] = list(_cell_bounds(y, x, size))
+    return cells
+
+
+def _single_points(cells, points, size):
+    """Point de chaque cellule qui n'en contient qu'un : {(ligne, colonne): ImpactPoint}"""
+    singles = {key: cell for key, cell in cells.items() if cell['count'] == 1}
+    if not singles:
+        return {}
+    known = {cell['first_id']: key for key, cell in singles.items() if cell['first_id'] is not None}
+    if known:
+        return {known[point.pk]: point for point in ImpactPoint.objects.filter(pk__in=known)}
+
+    # Cellules précalculées : le point est retrouvé par l'emprise de sa cellule
+    keys = list(singles)[:MAX_SINGLE_LOOKUPS]
+    bounds = reduce(or_, (
+        Q(latitude__gte=south, latitude__lt=north, longitude__gte=west, longitude__lt=east)
+        for west, south, east, north in (_cell_bounds(y, x, size) for y, x in keys)
+    ))
+    found = {}
+    for point in points.filter(bounds):
+        key = (math.floor(float(point.latitude) / size), math.floor(float(point.longitude) / size))
+        if key in singles:
+            found[key] = point
+    return found
+
+
+def aggregates_built():
+    """True si build_map_aggregates a été lancé (et qu'il y a des points)"""
+    return MapAggregateCell.objects.filter(zoom=0).exists()
+
+
+def impact_features(bbox, zoom, types=None, period=None):
+    """
+    FeatureCollection des points de l'emprise bbox au niveau de zoom donné.
+    Deux requêtes au plus : les cellules, puis le détail des cellules d'un point.
+    """
+    zoom = min(max(int(zoom), 0), MAX_ZOOM)
+    points = mapped_points(types, period)
+
+    if zoom > CLUSTER_MAX_ZOOM:
+        # Assez près pour des points individuels (bornés par MAX_POINTS)
+        selected = list(_in_bounds(points, *bbox).order_by('id')[:MAX_POINTS + 1])
+        return {
+            'type': 'FeatureCollection',
+            'features': [point_feature(point) for point in selected[:MAX_POINTS]],
+            'zoom': zoom,
+            'truncated': len(selected) > MAX_POINTS,
+        }
+
+    # Emprise très large pour le zoom demandé : grille d'un zoom inférieur
+    grid_zoom = zoom
+    while grid_zoom > 0:
+        min_y, max_y, min_x, max_x = _cell_range(bbox, cell_size(grid_zoom))
+        if (max_y - min_y + 1) * (max_x - min_x + 1) <= MAX_CELLS:
+            break
+        grid_zoom -= 1
+    size = cell_size(grid_zoom)
+
+    precomputed = grid_zoom <= AGGREGATE_MAX_ZOOM and period not in PERIODS and aggregates_built()
+    if precomputed:
+        rows = _aggregate_rows(bbox, grid_zoom, types)
+    else:
+        # Emprise élargie aux bords de cellules : une cellule est entière ou absente
+        min_y, max_y, min_x, max_x = _cell_range(bbox, size)
+        west, south, _, _ = _cell_bounds(min_y, min_x, size)
+        _, _, east, north = _cell_bounds(max_y, max_x, size)
+        rows = _live_rows(_in_bounds(points, west, south, east, north), grid_zoom)
+    cells = _merge_cells(rows, size)
+
+    singles = _single_points(cells, points, size)
+    features = [
+        point_feature(singles[key]) if key in singles else _cluster_feature(cell)
+        for key, cell in sorted(cells.items())
+    ]
+    return {
+        'type': 'FeatureCollection',
+        'features': features,
+        'zoom': zoom,
+        'cell_size': size,
+        'precomputed': precomputed,
+        'truncated': False,
+    }
+
+
+# --- Construction et mise à jour de MapAggregateCell ---
+def build_map_aggregates(max_zoom=AGGREGATE_MAX_ZOOM, batch_size=BUILD_BATCH_SIZE):
+    """
+    Reconstruit MapAggregateCell : le zoom le plus fin est agrégé depuis
+    ImpactPoint (une requête GROUP BY), chaque zoom inférieur depuis le
+    précédent (2x2 cellules -> 1). Écritures par lots, mémoire bornée.
+    Générateur : produit (zoom, nombre de lignes écrites) par niveau.
+    """
+    with transaction.atomic():
+        MapAggregateCell.objects.all().delete()
+        rows = _live_rows(mapped_points(), max_zoom).iterator(chunk_size=batch_size)
+        yield max_zoom, _write_level(max_zoom, rows, batch_size)
+
+        for zoom in range(max_zoom - 1, -1, -1):
+            # Floor(n / 2) : ligne et colonne de la cellule parente
+            parents = MapAggregateCell.objects.filter(zoom=zoom + 1).annotate(
+                parent_y=Floor(F('cell_y') / 2.0), parent_x=Floor(F('cell_x') / 2.0),
+            ).values('parent_y', 'parent_x', 'type').annotate(
+                total=Sum('count'), values=Sum('value_sum'),
+                latitudes=Sum('latitude_sum'), longitudes=Sum('longitude_sum'),
+            ).order_by().values_list('parent_y', 'parent_x', 'type', 'total', 'values', 'latitudes', 'longitudes')
+            rows = (
+                {'cell_y': y, 'cell_x': x, 'type': type_, 'count': count, 'value_sum': value,
+                 'latitude_sum': lat, 'longitude_sum': lng}
+                for y, x, type_, count, value, lat, lng in parents
+            )
+            yield zoom, _write_level(zoom, rows, batch_size)
+
+
+def _write_level(zoom, rows, batch_size):
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(MapAggregateCell(
+            zoom=zoom, cell_y=int(row['cell_y']), cell_x=int(row['cell_x']), type=row['type'],
+            count=row['count'], value_sum=row['value_sum'] or 0.0,
+            latitude_sum=row['latitude_sum'], longitude_sum=row['longitude_sum'],
+        ))
+        if len(batch) >= batch_size:
+            MapAggregateCell.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    MapAggregateCell.objects.bulk_create(batch)
+    return written + len(batch)
+
+
+def _point_contribution(point):
+    """{(zoom, ligne, colonne, type): (nombre, valeur, latitude, longitude)} d'un point, vide s'il n'est pas placé"""
+    if point is None or point.latitude is None or point.longitude is None:
+        return {}
+    lat, lng = float(point.latitude), float(point.longitude)
+    if lat == 0 and lng == 0:
+        return {}
+    value = float(point.value or 0)
+    return {
+        (zoom, math.floor(lat / cell_size(zoom)), math.floor(lng / cell_size(zoom)), point.type): (1, value, lat, lng)
+        for zoom in range(AGGREGATE_MAX_ZOOM + 1)
+    }
+
+
+def record_point_change(previous, current):
+    """
+    Applique à MapAggregateCell la différence entre l'ancien et le nouvel état
+    d'un ImpactPoint (previous=None pour une création, current=None pour une
+    suppression). Seules les cellules de l'ancienne et de la nouvelle position
+    sont modifiées ; rien n'est fait tant que les agrégats n'ont pas été construits.
+    """
+    record_points_change([(previous, current)])
+
+
+def record_points_change(changes):
+    """Comme record_point_change pour des couples (previous, current), cellules communes cumulées"""
+    deltas = {}
+    for previous, current in changes:
+        old, new = _point_contribution(previous), _point_contribution(current)
+        for key in set(old) | set(new):
+            before, after = old.get(key, (0, 0.0, 0.0, 0.0)), new.get(key, (0, 0.0, 0.0, 0.0))
+            total = deltas.get(key, (0, 0.0, 0.0, 0.0))
+            deltas[key] = tuple(t + a - b for t, a, b in zip(total, after, before))
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas or not aggregates_built():
+        return
+
+    # Cellules existantes : une requête par lot de clés
+    keys = list(deltas)
+    existing = set()
+    for start in range(0, len(keys), MAX_SINGLE_LOOKUPS):
+        existing.update(MapAggregateCell.objects.filter(reduce(or_, (
+            Q(zoom=zoom, cell_y=cell_y, cell_x=cell_x, type=type_)
+            for zoom, cell_y, cell_x, type_ in keys[start:start + MAX_SINGLE_LOOKUPS]
+        ))).values_list('zoom', 'cell_y', 'cell_x', 'type'))
+
+    for key in existing:
+        _apply_cell_delta(key, deltas[key])
+    missing = [key for key in keys if key not in existing and deltas[key][0] > 0]
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            MapAggregateCell.objects.bulk_create([
+                MapAggregateCell(
+                    zoom=zoom, cell_y=cell_y, cell_x=cell_x, type=type_,
+                    count=count, value_sum=value, latitude_sum=lat, longitude_sum=lng,
+                )
+                for (zoom, cell_y, cell_x, type_), (count, value, lat, lng) in ((key, deltas[key]) for key in missing)
+            ])
+    except IntegrityError:
+        # Cellules créées entre-temps par une autre requête : une par une
+        for key in missing:
+            _apply_cell_delta(key, deltas[key])
+
+
+def _apply_cell_delta(key, delta):
+    """Ajoute delta (nombre, valeur, latitude, longitude) à une cellule, créée si besoin"""
+    zoom, cell_y, cell_x, type_ = key
+    count, value, lat, lng = delta
+    cell = MapAggregateCell.objects.filter(zoom=zoom, cell_y=cell_y, cell_x=cell_x, type=type_)
+    updates = {
+        'count': F('count') + count, 'value_sum': F('value_sum') + value,
+        'latitude_sum': F('latitude_sum') + lat, 'longitude_sum': F('longitude_sum') + lng,
+    }
+    if cell.update(**updates):
+        if count < 0:
+            cell.filter(count__lte=0).delete()
+        return
+    if count > 0:
+        try:
+            with transaction.atomic():
+                MapAggregateCell.objects.create(
+                    zoom=zoom, cell_y=cell_y, cell_x=cell_x, type=type_,
+                    count=count, value_sum=value, latitude_sum=lat, longitude_sum=lng,
+                )
+        except IntegrityError:
+            cell.update(**updates)
+
+
+def create_points(points):
+    """
+    Insère des ImpactPoint en une requête (bulk_create, sans signaux) puis
+    applique en une fois ce que les signaux auraient fait point par point :
+    cellules de MapAggregateCell et compteur impact_locations de SiteStatistics
+    (positions distinctes, voir utils._impact_point_contribution).
+    À appeler dans une transaction.
+    """
+    locations = {
+        (point.latitude, point.longitude) for point in points
+        if point.latitude is not None and point.longitude is not None
+    }
+    known = set()
+    if locations:
+        known = set(ImpactPoint.objects.filter(reduce(or_, (
+            Q(latitude=lat, longitude=lng) for lat, lng in locations
+        ))).values_list('latitude', 'longitude'))
+
+    created = ImpactPoint.objects.bulk_create(points)
+    record_points_change([(None, point) for point in created])
+    if len(locations - known):
+        SiteStatistics.objects.filter(pk=SiteStatistics.SINGLETON_ID).update(
+            impact_locations=F('impact_locations') + len(locations - known), updated_at=timezone.now(),
+        )
+    return created
+
+
+# --- Flux des modifications (/api/impact-data/) ---
+def _feed_paginator(limit):
+    # Décalage FEED_LAG : une transaction plus lente à valider que ses voisines
+    # ne peut pas publier une ligne derrière un curseur déjà servi
+    visible = ImpactPoint.objects.filter(updated_at__lte=timezone.now() - FEED_LAG)
+    return CursorPaginator(visible, FEED_ORDERING, per_page=limit)
+
+
+def feed_cursor():
+    """
+    Curseur de départ du polling de la carte : l'horizon du flux (maintenant
+    moins FEED_LAG), sans requête. Les points plus récents déjà affichés
+    seront renvoyés au premier appel, la carte les dédoublonne.
+    """
+    horizon = ImpactPoint(pk=0, updated_at=timezone.now() - FEED_LAG)
+    return _feed_paginator(1).encode_cursor(horizon, 'next')
+
+
+def impact_changes(cursor=None, limit=FEED_BATCH_SIZE):
+    """
+    ImpactPoint créés ou modifiés après le curseur, par ordre (updated_at, id),
+    au plus limit (index (updated_at, id)). Sans curseur : depuis le début.
+    Les suppressions n'apparaissent pas dans le flux.
+    InvalidCursor (ValueError) si le curseur est illisible.
+    """
+    limit = min(max(int(limit), 1), FEED_MAX_BATCH_SIZE)
+    paginator = _feed_paginator(limit)
+    values = paginator.decode_cursor(cursor)[0] if cursor else None
+    rows = paginator.fetch_rows(values, 'next', limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    features = []
+    for point in rows:
+        feature = point_feature(point)
+        feature['properties']['type_label'] = point.get_type_display()
+        feature['properties']['updated_at'] = point.updated_at.isoformat()
+        features.append(feature)
+    return {
+        'features': features,
+        # Pas de nouvelle ligne : le client garde sa position
+        'next_cursor': paginator.encode_cursor(rows[-1], 'next') if rows else (cursor or ''),
+        'has_more': has_more,
+    }
@@ -0,0 +1,224 @@
+"""
+Synchronisation des ImpactPoint issus des dons, participations et contributions staff
+
+Avant : chaque save d'une source faisait un update_or_create (SELECT puis
+INSERT/UPDATE) dans le signal, plus le chargement de l'événement pour une
+participation. Désormais :
+
+- les signaux mettent (modèle, id) dans une file propre au thread
+  (enqueue) et demandent un vidage au commit de la transaction ;
+- flush() regroupe la file par modèle : une requête relit toutes les
+  sources concernées (jointure comprise), un bulk_create(update_conflicts=True)
+  écrit tous les points, une suppression retire ceux dont la source n'est
+  plus éligible ou n'existe plus ; les cellules de la carte des points
+  placés sont ajustées (record_points_change), l'upsert n'ayant pas de signaux ;
+- resync() reconstruit tous les points en SQL ensembliste
+  (INSERT ... SELECT avec upsert), voir la commande resync_impact_points.
+
+L'unicité (related_model, related_id) est garantie par la contrainte
+unique_impact_point_source. Les coordonnées ne sont jamais écrasées par la
+synchronisation : un point placé à la main sur la carte le reste.
+"""
+import threading
+
+from django.db import connection, transaction
+from django.db.models import Case, CharField, DateTimeField, DecimalField, F, Q, Value, When
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .impact_map import aggregates_built, record_points_change
+from .models import Donation, EventParticipation, ImpactPoint, StaffContribution
+
+# Colonnes mises à jour quand le point existe déjà (coordonnées exclues)
+UPDATE_FIELDS = ['type', 'description', 'value', 'status', 'updated_at']
+# Colonnes dont dépendent les agrégats de la carte (MapAggregateCell)
+MAP_FIELDS = ['id', 'type', 'value', 'latitude', 'longitude']
+
+
+class ImpactSource:
+    """Modèle source : points éligibles et valeurs du point, en expressions SQL"""
+
+    def __init__(self, model, point_type, eligible, description, value, status):
+        self.model = model
+        self.name = model.__name__
+        self.point_type = point_type
+        self.eligible = eligible
+        self.expressions = {'description': description, 'value': value, 'status': status}
+
+    def rows(self):
+        """Sources éligibles, annotées des champs du point (préfixe point_)"""
+        return self.model._default_manager.filter(self.eligible).annotate(
+            **{f'point_{name}': expression for name, expression in self.expressions.items()}
+        ).order_by()
+
+
+SOURCES = {
+    source.name: source for source in (
+        ImpactSource(
+            Donation, 'donation', Q(status='completed'),
+            description=Case(
+                When(message='', then=Concat(Value('Don de '), 'donor_name')),
+                default=F('message'), output_field=CharField(),
+            ),
+            value=F('amount'),
+            status=F('status'),
+        ),
+        ImpactSource(
+            EventParticipation, 'participation', Q(status__in=['confirmed', 'attended']),
+            description=Concat(Value('Participation à '), 'event__title', output_field=CharField()),
+            value=Value(None, output_field=DecimalField()),
+            status=F('status'),
+        ),
+        ImpactSource(
+            StaffContribution, 'contribution', Q(is_recorded=True, validated_at__isnull=False),
+            description=Case(
+                When(object='', then=Concat(Value('Contribution staff '), 'month')),
+                default=F('object'), output_field=CharField(),
+            ),
+            value=F('amount'),
+            status=Value('completed', output_field=CharField()),
+        ),
+    )
+}
+
+
+# --- File d'attente par thread, vidée au commit ---
+_local = threading.local()
+
+
+def _queue():
+    if not hasattr(_local, 'pending'):
+        _local.pending = set()
+    return _local.pending
+
+
+def enqueue(instance):
+    """
+    Demande la synchronisation du point d'une source après le commit.
+    Le vidage est redemandé à chaque appel : si la transaction (ou le
+    savepoint) qui l'avait demandé est annulé, le suivant s'en charge, et
+    flush() relit l'état en base, donc un élément en trop est sans effet.
+    """
+    _queue().add((type(instance).__name__, instance.pk))
+    transaction.on_commit(flush, robust=True)
+
+
+def flush():
+    """Synchronise toutes les sources en attente ; retourne le nombre de sources traitées"""
+    queue = _queue()
+    if not queue:
+        return 0
+    pending = {}
+    while queue:
+        name, pk = queue.pop()
+        pending.setdefault(name, set()).add(pk)
+    for name, ids in pending.items():
+        synchronize(SOURCES[name], ids)
+    return sum(len(ids) for ids in pending.values())
+
+
+def _upsert_options():
+    options = {'update_conflicts': True, 'update_fields': UPDATE_FIELDS}
+    if connection.features.supports_update_conflicts_with_target:
+        # MySQL : ON DUPLICATE KEY UPDATE, sans cible explicite
+        options['unique_fields'] = ['related_model', 'related_id']
+    return options
+
+
+def _placed_points(source, related_ids):
+    """Points déjà placés sur la carte de ces sources, {id: point}, si les agrégats sont construits"""
+    if not aggregates_built():
+        return {}
+    points = ImpactPoint.objects.filter(
+        related_model=source.name, related_id__in=related_ids,
+        latitude__isnull=False, longitude__isnull=False,
+    ).only(*MAP_FIELDS)
+    return {point.pk: point for point in points}
+
+
+def _record_map_changes(previous):
+    """
+    L'upsert ne déclenche pas les signaux d'ImpactPoint : applique à
+    MapAggregateCell les changements de type et de valeur des points placés
+    (les coordonnées ne changent pas, les points créés ne sont pas placés).
+    """
+    if not previous:
+        return
+    current = ImpactPoint.objects.filter(pk__in=previous).only(*MAP_FIELDS)
+    record_points_change([
+        (previous[point.pk], point) for point in current
+        if (point.type, point.value) != (previous[point.pk].type, previous[point.pk].value)
+    ])
+
+
+def synchronize(source, ids):
+    """Crée ou met à jour les points des sources ids, supprime ceux des sources non éligibles"""
+    rows = list(source.rows().filter(pk__in=ids).values(
+        'pk', 'point_description', 'point_value', 'point_status',
+    ))
+    if rows:
+        previous = _placed_points(source, [row['pk'] for row in rows])
+        ImpactPoint.objects.bulk_create([
+            ImpactPoint(
+                type=source.point_type, related_model=source.name, related_id=row['pk'],
+                description=row['point_description'], value=row['point_value'], status=row['point_status'],
+            )
+            for row in rows
+        ], **_upsert_options())
+        _record_map_changes(previous)
+    stale = set(ids) - {row['pk'] for row in rows}
+    if stale:
+        # Suppression par l'ORM : les signaux d'ImpactPoint (statistiques, agrégats de carte) suivent
+        ImpactPoint.objects.filter(related_model=source.name, related_id__in=stale).delete()
+
+
+# --- Reconstruction complète ---
+def _upsert_sql(source):
+    """INSERT ... SELECT de tous les points d'une source, avec mise à jour des points existants"""
+    now = timezone.now()
+    select = source.model._default_manager.filter(source.eligible).annotate(
+        # Ordre des annotations = ordre des colonnes de l'INSERT
+        point_type=Value(source.point_type, output_field=CharField()),
+        point_related_model=Value(source.name, output_field=CharField()),
+        point_related_id=F('pk'),
+        **{f'point_{name}': expression for name, expression in source.expressions.items()},
+        point_created_at=Value(now, output_field=DateTimeField()),
+        point_updated_at=Value(now, output_field=DateTimeField()),
+    ).order_by().values_list(
+        'point_type', 'point_related_model', 'point_related_id', 'point_description', 'point_value',
+        'point_status', 'point_created_at', 'point_updated_at',
+    )
+    select_sql, params = select.query.sql_with_params()
+
+    qn = connection.ops.quote_name
+    columns = ['type', 'related_model', 'related_id', 'description', 'value', 'status', 'created_at', 'updated_at']
+    sql = f'INSERT INTO {qn(ImpactPoint._meta.db_table)} ({", ".join(map(qn, columns))}) {select_sql} '
+    if connection.vendor == 'mysql':
+        sql += 'ON DUPLICATE KEY UPDATE ' + ', '.join(f'{qn(c)} = VALUES({qn(c)})' for c in UPDATE_FIELDS)
+    else:
+        sql += (
+            f'ON CONFLICT ({qn("related_model")}, {qn("related_id")}) DO UPDATE SET '
+            + ', '.join(f'{qn(c)} = excluded.{qn(c)}' for c in UPDATE_FIELDS)
+        )
+    return sql, params
+
+
+def resync(prune=False):
+    """
+    Reconstruit les points de chaque source : une requête INSERT ... SELECT
+    par modèle. prune=True supprime en plus les points dont la source n'est
+    plus éligible ou n'existe plus. Générateur : (modèle, points, supprimés).
+    L'upsert ne met pas MapAggregateCell à jour : relancer ensuite
+    build_map_aggregates (fait par la commande resync_impact_points).
+    """
+    for source in SOURCES.values():
+        with transaction.atomic():
+            sql, params = _upsert_sql(source)
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+            deleted = 0
+            if prune:
+                deleted, _ = ImpactPoint.objects.filter(related_model=source.name).exclude(
+                    related_id__in=source.model._default_manager.filter(source.eligible).values('pk')
+                ).delete()
+        yield source.name, ImpactPoint.objects.filter(related_model=source.name).count(), deleted
@@ -0,0 +1,94 @@
+"""
+Classement des utilisateurs par points
+
+- LeaderboardEntry est un instantané du classement (rangs denses, global et
+  par rôle), reconstruit périodiquement par la commande rebuild_leaderboard
+  (cron) ;
+- un gain de points ne recalcule que l'entrée de l'utilisateur : son rang
+  est lu sur l'entrée voisine par un parcours d'index (O(log n)), sans
+  COUNT sur toute la table des profils. Les rangs des autres entrées sont
+  réalignés à la reconstruction suivante.
+"""
+from django.db import transaction
+
+from .models import LeaderboardEntry, UserProfile
+
+# Rôles proposés comme filtres du classement
+LEADERBOARD_ROLES = ('child', 'volunteer', 'donor')
+
+
+def rebuild_leaderboard(chunk_size=2000):
+    """Recalcule tout l'instantané en un parcours des profils triés. Retourne le nombre d'entrées."""
+    count = 0
+    rank, last_points = 0, None
+    role_ranks = {}  # rôle -> (rang, points du précédent)
+
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        batch = []
+        profiles = UserProfile.objects.order_by('-points', 'id').values_list('user_id', 'role', 'points')
+        for user_id, role, points in profiles.iterator(chunk_size=chunk_size):
+            if points != last_points:
+                rank, last_points = rank + 1, points
+            role_rank, role_last_points = role_ranks.get(role, (0, None))
+            if points != role_last_points:
+                role_rank += 1
+            role_ranks[role] = (role_rank, points)
+
+            batch.append(LeaderboardEntry(
+                user_id=user_id, role=role, points=points, rank=rank, role_rank=role_rank,
+            ))
+            if len(batch) >= chunk_size:
+                LeaderboardEntry.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            LeaderboardEntry.objects.bulk_create(batch)
+            count += len(batch)
+    return count
+
+
+def rank_for_points(points, role=None, exclude_user_id=None):
+    """
+    Rang dense correspondant à un nombre de points, lu sur l'entrée la plus
+    proche ayant au moins autant de points (index sur points / role+points).
+    """
+    entries = LeaderboardEntry.objects.all()
+    rank_field = 'rank'
+    if role:
+        entries = entries.filter(role=role)
+        rank_field = 'role_rank'
+    if exclude_user_id is not None:
+        entries = entries.exclude(user_id=exclude_user_id)
+
+    neighbour = entries.filter(points__gte=points).order_by('points').values_list('points', rank_field).first()
+    if neighbour is None:
+        return 1
+    neighbour_points, neighbour_rank = neighbour
+    return neighbour_rank if neighbour_points == points else neighbour_rank + 1
+
+
+def get_user_rank(user, role=None):
+    """Rang de l'utilisateur dans l'instantané (ou calculé depuis ses points s'il n'y figure pas)"""
+    rank_field = 'role_rank' if role else 'rank'
+    entry = LeaderboardEntry.objects.filter(user=user).values_list('role', rank_field).first()
+    if entry is not None:
+        entry_role, rank = entry
+        return rank if role in (None, entry_role) else None
+    profile = UserProfile.objects.filter(user=user).values_list('role', 'points').first()
+    if profile is None or (role and profile[0] != role):
+        return None
+    return rank_for_points(profile[1], role=role)
+
+
+def update_leaderboard_entry(profile):
+    """Met à jour l'entrée d'un profil après un changement de points ou de rôle"""
+    LeaderboardEntry.objects.update_or_create(
+        user_id=profile.user_id,
+        defaults={
+            'role': profile.role,
+            'points': profile.points,
+            'rank': rank_for_points(profile.points, exclude_user_id=profile.user_id),
+            'role_rank': rank_for_points(profile.points, role=profile.role, exclude_user_id=profile.user_id),
+        },
+    )
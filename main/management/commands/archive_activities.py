@@ -0,0 +1,52 @@
+"""
+Commande d'archivage des activités anciennes (à planifier en cron, ex: chaque mois)
+Usage: python manage.py archive_activities [--months 12] [--chunk-size 5000] [--dry-run]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from main.activity_log import ARCHIVE_CHUNK_SIZE, archive_activities, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Déplace les activités de plus de N mois de UserActivity vers UserActivityArchive (JSON compressé)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=12,
+            help='Nombre de mois conservés dans la table vive, mois courant exclu (défaut: 12)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=ARCHIVE_CHUNK_SIZE,
+            help=f'Nombre de lignes archivées par transaction (défaut: {ARCHIVE_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compte les activités à archiver sans rien modifier',
+        )
+
+    def handle(self, *args, **options):
+        if options['months'] < 0 or options['chunk_size'] < 1:
+            raise CommandError('--months doit être positif et --chunk-size au moins 1')
+
+        cutoff = archive_cutoff(options['months'])
+        self.stdout.write(self.style.WARNING(f'🔄 Archivage des activités antérieures au {cutoff:%d/%m/%Y}...'))
+        started = time.perf_counter()
+
+        total = 0
+        for count in archive_activities(options['months'], options['chunk_size'], options['dry_run']):
+            total += count
+            if options['verbosity'] > 1 and not options['dry_run']:
+                self.stdout.write(f'   {total} activité(s) archivée(s)...')
+
+        elapsed = time.perf_counter() - started
+        if options['dry_run']:
+            self.stdout.write(f'   {total} activité(s) à archiver')
+            self.stdout.write(self.style.WARNING('ℹ️  Mode --dry-run : aucune modification enregistrée'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} activité(s) archivée(s) en {elapsed:.2f}s'))
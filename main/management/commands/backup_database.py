@@ -1,16 +1,32 @@
 """
 Commande de backup automatique de la base de données
-Usage: python manage.py backup_database
+Usage: python manage.py backup_database [--chunk-size 2000] [--jobs 1] [--legacy] [--benchmark]
+
+Par défaut : sauvegarde en flux, un fichier .jsonl.gz par modèle et un
+manifeste (voir main/backup.py), mémoire constante quelle que soit la taille
+de la base. --legacy : ancien format, un seul fichier JSON produit par
+dumpdata (tout le jeu de données sérialisé en mémoire).
+--benchmark : lance les deux dans des processus séparés et compare durée,
+mémoire maximale et taille (les sauvegardes de mesure sont supprimées).
 """
-from django.core.management.base import BaseCommand
-from django.core.management import call_command
-from django.conf import settings
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 from datetime import datetime
 
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from main.backup import CHUNK_SIZE, PARTIAL_SUFFIX, create_backup
+
+KEEP_BACKUPS = 10
+
 
 class Command(BaseCommand):
-    help = 'Crée un backup complet de la base de données au format JSON'
+    help = 'Crée un backup complet de la base de données (JSON Lines compressé, un fichier par modèle)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -19,64 +35,130 @@ class Command(BaseCommand):
             default='backups',
             help='Répertoire de sortie pour les backups (défaut: backups/)'
         )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help=f'Nombre de lignes lues par requête (défaut: {CHUNK_SIZE})')
+        parser.add_argument('--jobs', type=int, default=1,
+                            help='Nombre de processus, un modèle à la fois par processus '
+                                 '(défaut: 1 ; au-delà, pas d\'instantané cohérent entre les tables)')
+        parser.add_argument('--legacy', action='store_true',
+                            help='Ancien format : un seul fichier JSON produit par dumpdata')
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Compare l\'ancien et le nouveau format (durée, mémoire, taille)')
 
     def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['jobs'] < 1:
+            raise CommandError('--chunk-size et --jobs doivent être au moins 1')
+
+        if options['benchmark']:
+            self._benchmark(options)
+            return
+
         output_dir = options['output_dir']
-        
-        # Créer le répertoire de backup s'il n'existe pas
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Générer le nom de fichier avec timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = os.path.join(output_dir, f'backup_{timestamp}.json')
-        
         self.stdout.write(self.style.WARNING(f'🔄 Création du backup...'))
-        
+
         try:
-            # Exporter les données
-            with open(filename, 'w', encoding='utf-8') as f:
-                call_command(
-                    'dumpdata',
-                    '--natural-foreign',
-                    '--natural-primary',
-                    '-e', 'contenttypes',
-                    '-e', 'auth.Permission',
-                    '--indent', '4',
-                    stdout=f
+            if options['legacy']:
+                path = self._legacy_backup(output_dir)
+                size = os.path.getsize(path)
+                details = ''
+            else:
+                path, manifest = create_backup(
+                    output_dir, chunk_size=options['chunk_size'], jobs=options['jobs'],
+                    progress=self._progress if options['verbosity'] > 1 else None,
                 )
-            
-            # Vérifier la taille du fichier
-            file_size = os.path.getsize(filename)
-            size_mb = file_size / (1024 * 1024)
-            
+                size = sum(entry['bytes'] for entry in manifest['models'])
+                rows = sum(entry['rows'] for entry in manifest['models'])
+                details = f'\n   Lignes  : {rows} ({len(manifest["models"])} modèles)'
+
             self.stdout.write(
                 self.style.SUCCESS(
                     f'✅ Backup créé avec succès !\n'
-                    f'   Fichier : {filename}\n'
-                    f'   Taille  : {size_mb:.2f} MB'
+                    f'   Fichier : {path}\n'
+                    f'   Taille  : {size / (1024 * 1024):.2f} MB'
+                    f'{details}'
                 )
             )
-            
+
             # Nettoyer les vieux backups (garder les 10 derniers)
-            self._cleanup_old_backups(output_dir, keep=10)
-            
+            self._cleanup_old_backups(output_dir, keep=KEEP_BACKUPS)
+
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'❌ Erreur lors du backup : {str(e)}')
             )
             raise
 
+    def _progress(self, entry):
+        self.stdout.write(f"   {entry['model']} : {entry['rows']} ligne(s) en {entry['seconds']:.2f}s")
+
+    def _legacy_backup(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = os.path.join(output_dir, f'backup_{timestamp}.json')
+        with open(filename, 'w', encoding='utf-8') as f:
+            call_command(
+                'dumpdata',
+                '--natural-foreign',
+                '--natural-primary',
+                '-e', 'contenttypes',
+                '-e', 'auth.Permission',
+                '--indent', '4',
+                stdout=f
+            )
+        return filename
+
+    def _benchmark(self, options):
+        """Chaque format dans un processus à part : mémoire maximale mesurée par os.wait4"""
+        self.stdout.write(self.style.WARNING('⏱️  Benchmark des sauvegardes (fichiers de mesure supprimés)'))
+        self.stdout.write(f"   {'format':<24} {'durée (s)':>10} {'mémoire max (Mo)':>17} {'taille (Mo)':>12}")
+        runs = [
+            ('dumpdata (--legacy)', ['--legacy']),
+            ('flux jsonl.gz', ['--chunk-size', str(options['chunk_size'])]),
+        ]
+        if options['jobs'] > 1:
+            runs.append((f'flux, {options["jobs"]} processus',
+                         ['--chunk-size', str(options['chunk_size']), '--jobs', str(options['jobs'])]))
+
+        for label, arguments in runs:
+            directory = tempfile.mkdtemp(prefix='aime_backup_bench_')
+            try:
+                command = [sys.executable, '-m', 'django', 'backup_database', '--output-dir', directory, *arguments]
+                started = time.perf_counter()
+                process = subprocess.Popen(command, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL)
+                _, status, usage = os.wait4(process.pid, 0)
+                elapsed = time.perf_counter() - started
+                if os.waitstatus_to_exitcode(status) != 0:
+                    raise CommandError(f'Échec de la sauvegarde « {label} »')
+                size = sum(
+                    os.path.getsize(os.path.join(root, name))
+                    for root, _, names in os.walk(directory) for name in names
+                )
+                # ru_maxrss : en Ko sous Linux (processus principal ; --jobs : pool non compté)
+                self.stdout.write(
+                    f'   {label:<24} {elapsed:>10.2f} {usage.ru_maxrss / 1024:>17.0f} {size / (1024 * 1024):>12.2f}'
+                )
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark terminé'))
+
     def _cleanup_old_backups(self, directory, keep=10):
-        """Supprime les vieux backups, garde seulement les N derniers"""
-        backup_files = sorted(
-            [f for f in os.listdir(directory) if f.startswith('backup_') and f.endswith('.json')],
+        """Supprime les vieux backups (fichiers JSON et répertoires), garde seulement les N derniers"""
+        backups = sorted(
+            [
+                name for name in os.listdir(directory)
+                if name.startswith('backup_') and not name.endswith(PARTIAL_SUFFIX)
+                and (name.endswith('.json') or os.path.isdir(os.path.join(directory, name)))
+            ],
             reverse=True
         )
-        
-        if len(backup_files) > keep:
-            for old_backup in backup_files[keep:]:
+
+        if len(backups) > keep:
+            for old_backup in backups[keep:]:
                 old_path = os.path.join(directory, old_backup)
-                os.remove(old_path)
+                if os.path.isdir(old_path):
+                    shutil.rmtree(old_path)
+                else:
+                    os.remove(old_path)
                 self.stdout.write(
                     self.style.WARNING(f'🗑️  Ancien backup supprimé : {old_backup}')
                 )
@@ -0,0 +1,95 @@
+"""
+Mesure du coût d'une lecture de rang : COUNT sur les profils contre l'instantané du classement
+Usage: python manage.py benchmark_leaderboard [--sizes 1000,10000,100000] [--lookups 200]
+
+Les profils de test sont créés dans une transaction annulée à la fin :
+la base n'est pas modifiée.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from main.leaderboard import LEADERBOARD_ROLES, rank_for_points, rebuild_leaderboard
+from main.models import LeaderboardEntry, UserProfile
+
+BATCH_SIZE = 5000
+MAX_POINTS = 50000
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare le calcul du rang par COUNT(*) et par l'instantané LeaderboardEntry"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Nombres de profils mesurés, croissants (défaut: 1000,10000,100000)')
+        parser.add_argument('--lookups', type=int, default=200,
+                            help='Nombre de rangs lus par mesure (défaut: 200)')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes attend des entiers séparés par des virgules')
+
+        self.stdout.write(self.style.WARNING('⏱️  Benchmark du classement (transaction annulée à la fin)'))
+        self.stdout.write(f"   {'profils':>10} {'COUNT (ms)':>12} {'instantané (ms)':>16} {'rang incr. (ms)':>16}")
+        try:
+            with transaction.atomic():
+                self._run(sizes, options['lookups'])
+                raise Rollback
+        except Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark terminé, aucune donnée conservée'))
+
+    def _run(self, sizes, lookups):
+        created = 0
+        roles = list(LEADERBOARD_ROLES) + ['member']
+        for size in sizes:
+            self._create_profiles(created, size - created, roles)
+            created = size
+            rebuild_leaderboard()
+
+            sample = list(
+                UserProfile.objects.filter(user__username__startswith='bench_')
+                .order_by('?').values_list('user_id', 'points')[:lookups]
+            )
+            count_ms = self._measure(
+                sample, lambda user_id, points: UserProfile.objects.filter(points__gt=points).count() + 1
+            )
+            snapshot_ms = self._measure(
+                sample, lambda user_id, points: LeaderboardEntry.objects.filter(user_id=user_id).values_list('rank', flat=True).first()
+            )
+            incremental_ms = self._measure(
+                sample, lambda user_id, points: rank_for_points(points + 1, exclude_user_id=user_id)
+            )
+            self.stdout.write(f'   {size:>10} {count_ms:>12.3f} {snapshot_ms:>16.3f} {incremental_ms:>16.3f}')
+
+    def _create_profiles(self, offset, count, roles):
+        for start in range(offset, offset + count, BATCH_SIZE):
+            stop = min(start + BATCH_SIZE, offset + count)
+            # bulk_create n'émet pas de signaux : ni profil automatique ni statistiques
+            users = User.objects.bulk_create(
+                [User(username=f'bench_{index}', password='!') for index in range(start, stop)]
+            )
+            if users and users[0].pk is None:
+                users = User.objects.filter(username__in=[user.username for user in users])
+            UserProfile.objects.bulk_create([
+                UserProfile(user=user, role=random.choice(roles), points=random.randint(0, MAX_POINTS))
+                for user in users
+            ])
+
+    @staticmethod
+    def _measure(sample, lookup):
+        timings = []
+        for user_id, points in sample:
+            started = time.perf_counter()
+            lookup(user_id, points)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
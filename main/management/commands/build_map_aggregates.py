@@ -0,0 +1,36 @@
+"""
+Précalcul des agrégats de la carte d'impact (voir main/impact_map.py)
+Usage: python manage.py build_map_aggregates [--batch-size 5000]
+
+Reconstruit entièrement MapAggregateCell, du zoom AGGREGATE_MAX_ZOOM au
+zoom 0. Ensuite, les signaux d'ImpactPoint tiennent les cellules à jour :
+relancer la commande n'est utile qu'après des écritures sans signaux
+(bulk_create, update(), import SQL).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from main.impact_map import AGGREGATE_MAX_ZOOM, BUILD_BATCH_SIZE, build_map_aggregates
+
+
+class Command(BaseCommand):
+    help = "Précalcule les cellules de regroupement de la carte d'impact pour chaque niveau de zoom"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BUILD_BATCH_SIZE,
+                            help=f'Nombre de cellules écrites par requête (défaut: {BUILD_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size doit être au moins 1')
+
+        started = time.perf_counter()
+        total = 0
+        for zoom, written in build_map_aggregates(AGGREGATE_MAX_ZOOM, options['batch_size']):
+            total += written
+            if options['verbosity'] > 1:
+                self.stdout.write(f'   zoom {zoom} : {written} cellule(s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total} cellule(s) sur {AGGREGATE_MAX_ZOOM + 1} niveaux de zoom en {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,185 @@
+"""
+Test de charge du flux de chat (SSE), exécuté dans le processus
+Usage: python manage.py chat_loadtest [--connections 500] [--idle 20] [--messages 20]
+
+Ouvre N connexions visiteur sur l'application ASGI (sans serveur HTTP),
+mesure le CPU consommé pendant qu'elles attendent, puis la latence de
+livraison : des messages isolés (signal post_save) et une rafale d'un
+message par conversation. Les conversations créées sont supprimées à la fin.
+"""
+import asyncio
+import re
+import resource
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from main.chat_events import broker, visitor_token
+from main.models import ChatConversation, ChatMessage, ChatVisitor
+
+EVENT_ID = re.compile(rb'^id: (\d+)$', re.MULTILINE)
+LOADTEST_VISITOR_NAME = 'chat_loadtest_visitor'
+
+
+class Connection:
+    def __init__(self, conversation_id, token):
+        self.conversation_id = conversation_id
+        self.token = token
+        self.status = None
+        self.started = asyncio.Event()
+        self.updated = asyncio.Event()
+        self.received = {}  # id du message -> instant de réception
+
+
+class Command(BaseCommand):
+    help = 'Mesure le coût des connexions SSE inactives et la latence de livraison des messages de chat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=500,
+                            help='Nombre de connexions ouvertes (défaut: 500)')
+        parser.add_argument('--idle', type=float, default=20,
+                            help="Durée de la mesure à vide, en secondes (défaut: 20)")
+        parser.add_argument('--messages', type=int, default=20,
+                            help='Nombre de messages isolés envoyés (défaut: 20)')
+
+    def handle(self, *args, **options):
+        if options['connections'] < 1:
+            raise CommandError('--connections doit être au moins 1')
+        visitor, conversations = self._setup(options['connections'])
+        try:
+            asyncio.run(self._run(conversations, options['idle'], options['messages']))
+        finally:
+            # Conversations et messages supprimés en cascade
+            visitor.delete()
+        self.stdout.write(self.style.SUCCESS('✅ Test terminé, données de test supprimées'))
+
+    def _setup(self, count):
+        visitor = ChatVisitor.objects.create(name=LOADTEST_VISITOR_NAME)
+        conversations = ChatConversation.objects.bulk_create(
+            [ChatConversation(visitor=visitor) for _ in range(count)]
+        )
+        if conversations[0].pk is None:
+            conversations = list(ChatConversation.objects.filter(visitor=visitor).order_by('id'))
+        return visitor, conversations
+
+    async def _run(self, conversations, idle, message_count):
+        app = get_asgi_application()
+        loop = asyncio.get_running_loop()
+        after = await ChatMessage.objects.order_by('-id').values_list('id', flat=True).afirst() or 0
+        connections = [Connection(c.pk, visitor_token(c.pk)) for c in conversations]
+
+        self.stdout.write(self.style.WARNING(f'🔌 Ouverture de {len(connections)} connexion(s)...'))
+        started = loop.time()
+        tasks = [loop.create_task(self._connect(app, connection, after)) for connection in connections]
+        await asyncio.gather(*(connection.started.wait() for connection in connections))
+        statuses = {connection.status for connection in connections}
+        if statuses != {200}:
+            raise CommandError(f'Réponses inattendues du flux : {sorted(statuses)}')
+        self.stdout.write(f'   ouvertes en {loop.time() - started:.2f}s ({broker.subscriber_count()} abonnés)')
+
+        try:
+            # Connexions inactives : CPU du processus pendant l'attente
+            cpu, wall = time.process_time(), time.perf_counter()
+            await asyncio.sleep(idle)
+            cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+            self.stdout.write(
+                f'   à vide : {cpu * 1000:.0f} ms CPU en {wall:.1f}s '
+                f'({100 * cpu / wall:.2f}% d\'un cœur), RSS max {self._max_rss_mb():.0f} Mo'
+            )
+
+            # Messages isolés : création ORM -> signal -> réveil de la seule connexion concernée
+            latencies = []
+            for index in range(message_count):
+                connection = connections[index * 7919 % len(connections)]
+                sent = loop.time()
+                message = await sync_to_async(ChatMessage.objects.create)(
+                    conversation_id=connection.conversation_id, content=f'message {index}',
+                )
+                latencies.append(await self._delivered(connection, message.pk) - sent)
+            if latencies:
+                latencies.sort()
+                self.stdout.write(
+                    f'   messages isolés : médiane {statistics.median(latencies) * 1000:.1f} ms, '
+                    f'max {latencies[-1] * 1000:.1f} ms (création en base comprise)'
+                )
+
+            # Rafale : un message par conversation, toutes les connexions réveillées
+            cpu = time.process_time()
+            sent = loop.time()
+            ids = await sync_to_async(self._burst)(conversations)
+            arrivals = await asyncio.gather(*(
+                self._delivered(connection, ids[connection.conversation_id]) for connection in connections
+            ))
+            self.stdout.write(
+                f'   rafale de {len(connections)} messages : tous livrés en {(max(arrivals) - sent) * 1000:.0f} ms, '
+                f'{(time.process_time() - cpu) * 1000:.0f} ms CPU'
+            )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _burst(self, conversations):
+        messages = ChatMessage.objects.bulk_create(
+            [ChatMessage(conversation=c, content='rafale') for c in conversations]
+        )
+        if messages[0].pk is None:
+            messages = ChatMessage.objects.filter(conversation__in=conversations, content='rafale')
+        # bulk_create n'émet pas post_save : publication explicite
+        broker.publish(*(c.pk for c in conversations))
+        return {message.conversation_id: message.pk for message in messages}
+
+    async def _delivered(self, connection, message_id, timeout=30):
+        try:
+            while message_id not in connection.received:
+                connection.updated.clear()
+                await asyncio.wait_for(connection.updated.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise CommandError(f'Message {message_id} non livré après {timeout}s')
+        return connection.received[message_id]
+
+    async def _connect(self, app, connection, after):
+        loop = asyncio.get_running_loop()
+        path = reverse('main:chat_stream')
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+            'query_string': f'token={connection.token}&after={after}'.encode(),
+            'headers': [(b'host', host.encode()), (b'accept', b'text/event-stream')],
+            'client': ('127.0.0.1', 0), 'server': (host, 80),
+        }
+        request_sent = False
+        closed = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await closed.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                connection.status = message['status']
+                connection.started.set()
+            elif message['type'] == 'http.response.body':
+                now = loop.time()
+                for message_id in EVENT_ID.findall(message.get('body', b'')):
+                    connection.received[int(message_id)] = now
+                connection.updated.set()
+
+        try:
+            await app(scope, receive, send)
+        finally:
+            closed.set()
+            connection.started.set()
+
+    @staticmethod
+    def _max_rss_mb():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
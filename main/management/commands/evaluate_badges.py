@@ -0,0 +1,51 @@
+"""
+Commande d'attribution des badges en lot (à planifier en cron, ex: toutes les nuits)
+Usage: python manage.py evaluate_badges [--chunk-size 2000] [--dry-run]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from main.gamification import BADGES, evaluate_badges
+
+
+class Command(BaseCommand):
+    help = 'Attribue les badges du catalogue aux utilisateurs qui y ont droit (relançable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help="Nombre d'utilisateurs évalués par tranche (défaut: 2000)",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche les badges à attribuer sans rien enregistrer',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        self.stdout.write(self.style.WARNING('🔄 Évaluation des badges...'))
+        started = time.perf_counter()
+
+        totals = {}
+        for last_id, counts in evaluate_badges(chunk_size=options['chunk_size'], dry_run=dry_run):
+            for code, count in counts.items():
+                totals[code] = totals.get(code, 0) + count
+            if options['verbosity'] > 1:
+                self.stdout.write(f'   utilisateurs ≤ {last_id} : {sum(counts.values())} nouveau(x) badge(s)')
+
+        elapsed = time.perf_counter() - started
+        if not totals:
+            self.stdout.write(self.style.SUCCESS(f'✅ Aucun nouveau badge ({elapsed:.2f}s)'))
+            return
+
+        for code, count in sorted(totals.items()):
+            self.stdout.write(f"   {BADGES[code]['name']:<20} {count}")
+        if dry_run:
+            self.stdout.write(self.style.WARNING('ℹ️  Mode --dry-run : aucune modification enregistrée'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {sum(totals.values())} badge(s) attribué(s) en {elapsed:.2f}s'
+            ))
@@ -0,0 +1,19 @@
+"""
+Commande de reconstruction du classement (à planifier en cron, ex: toutes les heures)
+Usage: python manage.py rebuild_leaderboard
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from main.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Recalcule la table LeaderboardEntry (rangs denses global et par rôle)'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('🔄 Reconstruction du classement...'))
+        started = time.perf_counter()
+        count = rebuild_leaderboard()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'✅ {count} entrée(s) classée(s) en {elapsed:.2f}s'))
@@ -0,0 +1,31 @@
+"""
+Commande de reconstruction de l'index de recherche plein texte
+Usage: python manage.py rebuild_search_index [--model Project]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from main.search import SEARCH_SOURCES, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la table SearchDocument (et l'index FTS5 sous SQLite)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            choices=[model.__name__ for model in SEARCH_SOURCES],
+            help='Limite la reconstruction à ce modèle (option répétable)',
+        )
+
+    def handle(self, *args, **options):
+        models = None
+        if options['model']:
+            models = [model for model in SEARCH_SOURCES if model.__name__ in options['model']]
+            if not models:
+                raise CommandError('Aucun modèle indexable sélectionné')
+
+        self.stdout.write(self.style.WARNING("🔄 Reconstruction de l'index de recherche..."))
+        counts = rebuild_index(models)
+        for label, count in counts.items():
+            self.stdout.write(f'   {label:<22} {count} document(s)')
+        self.stdout.write(self.style.SUCCESS('✅ Index de recherche à jour'))
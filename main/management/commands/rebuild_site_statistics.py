@@ -0,0 +1,36 @@
+"""
+Commande de recalcul complet des statistiques du site
+Usage: python manage.py rebuild_site_statistics [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from main.utils import rebuild_site_statistics
+
+
+class Command(BaseCommand):
+    help = 'Recalcule la table SiteStatistics depuis les données et affiche les écarts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche uniquement les écarts sans modifier les compteurs',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        self.stdout.write(self.style.WARNING('🔄 Recalcul des statistiques du site...'))
+
+        stats, drift = rebuild_site_statistics(dry_run=dry_run)
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('✅ Aucun écart : les compteurs sont à jour'))
+            return
+
+        self.stdout.write(f'⚠️  {len(drift)} compteur(s) en écart :')
+        for field, (stored, live) in sorted(drift.items()):
+            self.stdout.write(f'   {field:<22} stocké={stored}  réel={live}')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('ℹ️  Mode --dry-run : aucune modification enregistrée'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Compteurs corrigés'))
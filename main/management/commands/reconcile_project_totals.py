@@ -0,0 +1,39 @@
+"""
+Commande de réconciliation des totaux dénormalisés des projets
+Usage: python manage.py reconcile_project_totals [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from main.utils import reconcile_project_totals
+
+
+class Command(BaseCommand):
+    help = 'Recalcule raised_amount et donor_count des projets ayant des dons, depuis les dons complétés'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Affiche uniquement les écarts sans modifier les projets',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        self.stdout.write(self.style.WARNING('🔄 Réconciliation des totaux des projets...'))
+
+        drift = reconcile_project_totals(dry_run=dry_run)
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('✅ Aucun écart : les totaux sont à jour'))
+            return
+
+        self.stdout.write(f'⚠️  {len(drift)} projet(s) en écart :')
+        for project, ((stored_amount, stored_donors), (amount, donors)) in drift.items():
+            self.stdout.write(
+                f'   {project.name[:40]:<40} collecté={stored_amount} → {amount}  '
+                f'donateurs={stored_donors} → {donors}'
+            )
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('ℹ️  Mode --dry-run : aucune modification enregistrée'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Totaux corrigés'))
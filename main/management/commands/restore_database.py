@@ -1,94 +1,124 @@
 """
 Commande Django pour restaurer une base de données depuis un backup
-Usage: python manage.py restore_database <backup_file>
+Usage: python manage.py restore_database <backup> [--flush] [--no-input] [--chunk-size 2000]
+
+<backup> : répertoire produit par backup_database (manifest.json et un
+fichier .jsonl.gz par modèle), restauré en flux par main.backup.restore_backup :
+lots insérés dans l'ordre des dépendances, signaux de l'application débranchés,
+clés étrangères vérifiées à la fin, mémoire constante.
+Ancien format (backup_database --legacy, .json ou .json.gz) : loaddata, qui
+lit le fichier compressé directement, signaux de l'application débranchés aussi.
 """
+import time
 
-from django.core.management.base import BaseCommand, CommandError
-from django.core.management import call_command
 from django.conf import settings
-import gzip
-import os
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from main.backup import (
+    CHUNK_SIZE, MANIFEST_NAME, InvalidBackup, app_signals_disabled, read_manifest, restore_backup,
+)
 
 
 class Command(BaseCommand):
-    help = 'Restaure la base de données depuis un fichier backup'
+    help = 'Restaure la base de données depuis un backup (répertoire JSON Lines ou ancien fichier JSON)'
 
     def add_arguments(self, parser):
         parser.add_argument(
             'backup_file',
             type=str,
-            help='Nom du fichier de backup (dans le répertoire backups/)'
+            help='Nom du backup (répertoire ou fichier, dans le répertoire backups/)'
         )
         parser.add_argument(
             '--flush',
             action='store_true',
             help='Vider la base de données avant la restauration (ATTENTION: supprime toutes les données)',
         )
+        parser.add_argument('--no-input', action='store_false', dest='interactive',
+                            help='Ne pas demander de confirmation avant --flush')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help=f'Nombre de lignes insérées par lot (défaut: {CHUNK_SIZE})')
 
     def handle(self, *args, **options):
         backup_file = options['backup_file']
-        
-        # Chercher le fichier dans le répertoire backups
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size doit être au moins 1')
+
+        # Chercher le backup dans le répertoire backups
         backup_dir = settings.BASE_DIR / 'backups'
         filepath = backup_dir / backup_file
-        
+
         if not filepath.exists():
             raise CommandError(f'❌ Fichier de backup introuvable: {filepath}')
-        
+        streaming = filepath.is_dir()
+        if streaming and not (filepath / MANIFEST_NAME).exists():
+            raise CommandError(f'❌ {MANIFEST_NAME} introuvable dans {filepath}')
+
         self.stdout.write(
             self.style.WARNING(
                 f'⚠️  ATTENTION: Vous allez restaurer la base de données depuis:\n'
                 f'   {filepath}\n'
             )
         )
-        
+
         if options['flush']:
             self.stdout.write(
                 self.style.ERROR(
                     '🚨 DANGER: Cette opération va SUPPRIMER toutes les données actuelles!\n'
                 )
             )
-            confirm = input('Taper "OUI" pour confirmer: ')
-            if confirm != 'OUI':
-                self.stdout.write(self.style.WARNING('❌ Restauration annulée'))
-                return
-            
+            if options['interactive']:
+                confirm = input('Taper "OUI" pour confirmer: ')
+                if confirm != 'OUI':
+                    self.stdout.write(self.style.WARNING('❌ Restauration annulée'))
+                    return
+
             # Flush de la base de données
             self.stdout.write('🗑️  Vidage de la base de données...')
             call_command('flush', '--no-input')
-        
+
+        started = time.perf_counter()
         try:
-            # Décompresser si nécessaire
-            if filepath.suffix == '.gz':
-                self.stdout.write('📦 Décompression du backup...')
-                with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-                    data = f.read()
-                    
-                # Créer un fichier temporaire
-                temp_file = backup_dir / 'temp_restore.json'
-                with open(temp_file, 'w', encoding='utf-8') as f:
-                    f.write(data)
-                
-                restore_file = temp_file
-            else:
-                restore_file = filepath
-            
-            # Restaurer les données
             self.stdout.write('🔄 Restauration des données...')
-            call_command('loaddata', str(restore_file))
-            
-            # Nettoyer le fichier temporaire
-            if restore_file != filepath:
-                os.remove(restore_file)
-            
+            if streaming:
+                details = self._restore_streaming(filepath, options)
+            else:
+                with app_signals_disabled():
+                    call_command('loaddata', str(filepath))
+                details = ''
+
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'✅ Base de données restaurée avec succès depuis {backup_file}!'
+                    f'✅ Base de données restaurée avec succès depuis {backup_file}! '
+                    f'({time.perf_counter() - started:.1f}s){details}'
                 )
             )
-            
+
+        except InvalidBackup as e:
+            raise CommandError(f'❌ Backup invalide: {e}') from e
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'❌ Erreur lors de la restauration: {str(e)}')
             )
             raise
+
+    def _restore_streaming(self, filepath, options):
+        manifest = read_manifest(filepath)
+        total = sum(entry['rows'] for entry in manifest['models'])
+        verbose = options['verbosity'] > 1
+        done = {}
+
+        def progress(label, rows, expected):
+            # Avancement global : lignes chargées / lignes du manifeste
+            done[label] = rows
+            if verbose or rows == expected:
+                percent = 100 * sum(done.values()) / total if total else 100
+                self.stdout.write(f'   [{percent:5.1f}%] {label} : {rows}/{expected}')
+
+        restore_backup(filepath, chunk_size=options['chunk_size'], progress=progress)
+
+        if not manifest.get('consistent_snapshot', True):
+            self.stdout.write(self.style.WARNING(
+                '⚠️  Backup pris sans instantané cohérent (--jobs) : relancer rebuild_site_statistics, '
+                'build_map_aggregates, rebuild_search_index et rebuild_leaderboard si besoin'
+            ))
+        return f'\n   Lignes  : {total} ({len(manifest["models"])} modèles)'
@@ -0,0 +1,48 @@
+"""
+Reconstruction des ImpactPoint des dons, participations et contributions staff
+Usage: python manage.py resync_impact_points [--prune] [--skip-aggregates]
+
+Une requête INSERT ... SELECT par modèle source (voir main/impact_sync.py) :
+crée les points manquants et met à jour les autres, coordonnées conservées.
+--prune supprime aussi les points dont la source n'est plus éligible
+(don annulé, participation annulée...) ou a été supprimée.
+
+L'upsert ne passe pas par les signaux d'ImpactPoint : si les agrégats de la
+carte ont été construits, ils sont reconstruits ensuite (build_map_aggregates),
+sauf avec --skip-aggregates.
+"""
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from main.impact_map import aggregates_built
+from main.impact_sync import resync
+
+
+class Command(BaseCommand):
+    help = "Reconstruit en SQL ensembliste les points d'impact issus des dons, participations et contributions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true',
+                            help='Supprime les points dont la source n\'est plus éligible ou n\'existe plus')
+        parser.add_argument('--skip-aggregates', action='store_true',
+                            help='Ne pas reconstruire les agrégats de la carte (build_map_aggregates)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rebuild = aggregates_built()
+        for name, points, deleted in resync(prune=options['prune']):
+            line = f'   {name} : {points} point(s)'
+            if deleted:
+                line += f', {deleted} supprimé(s)'
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(f'✅ Points d\'impact synchronisés en {time.perf_counter() - started:.2f}s'))
+
+        if not rebuild:
+            return
+        if options['skip_aggregates']:
+            self.stdout.write(self.style.WARNING(
+                '⚠️  Agrégats de la carte non ajustés : lancer build_map_aggregates'
+            ))
+            return
+        call_command('build_map_aggregates', verbosity=options['verbosity'], stdout=self.stdout)
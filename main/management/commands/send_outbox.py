@@ -0,0 +1,76 @@
+"""
+Envoi des emails en file d'attente (voir main/outbox.py)
+Usage: python manage.py send_outbox [--batch-size 50] [--loop] [--interval 10] [--purge-days 30]
+
+Sans --loop : vide la file puis s'arrête (cron). Avec --loop : worker
+permanent qui attend --interval secondes quand la file est vide.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from main.models import OutboundEmail
+from main.outbox import BATCH_SIZE, SENT_RETENTION_DAYS, purge_sent, send_outbox
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails en file d'attente par lots (une connexion SMTP par lot)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Nombre d\'emails envoyés par connexion (défaut: {BATCH_SIZE})')
+        parser.add_argument('--loop', action='store_true',
+                            help='Tourne en continu au lieu de s\'arrêter quand la file est vide')
+        parser.add_argument('--interval', type=float, default=10,
+                            help='Attente entre deux passages en mode --loop, en secondes (défaut: 10)')
+        parser.add_argument('--purge-days', type=int, default=SENT_RETENTION_DAYS,
+                            help=f'Supprime les emails envoyés depuis plus de N jours (défaut: {SENT_RETENTION_DAYS}, 0 : jamais)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size doit être au moins 1')
+
+        if not options['loop']:
+            self._drain(options)
+            return
+
+        self.stdout.write(self.style.WARNING("📬 Worker d'envoi démarré (Ctrl+C pour arrêter)"))
+        try:
+            while True:
+                # Worker de longue durée : connexions base périmées fermées à chaque passage
+                close_old_connections()
+                self._drain(options, quiet=True)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('✅ Worker arrêté'))
+
+    def _drain(self, options, quiet=False):
+        started = time.perf_counter()
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        for result in send_outbox(batch_size=options['batch_size']):
+            for key, count in result.items():
+                totals[key] += count
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"   lot : {result['sent']} envoyé(s), {result['retried']} reprogrammé(s), "
+                    f"{result['failed']} en échec définitif"
+                )
+
+        purged = purge_sent(options['purge_days']) if options['purge_days'] > 0 else 0
+        if quiet and not any(totals.values()) and not purged:
+            return
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {totals['sent']} email(s) envoyé(s) en {elapsed:.2f}s"
+        ))
+        if totals['retried']:
+            self.stdout.write(self.style.WARNING(f"⏳ {totals['retried']} email(s) reprogrammé(s) après échec"))
+        if totals['failed']:
+            self.stdout.write(self.style.ERROR(f"❌ {totals['failed']} email(s) en échec définitif (voir l'admin)"))
+        if purged:
+            self.stdout.write(f'   {purged} email(s) envoyé(s) ancien(s) supprimé(s)')
+        if not quiet:
+            waiting = OutboundEmail.objects.filter(status='pending').count()
+            if waiting:
+                self.stdout.write(f'   {waiting} email(s) en attente d\'une nouvelle tentative')
@@ -162,7 +162,7 @@ class Command(BaseCommand):
             for i in range(25):
                 ImpactPoint.objects.create(
                     type=random.choice(['donation', 'event', 'participation', 'project']),
-                    related_id=random.randint(1, 10),
+                    related_id=i + 1,
                     related_model='Project',
                     latitude=-4.3317 + random.uniform(-0.2, 0.2),
                     longitude=15.3139 + random.uniform(-0.2, 0.2),
@@ -4,80 +4,121 @@ Vues pour la carte interactive d'impact social AIME
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import require_GET, require_POST
 from django.views.generic import TemplateView
 import json
-import random
-from datetime import datetime, timedelta
-from django.db import models
+from django.urls import reverse
+from main.forms import ImpactPointForm
+from main.impact_map import (
+    FEED_BATCH_SIZE, create_points, feed_cursor, impact_changes, impact_features, mapped_points, parse_bbox
+)
+from main.utils import get_site_statistics
+
+RECENT_POINTS = 10
+ADD_IMPACT_MAX_POINTS = 500
 
 class InteractiveMapView(TemplateView):
-    """Vue principale pour la carte interactive"""
+    """Vue principale pour la carte interactive (points chargés par /api/impact-points/)"""
     template_name = 'main/interactive_map.html'
     
     def get_context_data(self, **kwargs):
-        from main.models import ImpactPoint, Event, Donation, Project, UserProfile
         context = super().get_context_data(**kwargs)
         context['title'] = "Carte Interactive de l'Impact Social AIME"
         
-        # Stats dynamiques
+        # Stats : compteurs précalculés de SiteStatistics (pas d'agrégation à chaque affichage)
+        site_stats = get_site_statistics()
         context['stats'] = {
-            'total_beneficiaries': UserProfile.objects.count(),
-            'total_events': Event.objects.count(),
-            'total_donations': Donation.objects.filter(status='completed').aggregate(total=models.Sum('amount'))['total'] or 0,
-            'active_projects': Project.objects.filter(status='active').count(),
-            'volunteers': UserProfile.objects.filter(role='volunteer').count(),
+            'total_beneficiaries': site_stats['total_users'],
+            'total_events': site_stats['total_events'],
+            'total_donations': site_stats['total_donations'],
+            'active_projects': site_stats['active_projects'],
+            'volunteers': site_stats['total_volunteers'],
         }
         
-        # Points d'impact réels (seulement ceux avec coordonnées valides)
-        impact_points = ImpactPoint.objects.filter(
-            latitude__isnull=False,
-            longitude__isnull=False
-        ).exclude(
-            latitude=0,
-            longitude=0
-        )
-        
-        impact_data = []
-        for point in impact_points:
-            if point.latitude and point.longitude:  # Double vérification
-                impact_data.append({
-                    'id': point.id,
-                    'title': point.description or point.type,
-                    'description': point.description,
-                    'type': point.type,
-                    'lat': float(point.latitude),
-                    'lng': float(point.longitude),
-                    'impact_value': float(point.value) if point.value else 1,
-                    'date': point.created_at.strftime('%d/%m/%Y'),
-                    'status': point.status,
-                })
-        
-        context['impact_data'] = json.dumps(impact_data)
-        context['has_impact_data'] = len(impact_data) > 0
-        context['impact_points'] = impact_points
+        # Aucune donnée embarquée : la carte charge les points de la zone affichée
+        points = mapped_points()
+        context['has_impact_data'] = points.exists()
+        context['recent_points'] = points.order_by('-id')[:RECENT_POINTS]
+        context['recent_limit'] = RECENT_POINTS
+        context['points_url'] = reverse('main:api_impact_points')
+        # Polling des modifications à partir de l'état affiché
+        context['feed_url'] = reverse('main:api_impact_data')
+        context['feed_cursor'] = feed_cursor()
         
         return context
 
+@require_GET
+@cache_control(public=True, max_age=60)
+def impact_points(request):
+    """
+    Points de la carte en GeoJSON, regroupés sur une grille
+    ?bbox=ouest,sud,est,nord&zoom=12[&type=event,donation][&period=week]
+    """
+    try:
+        bbox = parse_bbox(request.GET.get('bbox'))
+        zoom = int(request.GET.get('zoom', 0))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'error': str(e)}, status=400)
+    
+    types = [t for t in request.GET.get('type', '').split(',') if t] or None
+    data = impact_features(bbox, zoom, types=types, period=request.GET.get('period'))
+    return JsonResponse(data, content_type='application/geo+json')
+
+@require_GET
+@never_cache
 def get_impact_data(request):
-    """API pour données temps réel"""
-    data = {
-        'id': random.randint(1000, 9999),
-        'title': 'Nouvelle Activité',
-        'type': 'event',
-        'lat': -4.4419,
-        'lng': 15.2663,
-        'impact_value': 10,
-        'date': datetime.now().strftime('%Y-%m-%d')
-    }
-    return JsonResponse({'status': 'success', 'data': [data]})
+    """
+    Flux des modifications des points d'impact, par lots
+    ?cursor=<next_cursor de la réponse précédente>[&limit=100]
+    """
+    try:
+        limit = int(request.GET.get('limit', FEED_BATCH_SIZE))
+        changes = impact_changes(request.GET.get('cursor'), limit)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'error': 'Curseur ou limite invalide'}, status=400)
+    return JsonResponse({'status': 'success', 'data': changes['features'],
+                         'next_cursor': changes['next_cursor'], 'has_more': changes['has_more']})
 
-@csrf_exempt
+@login_required
+@require_POST
 def add_impact_point(request):
-    """API pour ajouter impact"""
-    if request.method == 'POST':
-        return JsonResponse({'status': 'success', 'message': 'Ajouté'})
-    return JsonResponse({'status': 'error'})
+    """
+    Ajout de points d'impact par le staff (JSON) : un objet, une liste
+    d'objets ou {"points": [...]}. Tous les points sont validés avant
+    l'écriture, faite en une transaction : un seul point invalide et rien
+    n'est enregistré.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'error': 'Accès non autorisé'}, status=403)
+    
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'status': 'error', 'error': 'JSON invalide'}, status=400)
+    if isinstance(payload, dict):
+        payload = payload['points'] if 'points' in payload else [payload]
+    if not isinstance(payload, list) or not payload or not all(isinstance(item, dict) for item in payload):
+        return JsonResponse({'status': 'error', 'error': 'Liste de points attendue'}, status=400)
+    if len(payload) > ADD_IMPACT_MAX_POINTS:
+        return JsonResponse(
+            {'status': 'error', 'error': f'{ADD_IMPACT_MAX_POINTS} points au plus par requête'}, status=400
+        )
+    
+    forms = [ImpactPointForm(item) for item in payload]
+    errors = {index: form.errors.get_json_data() for index, form in enumerate(forms) if not form.is_valid()}
+    if errors:
+        return JsonResponse({'status': 'error', 'errors': errors}, status=400)
+    
+    with transaction.atomic():
+        created = create_points([form.save(commit=False) for form in forms])
+    return JsonResponse({
+        'status': 'success',
+        'created': len(created),
+        # Identifiants absents sous MySQL (bulk_create) : le flux /api/impact-data/ les fournit
+        'ids': [point.pk for point in created if point.pk is not None],
+    }, status=201)
 
 @login_required
 def gamification_dashboard(request):
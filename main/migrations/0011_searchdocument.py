@@ -0,0 +1,109 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:03
+
+from django.db import migrations, models
+
+
+SQLITE_FTS_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS main_searchdocument_fts USING fts5(
+        title_normalized, body_normalized,
+        content='main_searchdocument', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS main_searchdocument_ai AFTER INSERT ON main_searchdocument BEGIN
+        INSERT INTO main_searchdocument_fts(rowid, title_normalized, body_normalized)
+        VALUES (new.id, new.title_normalized, new.body_normalized);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS main_searchdocument_ad AFTER DELETE ON main_searchdocument BEGIN
+        INSERT INTO main_searchdocument_fts(main_searchdocument_fts, rowid, title_normalized, body_normalized)
+        VALUES ('delete', old.id, old.title_normalized, old.body_normalized);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS main_searchdocument_au AFTER UPDATE ON main_searchdocument BEGIN
+        INSERT INTO main_searchdocument_fts(main_searchdocument_fts, rowid, title_normalized, body_normalized)
+        VALUES ('delete', old.id, old.title_normalized, old.body_normalized);
+        INSERT INTO main_searchdocument_fts(rowid, title_normalized, body_normalized)
+        VALUES (new.id, new.title_normalized, new.body_normalized);
+    END""",
+]
+
+SQLITE_FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS main_searchdocument_au",
+    "DROP TRIGGER IF EXISTS main_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS main_searchdocument_ai",
+    "DROP TABLE IF EXISTS main_searchdocument_fts",
+]
+
+MYSQL_FULLTEXT_SQL = [
+    "CREATE FULLTEXT INDEX main_searchdocument_ft ON main_searchdocument (title_normalized, body_normalized)",
+    "CREATE FULLTEXT INDEX main_searchdocument_ft_title ON main_searchdocument (title_normalized)",
+]
+
+MYSQL_FULLTEXT_DROP_SQL = [
+    "DROP INDEX main_searchdocument_ft_title ON main_searchdocument",
+    "DROP INDEX main_searchdocument_ft ON main_searchdocument",
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    """FULLTEXT sous MySQL, table FTS5 sous SQLite, rien ailleurs (recherche LIKE)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        statements = MYSQL_FULLTEXT_SQL
+    elif vendor == 'sqlite':
+        statements = SQLITE_FTS_SQL
+    else:
+        return
+    for statement in statements:
+        try:
+            schema_editor.execute(statement)
+        except Exception:
+            if vendor == 'sqlite':
+                # SQLite compilé sans FTS5 : main/search.py se rabat sur LIKE
+                return
+            raise
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        statements = MYSQL_FULLTEXT_DROP_SQL
+    elif vendor == 'sqlite':
+        statements = SQLITE_FTS_DROP_SQL
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_event_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=50)),
+                ('object_id', models.IntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('snippet', models.TextField(blank=True)),
+                ('url', models.CharField(max_length=255)),
+                ('title_normalized', models.CharField(max_length=255)),
+                ('body_normalized', models.TextField(blank=True)),
+                ('is_public', models.BooleanField(default=True)),
+                ('available_from', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Document de recherche',
+                'verbose_name_plural': 'Documents de recherche',
+                'indexes': [models.Index(fields=['is_public', 'model_label'], name='main_search_is_publ_8e88f7_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('model_label', 'object_id'), name='unique_search_document'),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['donor_email', '-created_at', '-id'], name='main_donati_donor_e_bb88e3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='main_userac_user_id_1e2b08_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='main_userno_user_id_336789_idx'),
+        ),
+    ]
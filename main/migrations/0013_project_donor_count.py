@@ -0,0 +1,34 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:09
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_project_totals(apps, schema_editor):
+    """Initialise raised_amount et donor_count depuis les dons complétés"""
+    Donation = apps.get_model('main', 'Donation')
+    Project = apps.get_model('main', 'Project')
+    totals = (
+        Donation.objects.filter(status='completed', project__isnull=False)
+        .values('project')
+        .annotate(total=Sum('amount'), donors=Count('donor_email', distinct=True))
+        .order_by()
+    )
+    for row in totals:
+        Project.objects.filter(pk=row['project']).update(raised_amount=row['total'], donor_count=row['donors'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='donor_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_project_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_project_donor_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mbcparticipant',
+            index=models.Index(fields=['event', 'status'], name='main_mbcpar_event_i_0c1662_idx'),
+        ),
+    ]
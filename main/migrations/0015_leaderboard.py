@@ -0,0 +1,77 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_initial_leaderboard(apps, schema_editor):
+    """Premier instantané du classement (ensuite : commande rebuild_leaderboard)"""
+    UserProfile = apps.get_model('main', 'UserProfile')
+    LeaderboardEntry = apps.get_model('main', 'LeaderboardEntry')
+    rank, last_points, role_ranks, batch = 0, None, {}, []
+    for user_id, role, points in UserProfile.objects.order_by('-points', 'id').values_list('user_id', 'role', 'points'):
+        if points != last_points:
+            rank, last_points = rank + 1, points
+        role_rank, role_last_points = role_ranks.get(role, (0, None))
+        if points != role_last_points:
+            role_rank += 1
+        role_ranks[role] = (role_rank, points)
+        batch.append(LeaderboardEntry(user_id=user_id, role=role, points=points, rank=rank, role_rank=role_rank))
+    LeaderboardEntry.objects.bulk_create(batch, batch_size=2000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0014_mbcparticipant_event_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('member', 'Membre'), ('volunteer', 'Bénévole'), ('staff', 'Personnel'), ('partner', 'Partenaire'), ('donor', 'Donateur'), ('child', 'Enfant'), ('parent', 'Parent')], max_length=20)),
+                ('points', models.IntegerField(default=0)),
+                ('rank', models.PositiveIntegerField()),
+                ('role_rank', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Entrée du classement',
+                'verbose_name_plural': 'Classement',
+                'ordering': ['rank', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-points', 'id'], name='main_userpr_points_f52fc0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', '-points'], name='main_userpr_role_6d2fcf_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['points'], name='main_leader_points_557781_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['role', 'points'], name='main_leader_role_7b1e9c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['rank', 'id'], name='main_leader_rank_f62a2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['role', 'role_rank', 'id'], name='main_leader_role_fd3ef8_idx'),
+        ),
+        migrations.RunPython(build_initial_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import json
+
+
+def copy_badges_to_table(apps, schema_editor):
+    """Reprend les badges JSON de UserProfile.badges dans UserBadge"""
+    UserProfile = apps.get_model('main', 'UserProfile')
+    UserBadge = apps.get_model('main', 'UserBadge')
+    batch = []
+    for user_id, badges in UserProfile.objects.exclude(badges__in=['', '[]']).values_list('user_id', 'badges').iterator():
+        try:
+            codes = json.loads(badges)
+        except ValueError:
+            continue
+        batch.extend(UserBadge(user_id=user_id, code=str(code)[:50]) for code in dict.fromkeys(codes))
+        if len(batch) >= 2000:
+            UserBadge.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    UserBadge.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def copy_badges_to_json(apps, schema_editor):
+    UserProfile = apps.get_model('main', 'UserProfile')
+    UserBadge = apps.get_model('main', 'UserBadge')
+    badges = {}
+    for user_id, code in UserBadge.objects.order_by('awarded_at', 'id').values_list('user_id', 'code'):
+        badges.setdefault(user_id, []).append(code)
+    for user_id, codes in badges.items():
+        UserProfile.objects.filter(user_id=user_id).update(badges=json.dumps(codes))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0015_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBadge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50)),
+                ('awarded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_badges', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Badge utilisateur',
+                'verbose_name_plural': 'Badges utilisateurs',
+                'indexes': [models.Index(fields=['code', 'awarded_at'], name='main_userba_code_7e6671_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='userbadge',
+            constraint=models.UniqueConstraint(fields=('user', 'code'), name='unique_user_badge'),
+        ),
+        migrations.RunPython(copy_badges_to_table, copy_badges_to_json),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='badges',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_userbadge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usernotification',
+            name='dedup_key',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='usernotification',
+            constraint=models.UniqueConstraint(fields=('user', 'dedup_key'), name='unique_user_notification_dedup_key'),
+        ),
+    ]
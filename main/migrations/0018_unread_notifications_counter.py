@@ -0,0 +1,38 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:22
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_notifications(apps, schema_editor):
+    """Initialise le compteur de non lues depuis les notifications existantes"""
+    UserNotification = apps.get_model('main', 'UserNotification')
+    UserProfile = apps.get_model('main', 'UserProfile')
+    counts = (
+        UserNotification.objects.filter(is_read=False)
+        .values('user')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for row in counts:
+        UserProfile.objects.filter(user_id=row['user']).update(unread_notifications=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_usernotification_dedup_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='main_userno_user_id_e1926a_idx'),
+        ),
+        migrations.RunPython(backfill_unread_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0018_unread_notifications_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivityArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('activity_count', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': "Archive d'activités",
+                'verbose_name_plural': "Archives d'activités",
+            },
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'activity_type', '-timestamp', '-id'], name='main_userac_user_id_bf4757_idx'),
+        ),
+        migrations.AddField(
+            model_name='useractivityarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_archives', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='useractivityarchive',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='unique_user_activity_month'),
+        ),
+    ]
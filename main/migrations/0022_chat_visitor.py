@@ -0,0 +1,64 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_synthetic_visitors(apps, schema_editor):
+    """
+    Les visiteurs du chat étaient des comptes User inactifs « visitor_… » :
+    leurs conversations passent à un ChatVisitor, puis ces comptes (et leur
+    profil, badges, activités, notifications) sont supprimés.
+    """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    ChatVisitor = apps.get_model('main', 'ChatVisitor')
+    ChatConversation = apps.get_model('main', 'ChatConversation')
+    ChatMessage = apps.get_model('main', 'ChatMessage')
+    synthetic = User.objects.filter(
+        username__startswith='visitor_', is_active=False, last_login__isnull=True, password='',
+    )
+    for user in synthetic.iterator():
+        visitor = ChatVisitor.objects.create(name=user.first_name[:100], email=user.email)
+        ChatMessage.objects.filter(conversation__user=user, sender=user).update(sender=None)
+        ChatConversation.objects.filter(user=user).update(user=None, visitor=visitor)
+    synthetic.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0021_outbound_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatVisitor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('email', models.EmailField(blank=True, db_index=True, max_length=254)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Visiteur du chat',
+                'verbose_name_plural': 'Visiteurs du chat',
+            },
+        ),
+        migrations.AlterField(
+            model_name='chatconversation',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chat_conversations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='chatconversation',
+            name='visitor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='main.chatvisitor'),
+        ),
+        migrations.AddIndex(
+            model_name='chatconversation',
+            index=models.Index(fields=['visitor', 'closed', '-id'], name='main_chatco_visitor_a3d785_idx'),
+        ),
+        migrations.RunPython(move_synthetic_visitors, migrations.RunPython.noop),
+    ]
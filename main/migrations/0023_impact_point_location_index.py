@@ -0,0 +1,17 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_chat_visitor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='impactpoint',
+            index=models.Index(fields=['latitude', 'longitude'], name='main_impact_latitud_559cac_idx'),
+        ),
+    ]
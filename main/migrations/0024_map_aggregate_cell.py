@@ -0,0 +1,35 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_impact_point_location_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapAggregateCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('cell_x', models.IntegerField()),
+                ('type', models.CharField(choices=[('donation', 'Don'), ('event', 'Événement'), ('participation', 'Participation'), ('contribution', 'Contribution Staff'), ('project', 'Projet'), ('other', 'Autre')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('value_sum', models.FloatField(default=0)),
+                ('latitude_sum', models.FloatField(default=0)),
+                ('longitude_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Cellule agrégée de la carte',
+                'verbose_name_plural': 'Cellules agrégées de la carte',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mapaggregatecell',
+            constraint=models.UniqueConstraint(fields=('zoom', 'cell_y', 'cell_x', 'type'), name='unique_map_aggregate_cell'),
+        ),
+    ]
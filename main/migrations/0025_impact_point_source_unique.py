@@ -0,0 +1,35 @@
+# Generated by Django 4.2.14 on 2026-10-17 01:49
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_sources(apps, schema_editor):
+    """
+    Un seul ImpactPoint par (related_model, related_id) avant la contrainte :
+    le plus récent est gardé. Suppression sans signaux : relancer ensuite
+    build_map_aggregates si des doublons avaient des coordonnées.
+    """
+    ImpactPoint = apps.get_model('main', 'ImpactPoint')
+    duplicates = ImpactPoint.objects.filter(related_id__isnull=False).values(
+        'related_model', 'related_id'
+    ).annotate(total=Count('id'), keep=Max('id')).filter(total__gt=1).order_by()
+    for row in list(duplicates):
+        ImpactPoint.objects.filter(
+            related_model=row['related_model'], related_id=row['related_id']
+        ).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_map_aggregate_cell'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_sources, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='impactpoint',
+            constraint=models.UniqueConstraint(fields=('related_model', 'related_id'), name='unique_impact_point_source'),
+        ),
+    ]
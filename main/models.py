@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -29,10 +29,9 @@ class UserProfile(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     
-    # Gamification
+    # Gamification (points et niveau mis à jour par gamification.award ; badges : UserBadge)
     points = models.IntegerField(default=0)
     level = models.IntegerField(default=1)
-    badges = models.TextField(default='[]')  # JSON des badges obtenus
     
     # Préférences utilisateur
     newsletter_subscription = models.BooleanField(default=True)
@@ -44,40 +43,56 @@ class UserProfile(models.Model):
     total_donations = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     events_participated = models.IntegerField(default=0)
     challenges_completed = models.IntegerField(default=0)
+    # Notifications non lues (tenu à jour par notifications.py)
+    unread_notifications = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            # Classement (voir leaderboard.py)
+            models.Index(fields=['-points', 'id']),
+            models.Index(fields=['role', '-points']),
+        ]
+    
+    # Colonnes tenues à jour par UPDATE ... F() : jamais réécrites par save()
+    # (une instance chargée avant l'incrément écraserait la nouvelle valeur).
+    # points et level ne changent que par gamification.award()
+    COUNTER_FIELDS = ('unread_notifications', 'points', 'level')
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.get_role_display()}"
     
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
     def add_badge(self, badge_name):
-        """Ajouter un badge au profil"""
-        badges_list = json.loads(self.badges) if self.badges else []
-        if badge_name not in badges_list:
-            badges_list.append(badge_name)
-            self.badges = json.dumps(badges_list)
-            self.save()
+        """Ajouter un badge au profil (voir gamification.award)"""
+        from .gamification import award
+        award(self.user, badges=[badge_name])
+        self.__dict__.pop('_badge_codes', None)
     
     def get_badges_list(self):
-        """Récupérer la liste des badges"""
-        return json.loads(self.badges) if self.badges else []
+        """Récupérer la liste des badges (une requête par instance)"""
+        if '_badge_codes' not in self.__dict__:
+            self._badge_codes = list(
+                self.user.user_badges.order_by('awarded_at', 'id').values_list('code', flat=True)
+            )
+        return self._badge_codes
     
     def calculate_level(self):
         """Calculer le niveau basé sur les points"""
-        if self.points < 100:
-            return 1
-        elif self.points < 500:
-            return 2
-        elif self.points < 1000:
-            return 3
-        elif self.points < 2500:
-            return 4
-        else:
-            return 5
+        from .gamification import level_for_points
+        return level_for_points(self.points)
     
     def add_points(self, points):
-        """Ajouter des points et mettre à jour le niveau"""
-        self.points += points
-        self.level = self.calculate_level()
-        self.save()
+        """Ajouter des points et mettre à jour le niveau (voir gamification.award)"""
+        from .gamification import award
+        result = award(self.user, points=points)
+        self.points, self.level = result.points, result.level
 
 class Category(models.Model):
     """Catégories pour les projets et causes"""
@@ -111,7 +126,9 @@ class Project(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     image = models.ImageField(upload_to='projects/', blank=True)
     goal_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Dénormalisés : tenus à jour par les signaux des dons (utils.record_project_totals_change)
     raised_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    donor_count = models.PositiveIntegerField(default=0)
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=PROJECT_STATUS, default='planning', db_index=True)
@@ -141,6 +158,19 @@ class Project(models.Model):
             return min((self.raised_amount / self.goal_amount) * 100, 100)
         return 0
 
+class MutotoBikeChallengeQuerySet(models.QuerySet):
+    def with_participant_stats(self):
+        """
+        Annote les compteurs d'inscrits en une seule requête :
+        confirmed_participants, pending_participants et remaining_capacity
+        """
+        return self.annotate(
+            confirmed_participants=models.Count('mbcparticipant', filter=models.Q(mbcparticipant__status='confirmed')),
+            pending_participants=models.Count('mbcparticipant', filter=models.Q(mbcparticipant__status='pending')),
+        ).annotate(
+            remaining_capacity=models.F('max_participants') - models.F('confirmed_participants') - models.F('pending_participants'),
+        )
+
 class MutotoBikeChallenge(models.Model):
     """Événement Mutoto Bike Challenge"""
     name = models.CharField(max_length=200)
@@ -153,16 +183,45 @@ class MutotoBikeChallenge(models.Model):
     is_active = models.BooleanField(default=True)
     image = models.ImageField(upload_to='mbc/', blank=True)
     
+    objects = MutotoBikeChallengeQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} - {self.date.strftime('%Y-%m-%d')}"
     
+    # Les propriétés utilisent les annotations de with_participant_stats()
+    # si elles sont présentes, sinon une requête COUNT
     @property
     def participants_count(self):
+        if hasattr(self, 'confirmed_participants'):
+            return self.confirmed_participants
         return self.mbcparticipant_set.filter(status='confirmed').count()
     
+    @property
+    def available_places(self):
+        """Places restantes : les inscriptions en attente réservent une place"""
+        if hasattr(self, 'remaining_capacity'):
+            return max(self.remaining_capacity, 0)
+        taken = self.mbcparticipant_set.filter(status__in=('confirmed', 'pending')).count()
+        return max(self.max_participants - taken, 0)
+    
     @property
     def is_full(self):
-        return self.participants_count >= self.max_participants
+        return self.available_places <= 0
+    
+    def register_participant(self, participant):
+        """
+        Inscrit un participant si une place est libre. La ligne du challenge est
+        verrouillée (SELECT ... FOR UPDATE) pendant la vérification, pour que deux
+        inscriptions simultanées ne puissent pas dépasser max_participants.
+        Retourne False si le challenge est complet.
+        """
+        with transaction.atomic():
+            challenge = MutotoBikeChallenge.objects.select_for_update().get(pk=self.pk)
+            if challenge.available_places <= 0:
+                return False
+            participant.event = challenge
+            participant.save()
+        return True
 
 class MBCParticipant(models.Model):
     """Participants au Mutoto Bike Challenge"""
@@ -184,6 +243,11 @@ class MBCParticipant(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     registered_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['event', 'status']),
+        ]
+    
     def __str__(self):
         return f"{self.participant_name} - {self.event.name}"
 
@@ -227,6 +291,7 @@ class Event(models.Model):
     image = models.ImageField(upload_to='events/', blank=True)
     is_active = models.BooleanField(default=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_public = models.BooleanField(default=True, db_index=True)
     
     class Meta:
@@ -266,11 +331,23 @@ class Donation(models.Model):
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['donor_email', 'status']),
             models.Index(fields=['project', 'status']),
+            # Pagination par curseur de l'historique des dons (dashboard)
+            models.Index(fields=['donor_email', '-created_at', '-id']),
         ]
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.donor_name} - {self.amount} {self.currency}"
+    
+    # Transaction englobant les signaux : les totaux du projet sont mis à jour
+    # avec le don, ou pas du tout
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
 class ContactMessage(models.Model):
     """Messages de contact"""
@@ -325,10 +402,35 @@ class UserActivity(models.Model):
     class Meta:
         verbose_name_plural = "User Activities"
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-id']),
+            models.Index(fields=['user', 'activity_type', '-timestamp', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.get_activity_type_display()}"
 
+class UserActivityArchive(models.Model):
+    """
+    Activités anciennes d'un utilisateur pour un mois, retirées de UserActivity
+    par la commande archive_activities (JSON compressé, voir activity_log.py)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_archives')
+    month = models.DateField()  # premier jour du mois
+    activity_count = models.PositiveIntegerField(default=0)
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Archive d'activités"
+        verbose_name_plural = "Archives d'activités"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_user_activity_month'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.month:%Y-%m} ({self.activity_count})"
+
 class UserNotification(models.Model):
     """Notifications utilisateur"""
     NOTIFICATION_TYPES = [
@@ -349,9 +451,18 @@ class UserNotification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     link_url = models.URLField(blank=True, null=True)
+    # Identifie l'origine de la notification (ex: 'event_registration:12'), voir notifications.py
+    dedup_key = models.CharField(max_length=100, null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['user', 'is_read', '-created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'dedup_key'], name='unique_user_notification_dedup_key'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -406,15 +517,50 @@ class Staff(models.Model):
         return f"{self.user.get_full_name()} - {self.get_position_display()}"
 
 # --- Chat Assistant Models ---
+class ChatVisitor(models.Model):
+    """
+    Visiteur anonyme du chat : identifié par un jeton signé conservé par le
+    navigateur (voir chat_events.identity_token), sans compte User
+    """
+    name = models.CharField(max_length=100, blank=True)
+    email = models.EmailField(blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Visiteur du chat"
+        verbose_name_plural = "Visiteurs du chat"
+
+    def __str__(self):
+        return self.name or self.email or f"Visiteur #{self.pk}"
+
 class ChatConversation(models.Model):
-    """Session de conversation entre un utilisateur et le staff/l'assistant."""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_conversations')
+    """Session de conversation entre un utilisateur (ou un visiteur) et le staff/l'assistant."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='chat_conversations')
+    visitor = models.ForeignKey(ChatVisitor, on_delete=models.CASCADE, null=True, blank=True, related_name='conversations')
     staff = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='staff_conversations')
     created_at = models.DateTimeField(auto_now_add=True)
     closed = models.BooleanField(default=False)
+    # Dernier message lu par le staff : les messages du visiteur au-delà sont non lus
+    staff_last_read_message_id = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Boîte de réception du staff (conversations ouvertes, plus récentes d'abord)
+            models.Index(fields=['closed', '-created_at', '-id']),
+            # Conversation ouverte d'un visiteur (un message = une lecture indexée)
+            models.Index(fields=['visitor', 'closed', '-id']),
+        ]
 
     def __str__(self):
-        return f"Conversation avec {self.user.username} ({self.created_at.strftime('%Y-%m-%d %H:%M')})"
+        return f"Conversation avec {self.participant_name} ({self.created_at.strftime('%Y-%m-%d %H:%M')})"
+
+    @property
+    def participant_name(self):
+        if self.user_id:
+            return self.user.get_full_name() or self.user.username
+        if self.visitor_id:
+            return str(self.visitor)
+        return "Visiteur"
 
 class ChatMessage(models.Model):
     """Message dans une conversation de chat."""
@@ -424,6 +570,11 @@ class ChatMessage(models.Model):
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', 'timestamp']),
+        ]
+
     def __str__(self):
         sender = self.sender.username if self.sender else ("Assistant" if self.is_assistant else "Inconnu")
         return f"{sender}: {self.content[:30]}... ({self.timestamp.strftime('%Y-%m-%d %H:%M')})"
@@ -494,10 +645,50 @@ class ImpactPoint(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Points d'une emprise de carte (voir impact_map.py)
+            models.Index(fields=['latitude', 'longitude']),
+            # Flux des modifications /api/impact-data/ (curseur updated_at, id)
+            models.Index(fields=['updated_at', 'id']),
+        ]
+        constraints = [
+            # Un point par objet source (cible de l'upsert de impact_sync)
+            models.UniqueConstraint(fields=['related_model', 'related_id'], name='unique_impact_point_source'),
+        ]
+
     def __str__(self):
         return f"Impact {self.type} ({self.related_model} #{self.related_id})"
 
 
+class MapAggregateCell(models.Model):
+    """
+    Agrégats précalculés de la carte d'impact : une ligne par niveau de zoom,
+    cellule de grille et type de point (voir impact_map.py). Construits par
+    build_map_aggregates, puis ajustés par les signaux d'ImpactPoint.
+    """
+    zoom = models.PositiveSmallIntegerField()
+    cell_y = models.IntegerField()
+    cell_x = models.IntegerField()
+    type = models.CharField(max_length=20, choices=ImpactPoint.TYPE_CHOICES)
+    count = models.IntegerField(default=0)
+    value_sum = models.FloatField(default=0)
+    # Sommes des coordonnées : barycentre = somme / count
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name = "Cellule agrégée de la carte"
+        verbose_name_plural = "Cellules agrégées de la carte"
+        constraints = [
+            # Sert aussi d'index aux lectures par emprise (zoom, plage de lignes, plage de colonnes)
+            models.UniqueConstraint(fields=['zoom', 'cell_y', 'cell_x', 'type'], name='unique_map_aggregate_cell'),
+        ]
+
+    def __str__(self):
+        return f"z{self.zoom} ({self.cell_y}, {self.cell_x}) {self.type}: {self.count}"
+
+
 class VisitorFeedback(models.Model):
     """Avis et retours des visiteurs du site"""
     CONTRIBUTION_CHOICES = [
@@ -595,3 +786,186 @@ class DailyInformation(models.Model):
     def __str__(self):
         return f"{self.title} ({self.display_date.strftime('%d/%m/%Y')})"
 
+
+
+class SiteStatistics(models.Model):
+    """Compteurs globaux du site, maintenus incrémentalement par les signaux.
+
+    Une seule ligne (pk=1) : la page d'accueil lit cette ligne au lieu de
+    relancer toutes les agrégations. La commande ``rebuild_site_statistics``
+    recalcule les valeurs depuis les tables sources.
+    """
+    SINGLETON_ID = 1
+
+    total_donations = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    children_profiles = models.IntegerField(default=0)
+    mbc_participants = models.IntegerField(default=0)
+    active_projects = models.IntegerField(default=0)
+    total_events = models.IntegerField(default=0)
+    formations_dispensed = models.IntegerField(default=0)
+    families_supported = models.IntegerField(default=0)
+    user_locations = models.IntegerField(default=0)
+    impact_locations = models.IntegerField(default=0)
+    staff_contributions = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    event_participations = models.IntegerField(default=0)
+    schools_partners = models.IntegerField(default=0)
+    total_users = models.IntegerField(default=0)
+    total_volunteers = models.IntegerField(default=0)
+    total_donors = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Statistiques du site"
+        verbose_name_plural = "Statistiques du site"
+
+    def __str__(self):
+        return f"Statistiques du site ({self.updated_at.strftime('%d/%m/%Y %H:%M')})"
+
+    COUNTER_FIELDS = [
+        'total_donations', 'children_profiles', 'mbc_participants', 'active_projects',
+        'total_events', 'formations_dispensed', 'families_supported', 'user_locations',
+        'impact_locations', 'staff_contributions', 'event_participations',
+        'schools_partners', 'total_users', 'total_volunteers', 'total_donors',
+    ]
+
+    def as_dict(self):
+        """Format identique à l'ancien get_site_statistics()"""
+        return {
+            'total_donations': int(self.total_donations),
+            'total_children_helped': self.children_profiles + self.mbc_participants,
+            'active_projects': self.active_projects,
+            'total_events': self.total_events,
+            'formations_dispensed': self.formations_dispensed,
+            'families_supported': self.families_supported,
+            'mbc_participants': self.mbc_participants,
+            'quartiers_impacted': self.user_locations + self.impact_locations,
+            'staff_contributions': int(self.staff_contributions),
+            'event_participations': self.event_participations,
+            'schools_partners': self.schools_partners,
+            'provinces_count': 1,  # Kinshasa par défaut
+            'total_users': self.total_users,
+            'total_volunteers': self.total_volunteers,
+            'total_donors': self.total_donors,
+            'updated_at': self.updated_at,
+        }
+
+
+class UserBadge(models.Model):
+    """Badge obtenu par un utilisateur (attribué par gamification.award)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_badges')
+    code = models.CharField(max_length=50)
+    awarded_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Badge utilisateur"
+        verbose_name_plural = "Badges utilisateurs"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'code'], name='unique_user_badge'),
+        ]
+        indexes = [
+            models.Index(fields=['code', 'awarded_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.code}"
+
+class LeaderboardEntry(models.Model):
+    """
+    Classement précalculé (rangs denses), reconstruit périodiquement par
+    la commande rebuild_leaderboard et ajusté à chaque gain de points
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='leaderboard_entry')
+    role = models.CharField(max_length=20, choices=UserProfile.ROLE_CHOICES)
+    points = models.IntegerField(default=0)
+    rank = models.PositiveIntegerField()
+    role_rank = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Entrée du classement"
+        verbose_name_plural = "Classement"
+        ordering = ['rank', 'id']
+        indexes = [
+            models.Index(fields=['points']),
+            models.Index(fields=['role', 'points']),
+            models.Index(fields=['rank', 'id']),
+            models.Index(fields=['role', 'role_rank', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.rank} {self.user.username} ({self.points} pts)"
+
+class SearchDocument(models.Model):
+    """Index de recherche plein texte (projets, événements, informations, MSA).
+
+    Table "fantôme" tenue à jour par les signaux : le texte y est stocké
+    normalisé (minuscules, sans accents ni mots vides) et indexé en FULLTEXT
+    sous MySQL ou dans une table virtuelle FTS5 sous SQLite (voir main/search.py).
+    """
+    model_label = models.CharField(max_length=50)
+    object_id = models.IntegerField()
+    title = models.CharField(max_length=255)
+    snippet = models.TextField(blank=True)
+    url = models.CharField(max_length=255)
+    title_normalized = models.CharField(max_length=255)
+    body_normalized = models.TextField(blank=True)
+    is_public = models.BooleanField(default=True)
+    available_from = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Document de recherche"
+        verbose_name_plural = "Documents de recherche"
+        constraints = [
+            models.UniqueConstraint(fields=['model_label', 'object_id'], name='unique_search_document'),
+        ]
+        indexes = [
+            models.Index(fields=['is_public', 'model_label']),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label} #{self.object_id} - {self.title}"
+
+class OutboundEmail(models.Model):
+    """
+    File d'attente des emails transactionnels (voir outbox.py) : écrits par
+    les requêtes dans leur transaction, envoyés par la commande send_outbox
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sending', 'En cours d\'envoi'),
+        ('sent', 'Envoyé'),
+        ('failed', 'Échec définitif'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    # Adresses séparées par des virgules
+    to = models.TextField()
+    reply_to = models.CharField(max_length=254, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Réservation par un worker (jeton + date), reprise si le worker disparaît
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Email sortant"
+        verbose_name_plural = "Emails sortants"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at', 'id']),
+            models.Index(fields=['claim_token']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {self.to} ({self.get_status_display()})"
+
+    @property
+    def recipients(self):
+        return [address.strip() for address in self.to.split(',') if address.strip()]
@@ -0,0 +1,253 @@
+"""
+Envoi de notifications utilisateur (UserNotification)
+
+- Les textes sont déclarés une fois dans NOTIFICATION_TEMPLATES et rendus
+  une seule fois par envoi, quel que soit le nombre de destinataires ;
+- notify_many() écrit par bulk_create en tranches (mémoire bornée) ;
+- chaque notification porte une clé de déduplication (dedup_key) couverte
+  par une contrainte unique (user, dedup_key) : renvoyer la même
+  notification est ignoré par la base, sans comparer le texte du message ;
+- background=True diffère l'envoi après le commit, dans un thread, pour ne
+  pas bloquer la requête (annonce d'un événement à tous les membres).
+
+Compteur de non lues : UserProfile.unread_notifications est tenu à jour par
+les chemins d'écriture (notify_many, mark_read, signaux de création et de
+suppression) et mis en cache ; unread_count() ne lit jamais la table des
+notifications. recount_unread() recalcule le compteur en cas d'écart.
+
+Usage:
+    notify(user, 'event_registration', {'event_id': event.pk, 'event': event.title})
+    notify_many(User.objects.filter(is_active=True), 'event_announcement', context, background=True)
+"""
+import logging
+import threading
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.db.models.query import QuerySet
+
+from .models import UserNotification, UserProfile
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHUNK_SIZE = 1000
+
+UNREAD_CACHE_KEY = 'unread_notifications:{user_id}'
+UNREAD_CACHE_TIMEOUT = 300
+
+# nom -> titre, message, type, lien et clé de déduplication (str.format sur le contexte)
+NOTIFICATION_TEMPLATES = {
+    'welcome': {
+        'title': 'Bienvenue chez AIME !',
+        'message': 'Bonjour {name}, merci de rejoindre notre communauté. Découvrez votre tableau de bord et nos projets.',
+        'notification_type': 'success',
+        'dedup_key': 'welcome',
+    },
+    'event_registration': {
+        'title': 'Inscription confirmée',
+        'message': 'Vous êtes inscrit à l\'événement "{event}"',
+        'notification_type': 'success',
+        'dedup_key': 'event_registration:{event_id}',
+    },
+    'challenge_registration': {
+        'title': 'Challenge MBC',
+        'message': 'Inscription au challenge "{challenge}" confirmée!',
+        'notification_type': 'success',
+        'dedup_key': 'challenge_registration:{challenge_id}',
+    },
+    'event_announcement': {
+        'title': 'Nouvel événement : {event}',
+        'message': '{event} aura lieu le {date} à {location}. Inscrivez-vous depuis votre tableau de bord !',
+        'notification_type': 'event',
+        'link_url': '{url}',
+        'dedup_key': 'event_announcement:{event_id}',
+    },
+    'badge_earned': {
+        'title': 'Nouveau badge : {name}',
+        'message': 'Félicitations ! Vous avez obtenu le badge « {name} » ({description}).',
+        'notification_type': 'badge',
+        'dedup_key': 'badge:{code}',
+    },
+    'staff_contribution_recorded': {
+        'title': 'Contribution enregistrée pour {month}',
+        'message': "Votre contribution de {amount} CDF pour '{object}' a été enregistrée. Merci !",
+        'notification_type': 'success',
+        'dedup_key': 'staff_contribution:{contribution_id}',
+    },
+    'staff_contribution_validated': {
+        'title': 'Contribution staff validée',
+        'message': 'Vous avez validé la contribution de {staff} ({amount} CDF, {month}).',
+        'notification_type': 'info',
+        'dedup_key': 'staff_contribution_validated:{contribution_id}',
+    },
+}
+
+
+def render_notification(template, context=None):
+    """Champs d'une UserNotification rendus depuis le registre"""
+    try:
+        spec = NOTIFICATION_TEMPLATES[template]
+    except KeyError:
+        raise ValueError(f"Modèle de notification inconnu : {template}")
+    context = context or {}
+    dedup_field = UserNotification._meta.get_field('dedup_key')
+    return {
+        'title': spec['title'].format(**context)[:200],
+        'message': spec['message'].format(**context),
+        'notification_type': spec['notification_type'],
+        'link_url': spec['link_url'].format(**context) if spec.get('link_url') else None,
+        'dedup_key': spec['dedup_key'].format(**context)[:dedup_field.max_length],
+    }
+
+
+def _iter_user_id_chunks(users, chunk_size):
+    if isinstance(users, QuerySet):
+        if users.model is not User:
+            raise TypeError("notify_many attend des utilisateurs (User) ou leurs ids")
+        ids = users.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+    else:
+        ids = (getattr(user, 'pk', user) for user in users)
+
+    chunk = []
+    for user_id in ids:
+        chunk.append(user_id)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write(users, fields, chunk_size):
+    count = 0
+    for user_ids in _iter_user_id_chunks(users, chunk_size):
+        # Un destinataire présent deux fois dans la liste ne compte qu'une fois
+        user_ids = list(dict.fromkeys(user_ids))
+        with transaction.atomic():
+            # Profils verrouillés (ordre des pk) : deux envois simultanés de la même
+            # notification aux mêmes destinataires passent l'un après l'autre
+            list(
+                UserProfile.objects.select_for_update().filter(user_id__in=user_ids)
+                .order_by('pk').values_list('pk', flat=True)
+            )
+            # Les destinataires déjà notifiés sont écartés (index unique user+dedup_key)
+            notified = set(
+                UserNotification.objects.filter(user_id__in=user_ids, dedup_key=fields['dedup_key'])
+                .values_list('user_id', flat=True)
+            )
+            user_ids = [user_id for user_id in user_ids if user_id not in notified]
+            # ignore_conflicts : un envoi simultané de la même notification ne fait pas échouer la tranche
+            UserNotification.objects.bulk_create(
+                [UserNotification(user_id=user_id, **fields) for user_id in user_ids],
+                ignore_conflicts=True,
+            )
+            # bulk_create n'émet pas post_save : compteurs de non lues mis à jour ici,
+            # depuis les lignes relues (les conflits ignorés ne renvoient rien)
+            inserted = list(
+                UserNotification.objects.filter(user_id__in=user_ids, dedup_key=fields['dedup_key'])
+                .values_list('user_id', flat=True)
+            )
+            adjust_unread(inserted, 1)
+        count += len(inserted)
+    return count
+
+
+def _write_in_background(users, fields, chunk_size):
+    try:
+        count = _write(users, fields, chunk_size)
+        logger.info("Notification %s envoyée à %s utilisateur(s)", fields['dedup_key'], count)
+    except Exception:
+        logger.exception("Envoi de la notification %s impossible", fields['dedup_key'])
+    finally:
+        connection.close()
+
+
+def notify_many(users, template, context=None, chunk_size=NOTIFY_CHUNK_SIZE, background=False):
+    """
+    Crée la même notification pour plusieurs utilisateurs (queryset de User,
+    liste de User ou d'ids). Retourne le nombre de notifications créées,
+    ou None si l'envoi est fait en arrière-plan.
+    """
+    fields = render_notification(template, context)
+    if not background:
+        return _write(users, fields, chunk_size)
+
+    def start():
+        threading.Thread(
+            target=_write_in_background, args=(users, fields, chunk_size), daemon=True
+        ).start()
+
+    # Le thread ne doit voir que des données validées
+    transaction.on_commit(start)
+    return None
+
+
+def notify(user, template, context=None):
+    """Notification d'un seul utilisateur (ignorée si déjà envoyée)"""
+    return notify_many([user], template, context)
+
+
+# --- Compteur de notifications non lues ---
+def unread_cache_key(user_id):
+    return UNREAD_CACHE_KEY.format(user_id=user_id)
+
+
+def unread_count(user):
+    """Nombre de notifications non lues (cache, sinon colonne du profil)"""
+    key = unread_cache_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = UserProfile.objects.filter(user=user).values_list('unread_notifications', flat=True).first() or 0
+        cache.set(key, count, UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def adjust_unread(user_ids, delta):
+    """Ajoute delta au compteur des utilisateurs (sans passer sous zéro) et invalide leur cache après commit"""
+    user_ids = list(user_ids)
+    if not user_ids or not delta:
+        return
+    UserProfile.objects.filter(user_id__in=user_ids).update(
+        unread_notifications=Greatest(F('unread_notifications') + delta, 0)
+    )
+    keys = [unread_cache_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def mark_read(user, notification_ids=None):
+    """
+    Marque comme lues les notifications de l'utilisateur (toutes si
+    notification_ids est None). Retourne le nombre de notifications modifiées.
+    """
+    with transaction.atomic():
+        notifications = UserNotification.objects.filter(user=user, is_read=False)
+        if notification_ids is not None:
+            notifications = notifications.filter(pk__in=notification_ids)
+        # Seules les lignes encore non lues comptent : deux appels simultanés ne décomptent pas deux fois
+        updated = notifications.update(is_read=True)
+        adjust_unread([user.pk], -updated)
+    return updated
+
+
+def recount_unread(user_ids=None):
+    """Recalcule les compteurs depuis la table des notifications (réparation)"""
+    profiles = UserProfile.objects.all()
+    notifications = UserNotification.objects.filter(is_read=False)
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+        notifications = notifications.filter(user_id__in=user_ids)
+    counts = dict(
+        notifications.order_by().values('user_id').annotate(total=Count('id')).values_list('user_id', 'total')
+    )
+    changed = []
+    for profile in profiles.only('id', 'user_id', 'unread_notifications').iterator():
+        count = counts.get(profile.user_id, 0)
+        if profile.unread_notifications != count:
+            profile.unread_notifications = count
+            changed.append(profile)
+    UserProfile.objects.bulk_update(changed, ['unread_notifications'], batch_size=1000)
+    cache.delete_many([unread_cache_key(profile.user_id) for profile in changed])
+    return len(changed)
@@ -0,0 +1,184 @@
+"""
+File d'attente des emails transactionnels (outbox)
+
+- queue_email() écrit un OutboundEmail dans la transaction de la requête :
+  l'email n'existe que si les données qui l'ont provoqué sont validées, et
+  la requête ne dépend plus du serveur SMTP ;
+- la commande send_outbox vide la file par lots, sur une seule connexion
+  SMTP réutilisée pour tout le lot ;
+- un envoi en échec est reprogrammé avec un délai exponentiel, puis passe
+  en échec définitif (status='failed') après MAX_ATTEMPTS tentatives ;
+  l'admin permet de le remettre en file ;
+- plusieurs workers peuvent tourner : chaque lot est réservé par un jeton
+  (UPDATE conditionnel), un lot abandonné est repris après CLAIM_TIMEOUT ;
+- rien n'est envoyé sans le cron send_outbox (voir deploy_complete.sh) :
+  l'admin signale les emails en retard de plus de BACKLOG_WARNING_DELAY.
+
+Fonctionne avec tous les backends email de Django (locmem, fichier,
+console en local ; SMTP en production).
+
+Usage:
+    queue_email('Sujet', 'Corps du message', ['contact@aime-rdc.org'])
+"""
+import logging
+import random
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 6 * 3600
+CLAIM_TIMEOUT = timedelta(minutes=15)
+SENT_RETENTION_DAYS = 30
+BACKLOG_WARNING_DELAY = timedelta(minutes=5)
+
+
+def queue_email(subject, body, to, from_email=None, reply_to=''):
+    """
+    Met un email en file d'envoi (to : adresse ou liste d'adresses).
+    À appeler dans la transaction des données qui motivent l'email.
+    """
+    if isinstance(to, str):
+        to = [to]
+    return OutboundEmail.objects.create(
+        subject=subject[:255],
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=', '.join(to),
+        reply_to=reply_to or '',
+    )
+
+
+def backoff_delay(attempts):
+    """Délai avant la tentative suivante : exponentiel, plafonné, avec ±20 % d'aléa"""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _due(now):
+    return Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', claimed_at__lt=now - CLAIM_TIMEOUT)
+
+
+def _claim(batch_size):
+    """Réserve jusqu'à batch_size emails à envoyer pour ce worker"""
+    now = timezone.now()
+    ids = list(
+        OutboundEmail.objects.filter(_due(now)).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Condition répétée dans l'UPDATE : une ligne réservée entre-temps par un autre worker est ignorée
+    OutboundEmail.objects.filter(_due(now), pk__in=ids).update(status='sending', claim_token=token, claimed_at=now)
+    return list(OutboundEmail.objects.filter(claim_token=token).order_by('next_attempt_at', 'id'))
+
+
+def _record_failure(email, error, now):
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'[:2000]
+    email.claim_token = ''
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'failed'
+        logger.error("Email #%s abandonné après %s tentatives : %s", email.pk, email.attempts, email.last_error)
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = now + backoff_delay(email.attempts)
+
+
+def send_batch(batch_size=BATCH_SIZE, connection=None):
+    """
+    Envoie un lot d'emails sur une seule connexion. Retourne
+    {'sent': n, 'retried': n, 'failed': n} (tout à zéro si la file est vide).
+    """
+    result = {'sent': 0, 'retried': 0, 'failed': 0}
+    emails = _claim(batch_size)
+    if not emails:
+        return result
+
+    connection = connection or get_connection(fail_silently=False, timeout=settings.EMAIL_TIMEOUT)
+    sent, failed = [], []
+    opened = False
+    try:
+        for index, email in enumerate(emails):
+            if not opened:
+                try:
+                    connection.open()
+                    opened = True
+                except Exception as error:
+                    # Serveur injoignable : tout le reste du lot est reprogrammé
+                    for pending in emails[index:]:
+                        _record_failure(pending, error, timezone.now())
+                    failed.extend(emails[index:])
+                    break
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.recipients,
+                reply_to=[email.reply_to] if email.reply_to else None,
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as error:
+                _record_failure(email, error, timezone.now())
+                failed.append(email)
+                # La connexion est peut-être rompue : réouverte pour l'email suivant
+                connection.close()
+                opened = False
+            else:
+                sent.append(email.pk)
+    finally:
+        if opened:
+            connection.close()
+
+    now = timezone.now()
+    OutboundEmail.objects.filter(pk__in=sent).update(
+        status='sent', sent_at=now, attempts=F('attempts') + 1, claim_token='', last_error='',
+    )
+    OutboundEmail.objects.bulk_update(
+        failed, ['status', 'attempts', 'next_attempt_at', 'last_error', 'claim_token']
+    )
+    result['sent'] = len(sent)
+    result['failed'] = sum(1 for email in failed if email.status == 'failed')
+    result['retried'] = len(failed) - result['failed']
+    return result
+
+
+def send_outbox(batch_size=BATCH_SIZE, max_batches=None):
+    """Vide la file : générateur produisant le résultat de chaque lot"""
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        result = send_batch(batch_size)
+        if not any(result.values()):
+            return
+        batches += 1
+        yield result
+
+
+def backlog():
+    """Nombre d'emails à envoyer et retard du plus ancien (None si la file est à jour)"""
+    now = timezone.now()
+    due = OutboundEmail.objects.filter(_due(now))
+    oldest = due.order_by('next_attempt_at').values_list('next_attempt_at', flat=True).first()
+    if oldest is None:
+        return 0, None
+    return due.count(), now - oldest
+
+
+def purge_sent(days=SENT_RETENTION_DAYS):
+    """Supprime les emails envoyés depuis plus de days jours"""
+    deleted, _ = OutboundEmail.objects.filter(
+        status='sent', sent_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
@@ -0,0 +1,178 @@
+"""
+Pagination par curseur (keyset) pour les listes volumineuses
+
+Contrairement à django.core.paginator.Paginator, aucune requête COUNT(*) ni
+OFFSET n'est émise : la page suivante est obtenue par un filtre
+WHERE (created_at, id) < (valeurs de la dernière ligne), qui s'appuie sur un
+index. La page 5 000 coûte donc autant que la première.
+
+Usage:
+    paginator = CursorPaginator(queryset, ordering=('-created_at', '-id'), per_page=20)
+    page = paginator.get_page(request.GET.get('cursor'))
+
+Le dernier champ de l'ordre doit être unique (en pratique 'id' ou '-id')
+pour que les curseurs soient sans ambiguïté.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import IntegerField, Q
+
+CURSOR_PARAM = 'cursor'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPage:
+    """Une page de résultats et les curseurs vers les pages voisines"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    def __init__(self, queryset, ordering, per_page=20):
+        if not ordering:
+            raise ValueError("CursorPaginator nécessite un ordre explicite")
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        model = queryset.model
+        self.model_fields = []
+        for name, _ in self.fields:
+            try:
+                self.model_fields.append(model._meta.get_field('id' if name == 'pk' else name))
+            except FieldDoesNotExist:
+                raise ValueError(f"Champ d'ordre inconnu pour {model.__name__}: {name}")
+
+    # --- Curseurs opaques : base64(JSON) de la position et de la direction ---
+    def encode_cursor(self, instance, direction):
+        values = [
+            field.value_to_string(instance) for field in self.model_fields
+        ]
+        payload = json.dumps({'p': values, 'd': direction}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            values, direction = payload['p'], payload['d']
+            if direction not in ('next', 'previous') or len(values) != len(self.model_fields):
+                raise InvalidCursor(cursor)
+            return [field.to_python(value) for field, value in zip(self.model_fields, values)], direction
+        except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def _after(self, values, reverse=False):
+        """
+        Condition « strictement après la position » dans l'ordre de pagination
+        (ou avant si reverse) : (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def fetch_rows(self, values, direction, limit):
+        """
+        Au plus limit lignes après la position (avant si direction vaut
+        'previous'), dans l'ordre de parcours. Point d'extension pour les
+        sources qui ne sont pas un simple queryset (voir activity_log.py).
+        """
+        queryset = self.queryset
+        if direction == 'previous':
+            reversed_ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+            queryset = queryset.filter(self._after(values, reverse=True)).order_by(*reversed_ordering)
+        else:
+            if values is not None:
+                queryset = queryset.filter(self._after(values))
+            queryset = queryset.order_by(*self.ordering)
+        return list(queryset[:limit])
+
+    def get_page(self, cursor=None):
+        """Retourne une CursorPage ; un curseur absent ou invalide renvoie la première page."""
+        values, direction = None, 'next'
+        if cursor:
+            try:
+                values, direction = self.decode_cursor(cursor)
+            except InvalidCursor:
+                values, direction = None, 'next'
+
+        # Une ligne de plus pour savoir s'il existe une page au-delà
+        rows = self.fetch_rows(values, direction, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'previous':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'previous') if rows and has_previous else None
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+class RankedPaginator(CursorPaginator):
+    """
+    Pagination d'un classement calculé ailleurs (pertinence d'une recherche) :
+    ranked_ids est la liste ordonnée des pk, le curseur est une position dans
+    cette liste. Les pk exclus par le queryset (filtres de la page) sont retirés
+    du classement d'emblée, en une requête.
+    """
+
+    def __init__(self, queryset, ranked_ids, per_page=20):
+        self.queryset = queryset
+        self.per_page = per_page
+        # Curseur : une seule valeur, la position (décodée comme un entier)
+        self.model_fields = [IntegerField()]
+        kept = set(queryset.filter(pk__in=ranked_ids).values_list('pk', flat=True))
+        self.ranked_ids = [pk for pk in ranked_ids if pk in kept]
+        self.positions = {pk: index for index, pk in enumerate(self.ranked_ids)}
+
+    def encode_cursor(self, instance, direction):
+        payload = json.dumps({'p': [self.positions[instance.pk]], 'd': direction}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def fetch_rows(self, values, direction, limit):
+        if direction == 'previous':
+            end = max(values[0], 0)
+            ids = self.ranked_ids[max(end - limit, 0):end][::-1]
+        else:
+            start = 0 if values is None else max(values[0], -1) + 1
+            ids = self.ranked_ids[start:start + limit]
+        objects = self.queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
@@ -0,0 +1,312 @@
+"""
+Recherche plein texte AIME (projets, événements, informations du jour, MSA)
+
+Les objets indexables sont copiés dans SearchDocument sous forme normalisée
+(minuscules, sans accents, sans élisions ni mots vides). La recherche utilise :
+- MySQL : index FULLTEXT (MATCH ... AGAINST), titre pondéré x2
+- SQLite : table virtuelle FTS5 (bm25), titre pondéré x2
+- autres bases : repli sur LIKE, classement simple titre/corps
+"""
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import SearchDocument, Project, Event, DailyInformation, MutoScienceAdventure
+
+SNIPPET_LENGTH = 300
+MIN_TOKEN_LENGTH = 2
+# innodb_ft_min_token_size par défaut : termes plus courts absents de l'index FULLTEXT
+MYSQL_MIN_TOKEN_LENGTH = 3
+
+FRENCH_STOPWORDS = {
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'cet', 'cette', 'dans', 'de', 'des', 'du',
+    'elle', 'en', 'est', 'et', 'il', 'ils', 'je', 'la', 'le', 'les', 'leur', 'leurs',
+    'lui', 'ma', 'mais', 'me', 'mes', 'mon', 'ne', 'nos', 'notre', 'nous', 'on', 'ou',
+    'par', 'pas', 'pour', 'qu', 'que', 'qui', 'sa', 'se', 'ses', 'son', 'sont', 'sur',
+    'ta', 'te', 'tes', 'ton', 'tu', 'un', 'une', 'vos', 'votre', 'vous', 'y',
+}
+
+_ELISION_RE = re.compile(r"\b(?:l|d|j|m|n|s|t|c|qu|jusqu|lorsqu|puisqu)['’]", re.IGNORECASE)
+_NON_WORD_RE = re.compile(r'[^0-9a-z]+')
+
+
+def strip_accents(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    """Découpe un texte français en termes sans accents ni mots vides"""
+    if not text:
+        return []
+    text = _ELISION_RE.sub(' ', text)
+    text = strip_accents(text).lower()
+    tokens = []
+    for token in _NON_WORD_RE.split(text):
+        if len(token) < MIN_TOKEN_LENGTH or token in FRENCH_STOPWORDS:
+            continue
+        # Pluriels simples : "enfants" -> "enfant", "jeux" -> "jeu"
+        if len(token) > 3 and token[-1] in 'sx':
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def normalize_text(text):
+    return ' '.join(tokenize(text))
+
+
+def make_snippet(text):
+    text = ' '.join((text or '').split())
+    if len(text) <= SNIPPET_LENGTH:
+        return text
+    return text[:SNIPPET_LENGTH].rsplit(' ', 1)[0] + '…'
+
+
+# ==============================================================================
+# SOURCES INDEXÉES
+# ==============================================================================
+# Chaque source retourne les champs du SearchDocument d'un objet.
+
+def _project_document(project):
+    return {
+        'title': project.name,
+        'body': project.description,
+        'url': reverse('main:project_detail', args=[project.slug]),
+        'is_public': project.status in ('active', 'completed'),
+        'available_from': None,
+    }
+
+
+def _event_document(event):
+    return {
+        'title': event.title,
+        'body': f"{event.description} {event.location}",
+        'url': reverse('main:event_detail', args=[event.slug]),
+        'is_public': event.is_public and event.is_active,
+        'available_from': None,
+    }
+
+
+def _daily_information_document(information):
+    return {
+        'title': information.title,
+        'body': information.content,
+        'url': information.link_url or reverse('main:home'),
+        'is_public': information.is_published,
+        'available_from': information.display_date,
+    }
+
+
+def _science_adventure_document(adventure):
+    return {
+        'title': adventure.name,
+        'body': f"{adventure.description} {adventure.age_group}",
+        'url': reverse('main:mutoto_science_adventure'),
+        'is_public': adventure.is_active,
+        'available_from': None,
+    }
+
+
+SEARCH_SOURCES = {
+    Project: _project_document,
+    Event: _event_document,
+    DailyInformation: _daily_information_document,
+    MutoScienceAdventure: _science_adventure_document,
+}
+
+SEARCH_LABELS = {
+    'Project': 'Projet',
+    'Event': 'Événement',
+    'DailyInformation': 'Information',
+    'MutoScienceAdventure': 'Muto Science Adventure',
+}
+
+
+def build_document(instance):
+    """Construit (sans l'enregistrer) le SearchDocument d'un objet"""
+    data = SEARCH_SOURCES[type(instance)](instance)
+    return SearchDocument(
+        model_label=type(instance).__name__,
+        object_id=instance.pk,
+        title=data['title'][:255],
+        snippet=make_snippet(data['body']),
+        url=data['url'][:255],
+        title_normalized=normalize_text(data['title'])[:255],
+        body_normalized=normalize_text(data['body']),
+        is_public=data['is_public'],
+        available_from=data['available_from'],
+    )
+
+
+def index_instance(instance):
+    """Met à jour le document d'un objet (appelé par les signaux post_save)"""
+    document = build_document(instance)
+    SearchDocument.objects.update_or_create(
+        model_label=document.model_label,
+        object_id=document.object_id,
+        defaults={
+            field: getattr(document, field)
+            for field in ('title', 'snippet', 'url', 'title_normalized', 'body_normalized',
+                          'is_public', 'available_from')
+        },
+    )
+
+
+def unindex_instance(instance):
+    SearchDocument.objects.filter(model_label=type(instance).__name__, object_id=instance.pk).delete()
+
+
+def rebuild_index(models=None, chunk_size=500):
+    """Reconstruit l'index des modèles donnés (tous par défaut). Retourne {modèle: nb documents}."""
+    counts = {}
+    for model in models or SEARCH_SOURCES:
+        with transaction.atomic():
+            SearchDocument.objects.filter(model_label=model.__name__).delete()
+            batch = []
+            counts[model.__name__] = 0
+            for instance in model._default_manager.order_by('pk').iterator(chunk_size=chunk_size):
+                batch.append(build_document(instance))
+                if len(batch) >= chunk_size:
+                    SearchDocument.objects.bulk_create(batch)
+                    counts[model.__name__] += len(batch)
+                    batch = []
+            if batch:
+                SearchDocument.objects.bulk_create(batch)
+                counts[model.__name__] += len(batch)
+
+    if connection.vendor == 'sqlite' and _sqlite_fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO main_searchdocument_fts(main_searchdocument_fts) VALUES ('rebuild')")
+    return counts
+
+
+# ==============================================================================
+# RECHERCHE
+# ==============================================================================
+
+def _sqlite_fts_available():
+    return 'main_searchdocument_fts' in connection.introspection.table_names()
+
+
+def _visible_documents(models=None):
+    documents = SearchDocument.objects.filter(is_public=True).exclude(
+        available_from__gt=timezone.now().date()
+    )
+    if models:
+        documents = documents.filter(model_label__in=[model.__name__ for model in models])
+    return documents
+
+
+def _mysql_score(tokens, require_all=False):
+    if require_all:
+        # Mode booléen : chaque terme obligatoire (+), en préfixe (*)
+        query, mode = ' '.join(f'+{token}*' for token in tokens), 'BOOLEAN MODE'
+    else:
+        query, mode = ' '.join(tokens), 'NATURAL LANGUAGE MODE'
+    return RawSQL(
+        f"MATCH(title_normalized, body_normalized) AGAINST (%s IN {mode})"
+        f" + 2 * MATCH(title_normalized) AGAINST (%s IN {mode})",
+        (query, query),
+    )
+
+
+def _fts_match(tokens, require_all=False):
+    # Préfixes entre guillemets, reliés par OR ou (espace) par AND implicite :
+    # bm25 classe ensuite les documents
+    return (' ' if require_all else ' OR ').join(f'"{token}"*' for token in tokens)
+
+
+def _like_condition(tokens, require_all=False):
+    condition = Q()
+    for token in tokens:
+        term = Q(title_normalized__contains=token) | Q(body_normalized__contains=token)
+        condition = condition & term if require_all else condition | term
+    return condition
+
+
+def _limited(results, limit):
+    return results if limit is None else results[:limit]
+
+
+def _search_mysql(tokens, documents, limit, require_all=False):
+    if require_all:
+        # Termes plus courts que innodb_ft_min_token_size : absents de l'index FULLTEXT
+        short = [token for token in tokens if len(token) < MYSQL_MIN_TOKEN_LENGTH]
+        tokens = [token for token in tokens if len(token) >= MYSQL_MIN_TOKEN_LENGTH]
+        if short:
+            documents = documents.filter(_like_condition(short, require_all=True))
+        if not tokens:
+            return _search_like(short, documents, limit, require_all=True)
+    return list(_limited(
+        documents.annotate(score=_mysql_score(tokens, require_all)).filter(score__gt=0)
+        .order_by('-score', '-updated_at'),
+        limit,
+    ))
+
+
+def _search_sqlite_fts(tokens, documents, limit, require_all=False):
+    sql = (
+        "SELECT rowid, bm25(main_searchdocument_fts, 2.0, 1.0) FROM main_searchdocument_fts"
+        " WHERE main_searchdocument_fts MATCH %s ORDER BY 2"
+    )
+    params = [_fts_match(tokens, require_all)]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit * 4)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ranked = cursor.fetchall()
+    # bm25 est négatif : plus il est petit, plus le document est pertinent
+    scores = {rowid: -rank for rowid, rank in ranked}
+    results = list(documents.filter(pk__in=scores))
+    for document in results:
+        document.score = scores[document.pk]
+    results.sort(key=lambda document: document.score, reverse=True)
+    return _limited(results, limit)
+
+
+def _search_like(tokens, documents, limit, require_all=False):
+    matches = documents.filter(_like_condition(tokens, require_all))
+    results = list(matches if limit is None else matches[:limit * 4])
+    for document in results:
+        title_terms = document.title_normalized.split()
+        body_terms = document.body_normalized.split()
+        document.score = sum(2 * title_terms.count(token) + body_terms.count(token) for token in tokens)
+    results.sort(key=lambda document: document.score, reverse=True)
+    return _limited(results, limit)
+
+
+def search(query, models=None, limit=50, require_all=False):
+    """
+    Recherche les documents publics correspondant à la requête, triés par pertinence.
+    models permet de limiter la recherche à certains modèles (ex: [Project]),
+    require_all d'exiger tous les termes (sinon au moins un), limit=None de
+    tout retourner.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    documents = _visible_documents(models)
+    if connection.vendor == 'mysql':
+        return _search_mysql(tokens, documents, limit, require_all)
+    if connection.vendor == 'sqlite' and _sqlite_fts_available():
+        return _search_sqlite_fts(tokens, documents, limit, require_all)
+    return _search_like(tokens, documents, limit, require_all)
+
+
+def search_object_ids(query, model):
+    """
+    Identifiants des objets d'un modèle contenant tous les termes de la
+    requête, par pertinence décroissante (sans limite). None si la requête
+    n'a aucun terme indexable (mots vides, termes d'une lettre) : à
+    l'appelant de chercher autrement.
+    """
+    if not tokenize(query):
+        return None
+    return [document.object_id for document in search(query, models=[model], limit=None, require_all=True)]
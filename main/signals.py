@@ -1,80 +1,50 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile, UserActivity, UserNotification, StaffContribution, Donation, EventParticipation, ImpactPoint
-# --- ImpactPoint sync: DONATION ---
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from .models import (
+    UserProfile, UserActivity, UserNotification, StaffContribution, Donation, EventParticipation, ImpactPoint,
+    Project, Event, DailyInformation, MutotoBikeChallenge, Staff, MutoScienceAdventure, ChatMessage
+)
+from .utils import (
+    STATISTICS_CONTRIBUTIONS, record_statistics_change, record_project_totals_change, invalidate_page_cache
+)
+from .search import SEARCH_SOURCES, index_instance, unindex_instance
+from .dashboard_summary import DashboardSummary, USER_DEPENDENCIES, GLOBAL_DEPENDENCIES
+from .leaderboard import update_leaderboard_entry
+from .gamification import award
+from .notifications import notify, adjust_unread
+from .chat_events import publish_message
+from .impact_map import record_point_change
+from . import impact_sync
 
-@receiver(post_save, sender=Donation)
-def sync_impact_donation(sender, instance, created, **kwargs):
-    if instance.status == 'completed':
-        ImpactPoint.objects.update_or_create(
-            type='donation',
-            related_id=instance.id,
-            related_model='Donation',
-            defaults={
-                'latitude': None,
-                'longitude': None,
-                'description': instance.message or f"Don de {instance.donor_name}",
-                'value': instance.amount,
-                'status': instance.status,
-            }
-        )
 
-# --- ImpactPoint sync: EVENT PARTICIPATION ---
-@receiver(post_save, sender=EventParticipation)
-def sync_impact_event_participation(sender, instance, created, **kwargs):
-    if instance.status in ['confirmed', 'attended']:
-        ImpactPoint.objects.update_or_create(
-            type='participation',
-            related_id=instance.id,
-            related_model='EventParticipation',
-            defaults={
-                'latitude': None,
-                'longitude': None,
-                'description': f"Participation à {instance.event.title}",
-                'value': None,
-                'status': instance.status,
-            }
-        )
+# --- ImpactPoint des dons, participations et contributions : synchronisation groupée au commit ---
+def queue_impact_sync(sender, instance, raw=False, **kwargs):
+    if not raw:
+        impact_sync.enqueue(instance)
+
+for _model in (Donation, EventParticipation, StaffContribution):
+    post_save.connect(queue_impact_sync, sender=_model, dispatch_uid=f'impact_sync_save_{_model.__name__}')
+    post_delete.connect(queue_impact_sync, sender=_model, dispatch_uid=f'impact_sync_delete_{_model.__name__}')
 
-# --- ImpactPoint sync: STAFF CONTRIBUTION ---
-@receiver(post_save, sender=StaffContribution)
-def sync_impact_staff_contribution(sender, instance, created, **kwargs):
-    if instance.is_recorded and instance.validated_at:
-        ImpactPoint.objects.update_or_create(
-            type='contribution',
-            related_id=instance.id,
-            related_model='StaffContribution',
-            defaults={
-                'latitude': None,
-                'longitude': None,
-                'description': instance.object or f"Contribution staff {instance.month}",
-                'value': instance.amount,
-                'status': 'completed',
-            }
-        )
 # --- Notification automatique lors de la validation d'une contribution staff ---
 @receiver(post_save, sender=StaffContribution)
 def notify_staff_contribution(sender, instance, created, **kwargs):
     # On ne notifie que si la contribution vient d'être validée (is_recorded=True et validated_at non nul)
     if instance.is_recorded and instance.validated_at:
-        # Notification pour le contributeur
-        UserNotification.objects.get_or_create(
-            user=instance.staff,
-            title=f"Contribution enregistrée pour {instance.month}",
-            message=f"Votre contribution de {instance.amount} CDF pour '{instance.object or 'cotisation'}' a été enregistrée. Merci !",
-            notification_type='success',
-        )
+        # Notification pour le contributeur (clé de déduplication : une seule par contribution)
+        context = {
+            'contribution_id': instance.pk,
+            'month': instance.month,
+            'amount': instance.amount,
+            'object': instance.object or 'cotisation',
+            'staff': instance.staff.get_full_name(),
+        }
+        notify(instance.staff, 'staff_contribution_recorded', context)
         # Notification pour le responsable caisse (si différent)
         if instance.validated_by and instance.validated_by != instance.staff:
-            UserNotification.objects.get_or_create(
-                user=instance.validated_by,
-                title=f"Contribution staff validée",
-                message=f"Vous avez validé la contribution de {instance.staff.get_full_name()} ({instance.amount} CDF, {instance.month}).",
-                notification_type='info',
-            )
+            notify(instance.validated_by, 'staff_contribution_validated', context)
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -88,7 +58,7 @@ def create_user_profile(sender, instance, created, **kwargs):
         )
         
         # Ajouter badge de bienvenue
-        profile.add_badge('new_member')
+        award(instance, badges=['new_member'])
         
         # Enregistrer l'activité
         UserActivity.objects.create(
@@ -98,15 +68,151 @@ def create_user_profile(sender, instance, created, **kwargs):
         )
         
         # Notification de bienvenue
-        UserNotification.objects.create(
-            user=instance,
-            title='Bienvenue chez AIME !',
-            message=f'Bonjour {instance.first_name or instance.username}, merci de rejoindre notre communauté. Découvrez votre tableau de bord et nos projets.',
-            notification_type='success'
-        )
+        notify(instance, 'welcome', {'name': instance.first_name or instance.username})
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     """Sauvegarder le profil utilisateur"""
     if hasattr(instance, 'userprofile'):
         instance.userprofile.save()
+
+
+# --- Statistiques du site : compteurs incrémentaux (SiteStatistics) ---
+def snapshot_previous_state(sender, instance, **kwargs):
+    """Mémoriser l'état en base avant la sauvegarde, pour calculer les deltas"""
+    if instance.pk is None:
+        instance._db_snapshot = None
+    else:
+        instance._db_snapshot = sender._default_manager.filter(pk=instance.pk).first()
+
+def update_statistics_on_save(sender, instance, **kwargs):
+    record_statistics_change(getattr(instance, '_db_snapshot', None), instance)
+
+def update_statistics_on_delete(sender, instance, **kwargs):
+    record_statistics_change(instance, None)
+
+for _model in STATISTICS_CONTRIBUTIONS:
+    pre_save.connect(snapshot_previous_state, sender=_model, dispatch_uid=f'stats_snapshot_{_model.__name__}')
+    post_save.connect(update_statistics_on_save, sender=_model, dispatch_uid=f'stats_save_{_model.__name__}')
+    post_delete.connect(update_statistics_on_delete, sender=_model, dispatch_uid=f'stats_delete_{_model.__name__}')
+
+
+# --- Totaux dénormalisés des projets (raised_amount, donor_count) ---
+# L'état précédent est mémorisé par snapshot_previous_state (Donation est suivi ci-dessus)
+@receiver(post_save, sender=Donation, dispatch_uid='project_totals_save')
+def update_project_totals_on_save(sender, instance, **kwargs):
+    record_project_totals_change(getattr(instance, '_db_snapshot', None), instance)
+
+@receiver(post_delete, sender=Donation, dispatch_uid='project_totals_delete')
+def update_project_totals_on_delete(sender, instance, **kwargs):
+    record_project_totals_change(instance, None)
+
+
+# --- Agrégats de la carte d'impact (MapAggregateCell) : cellules de l'ancienne et de la nouvelle position ---
+# L'état précédent est mémorisé par snapshot_previous_state (ImpactPoint est suivi ci-dessus)
+@receiver(post_save, sender=ImpactPoint, dispatch_uid='map_aggregates_save')
+def update_map_aggregates_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_point_change(getattr(instance, '_db_snapshot', None), instance)
+
+@receiver(post_delete, sender=ImpactPoint, dispatch_uid='map_aggregates_delete')
+def update_map_aggregates_on_delete(sender, instance, **kwargs):
+    record_point_change(instance, None)
+
+
+# --- Cache des pages anonymes : invalidation des groupes concernés ---
+PAGE_CACHE_DEPENDENCIES = {
+    Project: ('projects',),
+    # Totaux des projets (raised_amount, donor_count) mis à jour par update(), sans signal de Project
+    Donation: ('donations',),
+    Event: ('events',),
+    DailyInformation: ('daily_information',),
+    MutotoBikeChallenge: ('mbc',),
+    Staff: ('staff',),
+    # Noms des membres du staff (page à propos)
+    User: ('staff',),
+    MutoScienceAdventure: ('msa',),
+}
+
+def invalidate_cached_pages(sender, **kwargs):
+    """Après commit, pour qu'une requête concurrente ne remette pas l'ancien contenu en cache"""
+    if kwargs.get('update_fields') == {'last_login'}:
+        # Connexion (update_last_login) : rien d'affiché ne change
+        return
+    groups = PAGE_CACHE_DEPENDENCIES[sender]
+    transaction.on_commit(lambda: invalidate_page_cache(*groups))
+
+for _model in PAGE_CACHE_DEPENDENCIES:
+    post_save.connect(invalidate_cached_pages, sender=_model, dispatch_uid=f'page_cache_save_{_model.__name__}')
+    post_delete.connect(invalidate_cached_pages, sender=_model, dispatch_uid=f'page_cache_delete_{_model.__name__}')
+
+
+# --- Recherche plein texte : maintenir SearchDocument à jour ---
+def update_search_document(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    index_instance(instance)
+
+def delete_search_document(sender, instance, **kwargs):
+    unindex_instance(instance)
+
+for _model in SEARCH_SOURCES:
+    post_save.connect(update_search_document, sender=_model, dispatch_uid=f'search_save_{_model.__name__}')
+    post_delete.connect(delete_search_document, sender=_model, dispatch_uid=f'search_delete_{_model.__name__}')
+
+
+# --- Tableau de bord : invalidation des résumés en cache (DashboardSummary) ---
+def invalidate_dashboard_summary(sender, instance, **kwargs):
+    field = USER_DEPENDENCIES[sender]
+    values = {getattr(instance, field)}
+    previous = getattr(instance, '_db_snapshot', None)
+    if previous is not None:
+        values.add(getattr(previous, field))
+    if field == 'user_id':
+        DashboardSummary.invalidate_users(values)
+    else:
+        DashboardSummary.invalidate_emails(*values)
+
+def invalidate_dashboard_global(sender, **kwargs):
+    DashboardSummary.invalidate_global()
+
+for _model in USER_DEPENDENCIES:
+    post_save.connect(invalidate_dashboard_summary, sender=_model, dispatch_uid=f'dashboard_save_{_model.__name__}')
+    post_delete.connect(invalidate_dashboard_summary, sender=_model, dispatch_uid=f'dashboard_delete_{_model.__name__}')
+
+for _model in GLOBAL_DEPENDENCIES:
+    post_save.connect(invalidate_dashboard_global, sender=_model, dispatch_uid=f'dashboard_global_save_{_model.__name__}')
+    post_delete.connect(invalidate_dashboard_global, sender=_model, dispatch_uid=f'dashboard_global_delete_{_model.__name__}')
+
+
+# --- Notifications : compteur de non lues (les envois en bloc le tiennent à jour eux-mêmes) ---
+@receiver(post_save, sender=UserNotification, dispatch_uid='unread_notification_save')
+def count_created_notification(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not instance.is_read:
+        adjust_unread([instance.user_id], 1)
+
+@receiver(post_delete, sender=UserNotification, dispatch_uid='unread_notification_delete')
+def count_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread([instance.user_id], -1)
+
+
+# --- Chat : réveil des flux SSE ouverts sur la conversation ---
+@receiver(post_save, sender=ChatMessage, dispatch_uid='chat_message_publish')
+def publish_chat_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish_message(instance)
+
+
+# --- Classement : rang incrémental à chaque changement de rôle ---
+# save() n'écrit pas les compteurs (COUNTER_FIELDS) : les points changent par
+# award(), qui met l'entrée à jour lui-même ; ici seul le rôle compte, et les
+# points de l'instance, peut-être périmés, sont relus en base.
+@receiver(post_save, sender=UserProfile, dispatch_uid='leaderboard_profile_save')
+def update_leaderboard_on_role_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_db_snapshot', None)
+    if created or previous is None or previous.role != instance.role:
+        instance.refresh_from_db(fields=UserProfile.COUNTER_FIELDS)
+        update_leaderboard_entry(instance)
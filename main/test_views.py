@@ -1,5 +1,5 @@
 from django.http import JsonResponse
-from .utils import get_site_statistics
+from .utils import get_site_statistics, get_cache_metrics, SITE_STATISTICS_CACHE_KEY
 
 def test_stats(request):
     """Vue de test pour vérifier les statistiques"""
@@ -7,7 +7,8 @@ def test_stats(request):
         stats = get_site_statistics()
         return JsonResponse({
             'success': True,
-            'stats': stats
+            'stats': stats,
+            'cache_metrics': get_cache_metrics(SITE_STATISTICS_CACHE_KEY),
         })
     except Exception as e:
         return JsonResponse({
@@ -1,3 +1,154 @@
-from django.test import TestCase
+import json
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import signing
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .chat_events import read_visitor_token
+from .gamification import award
+from .impact_map import build_map_aggregates
+from .notifications import notify_many
+from .models import (
+    ChatConversation, ChatMessage, Donation, ImpactPoint, LeaderboardEntry, MapAggregateCell, UserProfile,
+)
+
+
+class UserProfileCounterTests(TestCase):
+    """Compteurs mis à jour par F() : jamais écrasés par une instance chargée avant"""
+
+    def test_user_save_keeps_awarded_points(self):
+        user = User.objects.create_user('alice', 'alice@example.org', 'secret')
+        cached = user.userprofile
+        award(user, points=500)
+        expected = UserProfile.objects.values_list('points', 'level').get(user=user)
+
+        # save_user_profile réenregistre le profil en cache (points d'avant l'award)
+        user.first_name = 'Alice'
+        user.save()
+
+        self.assertEqual(cached.points, 50)
+        self.assertEqual(UserProfile.objects.values_list('points', 'level').get(user=user), expected)
+        self.assertEqual(expected[0], 550)
+
+    def test_role_change_keeps_awarded_points_in_leaderboard(self):
+        user = User.objects.create_user('bob', 'bob@example.org', 'secret')
+        cached = user.userprofile
+        award(user, points=500)
+
+        cached.role = 'volunteer'
+        cached.save()
+
+        entry = LeaderboardEntry.objects.get(user=user)
+        self.assertEqual((entry.role, entry.points), ('volunteer', 550))
+        self.assertEqual(cached.points, 550)
+
+    def test_user_save_keeps_leaderboard_points(self):
+        user = User.objects.create_user('carol', 'carol@example.org', 'secret')
+        user.userprofile
+        award(user, points=500)
+
+        user.save()
+
+        self.assertEqual(LeaderboardEntry.objects.get(user=user).points, 550)
+
+    def test_duplicate_recipients_count_one_unread_notification(self):
+        user = User.objects.create_user('dave', 'dave@example.org', 'secret')
+        unread = UserProfile.objects.values_list('unread_notifications', flat=True).get(user=user)
+        context = {'event_id': 1, 'event': 'Collecte', 'date': 'demain', 'location': 'Kinshasa', 'url': '/'}
+
+        created = notify_many([user, user.pk, user], 'event_announcement', context, chunk_size=2)
+
+        self.assertEqual(created, 1)
+        self.assertEqual(
+            UserProfile.objects.values_list('unread_notifications', flat=True).get(user=user), unread + 1
+        )
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ConditionalPageTests(TestCase):
+    """Le 304 d'un utilisateur connecté suit l'en-tête du site (notifications non lues)"""
+
+    def test_new_notification_changes_etag(self):
+        user = User.objects.create_user('erin', 'erin@example.org', 'secret')
+        self.client.force_login(user)
+        etag = self.client.get(reverse('main:projects'))['ETag']
+        self.assertEqual(self.client.get(reverse('main:projects'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        context = {'event_id': 1, 'event': 'Collecte', 'date': 'demain', 'location': 'Kinshasa', 'url': '/'}
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_many([user], 'event_announcement', context)
+
+        response = self.client.get(reverse('main:projects'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+
+class ChatVisitorIdentityTests(TestCase):
+    """Une conversation n'est lisible que par le navigateur qui l'a ouverte"""
+
+    def post_message(self, **data):
+        response = self.client.post(
+            reverse('main:chat_notification'), json.dumps(data), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def stream(self, stream_url):
+        token = parse_qs(urlsplit(stream_url).query)['token'][0]
+        response = self.client.get(reverse('main:chat_stream'), {'token': token, 'after': 0})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response).decode(), read_visitor_token(token)
+
+    def test_email_alone_does_not_reach_existing_conversation(self):
+        victim = self.post_message(email='victim@example.org', name='Victime', message='Mon adresse est secrète')
+        victim_conversation = ChatConversation.objects.get()
+        staff = User.objects.create_user('staff', 'staff@example.org', 'secret', is_staff=True)
+        ChatMessage.objects.create(conversation=victim_conversation, sender=staff, content='Réponse du staff')
+
+        attacker = self.post_message(email='victim@example.org', message='Bonjour')
+        content, conversation_id = self.stream(attacker['stream_url'])
+
+        self.assertNotEqual(conversation_id, victim_conversation.pk)
+        self.assertNotEqual(attacker['visitor_token'], victim['visitor_token'])
+        self.assertNotIn('secrète', content)
+        self.assertNotIn('Réponse du staff', content)
+
+    def test_identity_token_reuses_conversation(self):
+        first = self.post_message(email='visitor@example.org', message='Premier message')
+        second = self.post_message(email='visitor@example.org', message='Suite', visitor_token=first['visitor_token'])
+        content, conversation_id = self.stream(second['stream_url'])
+
+        self.assertEqual(ChatConversation.objects.count(), 1)
+        self.assertEqual(conversation_id, ChatConversation.objects.get().pk)
+        self.assertIn('Premier message', content)
+
+    def test_tokens_from_before_rotation_are_rejected(self):
+        self.post_message(email='visitor@example.org', message='Bonjour')
+        old_token = signing.dumps(
+            {'c': ChatConversation.objects.get().pk}, salt='main.chat.visitor', compress=True
+        )
+        response = self.client.get(reverse('main:chat_stream'), {'token': old_token, 'after': 0})
+        self.assertEqual(response.status_code, 403)
+
+
+class ImpactSyncAggregateTests(TestCase):
+    """La synchronisation des points (upsert sans signaux) tient à jour les agrégats de la carte"""
+
+    def test_donation_update_adjusts_placed_point_cells(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            donation = Donation.objects.create(
+                donor_name='Donateur', donor_email='donor@example.org', amount=100, status='completed'
+            )
+        ImpactPoint.objects.filter(related_model='Donation', related_id=donation.pk).update(
+            latitude=-4.33, longitude=15.31
+        )
+        list(build_map_aggregates())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            donation.amount = 500
+            donation.save()
+
+        cell = MapAggregateCell.objects.get(zoom=0, type='donation')
+        self.assertEqual((cell.count, cell.value_sum), (1, 500.0))
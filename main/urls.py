@@ -19,6 +19,9 @@ urlpatterns = [
     path('observatory/', views.observatory, name='observatory'),
     path('research-center/', views.research_center, name='research_center'),
     path('manifesto/', views.manifesto, name='manifesto'),
+
+    # Recherche
+    path('search/', views.search, name='search'),
     
     # Authentification
     path('signup/', auth_views.signup_view, name='signup'),
@@ -52,6 +55,7 @@ urlpatterns = [
     
     # Carte Interactive d'Impact Social
     path('impact-map/', map_views.InteractiveMapView.as_view(), name='interactive_map'),
+    path('api/impact-points/', map_views.impact_points, name='api_impact_points'),
     path('api/impact-data/', map_views.get_impact_data, name='api_impact_data'),
     path('api/add-impact/', map_views.add_impact_point, name='api_add_impact'),
     path('dashboard/gamification/', map_views.gamification_dashboard, name='gamification_dashboard'),
@@ -65,11 +69,13 @@ urlpatterns = [
     path('dashboard/badges/', dashboard_views.dashboard_badges, name='dashboard_badges'),
     path('dashboard/settings/', dashboard_views.dashboard_settings, name='dashboard_settings'),
     path('dashboard/activities/', dashboard_views.dashboard_activities, name='dashboard_activities'),
+    path('dashboard/leaderboard/', dashboard_views.dashboard_leaderboard, name='dashboard_leaderboard'),
     
     # Actions dashboard
     path('dashboard/join-event/<int:event_id>/', dashboard_views.join_event, name='join_event'),
     path('dashboard/join-challenge/<int:challenge_id>/', dashboard_views.join_challenge, name='join_challenge'),
     path('dashboard/notification/<int:notification_id>/read/', dashboard_views.mark_notification_read, name='mark_notification_read'),
+    path('dashboard/notifications/read-all/', dashboard_views.mark_all_notifications_read, name='mark_all_notifications_read'),
 
     # Chat assistant (dashboard)
     path('dashboard/chat/', dashboard_views.dashboard_chat_conversations, name='dashboard_chat_conversations'),
@@ -81,9 +87,11 @@ urlpatterns = [
     
     # Chat Assistant - Notifications et administration
     path('api/chat/notification/', views.chat_notification, name='chat_notification'),
+    path('api/chat/stream/', views.chat_stream, name='chat_stream'),
     path('admin/chat/', views.chat_admin, name='chat_admin'),
     path('admin/chat/reply/<int:conversation_id>/', views.chat_reply, name='chat_reply'),
     path('admin/chat/close/<int:conversation_id>/', views.close_conversation, name='close_conversation'),
+    path('admin/chat/read/<int:conversation_id>/', views.mark_conversation_read, name='mark_conversation_read'),
     
     # Avis visiteurs
     path('api/visitor-feedback/', views.submit_visitor_feedback, name='submit_visitor_feedback'),
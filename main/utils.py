@@ -1,38 +1,362 @@
-from django.db.models import Sum, Count, Q
+import functools
+import hashlib
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum, Count, Q, F, Func, IntegerField, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
 from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+from django.utils import timezone
 from .models import (
     Donation, MBCParticipant, Event, Project, UserProfile, 
-    EventParticipation, StaffContribution, ImpactPoint
+    EventParticipation, StaffContribution, ImpactPoint, SiteStatistics
 )
+from .notifications import unread_cache_key, unread_count
 
-def get_site_statistics():
+logger = logging.getLogger(__name__)
+
+SITE_STATISTICS_CACHE_KEY = 'site_statistics_v1'
+
+
+def aggregate_subquery(queryset, function, field='pk', output_field=None):
+    """
+    SELECT COUNT(...)/SUM(...) corrélé sans GROUP BY : l'agrégat SQL est écrit
+    avec Func pour que l'ORM n'ajoute pas de regroupement.
     """
-    Calcule et retourne toutes les statistiques dynamiques du site
-    basées sur les vraies données de la base de données
+    output_field = output_field or IntegerField()
+    value = Func(field, function=function, output_field=output_field)
+    return Coalesce(
+        Subquery(queryset.order_by().annotate(value=value).values('value')[:1], output_field=output_field),
+        0,
+        output_field=output_field,
+    )
+
+
+# ==============================================================================
+# CACHE STALE-WHILE-REVALIDATE (anti "cache stampede")
+# ==============================================================================
+# Les compteurs sont accumulés en mémoire dans chaque worker puis reportés dans
+# le cache au plus toutes les SWR_METRICS_FLUSH_INTERVAL secondes, pour ne pas
+# ajouter une écriture en cache à chaque lecture.
+
+SWR_METRICS = ('hits', 'stale_hits', 'recomputes', 'early_recomputes', 'waits')
+SWR_METRICS_FLUSH_INTERVAL = 60
+
+_swr_metrics = Counter()
+_swr_metrics_lock = threading.Lock()
+_swr_metrics_flushed_at = time.monotonic()
+
+
+def _swr_metric_key(cache_key, name):
+    return f'{cache_key}:swr:{name}'
+
+
+def _flush_swr_metrics(force=False):
+    global _swr_metrics_flushed_at
+    with _swr_metrics_lock:
+        if not force and time.monotonic() - _swr_metrics_flushed_at < SWR_METRICS_FLUSH_INTERVAL:
+            return
+        pending = dict(_swr_metrics)
+        _swr_metrics.clear()
+        _swr_metrics_flushed_at = time.monotonic()
     
-    OPTIMISATION: Utilise le cache Redis pour éviter les calculs répétés
-    Cache de 5 minutes (300 secondes)
+    for key, amount in pending.items():
+        if cache.add(key, amount, None):
+            continue
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            cache.set(key, amount, None)
+
+
+def _record_swr_metric(cache_key, name):
+    with _swr_metrics_lock:
+        _swr_metrics[_swr_metric_key(cache_key, name)] += 1
+    _flush_swr_metrics()
+
+
+def get_cache_metrics(cache_key):
+    """Compteurs hits / stale_hits / recomputes... d'une clé gérée par stale_while_revalidate"""
+    _flush_swr_metrics(force=True)
+    keys = {name: _swr_metric_key(cache_key, name) for name in SWR_METRICS}
+    values = cache.get_many(keys.values())
+    return {name: values.get(key, 0) for name, key in keys.items()}
+
+
+def stale_while_revalidate(cache_key, timeout=300, stale_timeout=3600, beta=1.0,
+                           lock_timeout=30, wait_timeout=2.0):
     """
+    Décorateur de cache qui évite que tous les workers recalculent en même temps
+    une valeur expirée.
     
-    # Essayer de récupérer depuis le cache
-    cache_key = 'site_statistics_v1'
-    cached_stats = cache.get(cache_key)
+    - Valeur fraîche : servie directement, avec un rafraîchissement anticipé
+      probabiliste à l'approche de l'expiration (algorithme "XFetch", réglé par beta).
+    - Valeur expirée : servie telle quelle (pendant au plus stale_timeout secondes)
+      pendant qu'un seul worker, détenteur d'un verrou en cache, la recalcule.
+    - Aucune valeur : un seul worker calcule, les autres attendent au plus
+      wait_timeout secondes avant de calculer eux-mêmes.
     
-    if cached_stats is not None:
-        return cached_stats
+    cache_key peut être une chaîne ou une fonction (*args, **kwargs) -> chaîne.
+    """
+    def decorator(func):
+        def resolve_key(args, kwargs):
+            return cache_key(*args, **kwargs) if callable(cache_key) else cache_key
+        
+        def recompute(key, args, kwargs):
+            started = time.monotonic()
+            value = func(*args, **kwargs)
+            delta = time.monotonic() - started
+            entry = {'value': value, 'expires_at': time.time() + timeout, 'delta': delta}
+            cache.set(key, entry, timeout + stale_timeout)
+            _record_swr_metric(key, 'recomputes')
+            return value
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = resolve_key(args, kwargs)
+            lock_key = f'{key}:swr:lock'
+            entry = cache.get(key)
+            if not (isinstance(entry, dict) and 'expires_at' in entry):
+                entry = None
+            
+            if entry is not None:
+                remaining = entry['expires_at'] - time.time()
+                # XFetch : plus l'expiration approche (et plus le calcul est long),
+                # plus la probabilité de rafraîchir en avance est forte
+                early = entry['delta'] * beta * -math.log(1.0 - random.random()) >= remaining
+                if not early:
+                    _record_swr_metric(key, 'hits')
+                    return entry['value']
+                
+                if cache.add(lock_key, 1, lock_timeout):
+                    try:
+                        if remaining > 0:
+                            _record_swr_metric(key, 'early_recomputes')
+                        return recompute(key, args, kwargs)
+                    except Exception:
+                        logger.exception("Recalcul de %s impossible, valeur précédente servie", key)
+                        return entry['value']
+                    finally:
+                        cache.delete(lock_key)
+                
+                _record_swr_metric(key, 'hits' if remaining > 0 else 'stale_hits')
+                return entry['value']
+            
+            # Aucune valeur en cache
+            if not cache.add(lock_key, 1, lock_timeout):
+                _record_swr_metric(key, 'waits')
+                deadline = time.monotonic() + wait_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    entry = cache.get(key)
+                    if isinstance(entry, dict) and 'expires_at' in entry:
+                        return entry['value']
+                return recompute(key, args, kwargs)
+            
+            try:
+                return recompute(key, args, kwargs)
+            finally:
+                cache.delete(lock_key)
+        
+        wrapper.cache_key = cache_key
+        return wrapper
+    return decorator
+
+
+# ==============================================================================
+# CACHE DES PAGES POUR LES VISITEURS ANONYMES
+# ==============================================================================
+# Les clés sont versionnées par "groupe" de contenu (projects, events, ...) :
+# invalider un groupe incrémente sa version, ce qui rend obsolètes d'un coup
+# toutes les pages et tous les fragments {% cache %} qui en dépendent.
+
+PAGE_CACHE_VERSION_KEY = 'page_cache_version:{}'
+PAGE_CACHE_MODIFIED_KEY = 'page_cache_modified:{}'
+CSRF_TOKEN_PLACEHOLDER = '__aime_csrf_token__'
+_CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def get_cache_versions(groups):
+    """Retourne {groupe: version} en une seule lecture du cache"""
+    keys = {group: PAGE_CACHE_VERSION_KEY.format(group) for group in groups}
+    values = cache.get_many(keys.values())
+    return {group: values.get(key, 1) for group, key in keys.items()}
+
+
+def invalidate_page_cache(*groups):
+    """Invalide toutes les pages et fragments dépendant de ces groupes"""
+    now = time.time()
+    for group in groups:
+        key = PAGE_CACHE_VERSION_KEY.format(group)
+        if not cache.add(key, 2, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 2, None)
+        # Date de la modification : Last-Modified des GET conditionnels
+        cache.set(PAGE_CACHE_MODIFIED_KEY.format(group), now, None)
+
+
+def cache_page_for_anonymous(timeout, groups=()):
+    """
+    Met en cache la page complète pour les visiteurs anonymes.
     
-    # Si pas en cache, calculer les statistiques
+    Les utilisateurs connectés, les requêtes autres que GET/HEAD et les
+    visiteurs ayant des messages flash en attente ne sont jamais servis depuis
+    le cache. Le jeton CSRF est retiré de la page stockée et réinjecté à
+    chaque réponse pour que les formulaires (avis visiteur) restent valides.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated
+                    or len(get_messages(request))):
+                return view_func(request, *args, **kwargs)
+            
+            versions = get_cache_versions(groups)
+            version_tag = '.'.join(str(versions[group]) for group in groups)
+            path_hash = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+            cache_key = f'anon_page:{view_func.__name__}:{version_tag}:{path_hash}'
+            
+            cached = cache.get(cache_key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(
+                    content.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request)),
+                    content_type=content_type,
+                )
+                response['X-Page-Cache'] = 'hit'
+                return response
+            
+            response = view_func(request, *args, **kwargs)
+            if (response.status_code == 200 and not response.streaming
+                    and not response.cookies):
+                content = response.content.decode(response.charset)
+                content = _CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_TOKEN_PLACEHOLDER}\g<2>', content)
+                cache.set(cache_key, (content, response['Content-Type']), timeout)
+                response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+# ==============================================================================
+# GET CONDITIONNELS (ETag / Last-Modified)
+# ==============================================================================
+
+def conditional_on(groups=(), statistics=False, window=None):
+    """
+    Répond "304 Not Modified" sans exécuter la vue quand les données affichées
+    n'ont pas changé depuis la dernière visite.
+    
+    Le validateur est dérivé des groupes du cache des pages (version et date
+    de la dernière invalidation, voir invalidate_page_cache) et, si statistics,
+    de SiteStatistics.updated_at lu dans l'entrée en cache de
+    get_site_statistics : une seule lecture du cache, aucune requête SQL.
+    window (secondes) : pages dont le contenu dépend de l'heure (événements
+    à venir, articles du jour), le validateur change au moins à chaque
+    fenêtre. L'ETag dépend aussi de l'utilisateur, car l'en-tête du site
+    change selon la connexion : nom affiché et nombre de notifications non
+    lues (lu dans la même lecture du cache). Pas de Last-Modified pour un
+    utilisateur connecté, ces valeurs n'ont pas de date.
+    """
+    def compute_validators(request, *args, **kwargs):
+        if getattr(request, '_conditional_validators', None) is not None:
+            return request._conditional_validators
+        
+        if len(get_messages(request)):
+            # Messages flash en attente : toujours renvoyer la page complète
+            request._conditional_validators = (None, None)
+            return request._conditional_validators
+        
+        keys = [PAGE_CACHE_VERSION_KEY.format(group) for group in groups]
+        keys += [PAGE_CACHE_MODIFIED_KEY.format(group) for group in groups]
+        if statistics:
+            keys.append(SITE_STATISTICS_CACHE_KEY)
+        user = request.user
+        if user.is_authenticated:
+            keys.append(unread_cache_key(user.pk))
+        values = cache.get_many(keys)
+        
+        if user.is_authenticated:
+            unread = values.get(unread_cache_key(user.pk))
+            if unread is None:
+                unread = unread_count(user)
+            parts = [str(user.pk), user.get_short_name() or user.get_username(), f'unread:{unread}']
+        else:
+            parts = ['anonymous']
+        stamps = []
+        for group in groups:
+            modified_key = PAGE_CACHE_MODIFIED_KEY.format(group)
+            modified = values.get(modified_key)
+            if modified is None:
+                # Cache vidé (versions revenues à 1) : nouvelle date, pour ne
+                # pas retomber sur un ETag déjà envoyé avec un autre contenu
+                modified = time.time()
+                if not cache.add(modified_key, modified, None):
+                    modified = cache.get(modified_key, modified)
+            parts.append(f'{group}:{values.get(PAGE_CACHE_VERSION_KEY.format(group), 1)}:{modified}')
+            stamps.append(modified)
+        
+        if statistics:
+            entry = values.get(SITE_STATISTICS_CACHE_KEY)
+            stats = entry['value'] if isinstance(entry, dict) and 'value' in entry else get_site_statistics()
+            updated_at = stats.get('updated_at')
+            parts.append(updated_at.isoformat() if updated_at else '-')
+            if updated_at:
+                stamps.append(updated_at.timestamp())
+        
+        if window:
+            start = time.time() // window * window
+            parts.append(f'window:{start:.0f}')
+            stamps.append(start)
+        
+        etag = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+        if stamps and not user.is_authenticated:
+            last_modified = datetime.fromtimestamp(max(stamps), tz=dt_timezone.utc)
+        else:
+            last_modified = None
+        request._conditional_validators = (etag, last_modified)
+        return request._conditional_validators
+    
+    def etag_func(request, *args, **kwargs):
+        return compute_validators(request, *args, **kwargs)[0]
+    
+    def last_modified_func(request, *args, **kwargs):
+        return compute_validators(request, *args, **kwargs)[1]
+    
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+
+def compute_site_statistics():
+    """
+    Recalcule les compteurs de SiteStatistics depuis les tables sources.
+
+    Utilisé uniquement par rebuild_site_statistics() : c'est la version
+    coûteuse (une quinzaine de COUNT/SUM/DISTINCT) que la table de compteurs
+    permet d'éviter à chaque requête.
+    """
     # 1. FC collectés (total des dons complétés)
     total_donations = Donation.objects.filter(
         status='completed'
     ).aggregate(total=Sum('amount'))['total'] or 0
     
     # 2. Enfants aidés (utilisateurs avec le rôle 'child' + participants MBC confirmés)
-    children_helped = UserProfile.objects.filter(role='child').count()
-    confirmed_mbc_participants = MBCParticipant.objects.filter(status='confirmed').count()
-    # Total unique d'enfants aidés
-    total_children_helped = children_helped + confirmed_mbc_participants
+    children_profiles = UserProfile.objects.filter(role='child').count()
+    mbc_participants = MBCParticipant.objects.filter(status='confirmed').count()
     
     # 3. Projets actifs
     active_projects = Project.objects.filter(status='active').count()
@@ -51,10 +375,7 @@ def get_site_statistics():
         Q(role='parent') | Q(role='member')
     ).count()
     
-    # 7. Participants MBC (total confirmés)
-    mbc_participants = confirmed_mbc_participants
-    
-    # 8. Quartiers impactés (nombre de zones géographiques distinctes)
+    # 7. Quartiers impactés (nombre de zones géographiques distinctes)
     # Basé sur les coordonnées GPS des utilisateurs et des points d'impact
     user_locations = UserProfile.objects.filter(
         latitude__isnull=False,
@@ -66,51 +387,319 @@ def get_site_statistics():
         longitude__isnull=False
     ).values('latitude', 'longitude').distinct().count()
     
-    quartiers_impacted = user_locations + impact_locations  # Nombre réel de quartiers impactés
-    
-    # 9. Contributions du staff (total)
+    # 8. Contributions du staff (total)
     staff_contributions = StaffContribution.objects.filter(
         is_recorded=True
     ).aggregate(total=Sum('amount'))['total'] or 0
     
-    # 10. Total des participations aux événements
+    # 9. Total des participations aux événements
     event_participations = EventParticipation.objects.filter(
         status__in=['confirmed', 'attended']
     ).count()
     
-    # Calculer les écoles partenaires (basé sur les projets avec 'école' dans le nom)
+    # 10. Écoles partenaires (basé sur les projets avec 'école' dans le nom)
     schools_partners = Project.objects.filter(
         Q(name__icontains='école') | Q(name__icontains='school') | Q(description__icontains='école'),
         status='active'
     ).count()
     
-    # Provinces touchées (basé sur les données réelles de localisation)
-    provinces_count = 1  # Commencer avec 1 (Kinshasa par défaut)
-    
-    stats = {
-        'total_donations': int(total_donations),
-        'total_children_helped': total_children_helped,
+    return {
+        'total_donations': Decimal(total_donations),
+        'children_profiles': children_profiles,
+        'mbc_participants': mbc_participants,
         'active_projects': active_projects,
         'total_events': total_events,
         'formations_dispensed': formations_dispensed,
         'families_supported': families_supported,
-        'mbc_participants': mbc_participants,
-        'quartiers_impacted': quartiers_impacted,
-        'staff_contributions': int(staff_contributions),
+        'user_locations': user_locations,
+        'impact_locations': impact_locations,
+        'staff_contributions': Decimal(staff_contributions),
         'event_participations': event_participations,
         'schools_partners': schools_partners,
-        'provinces_count': provinces_count,
-        
-        # Statistiques supplémentaires
         'total_users': User.objects.filter(is_active=True).count(),
         'total_volunteers': UserProfile.objects.filter(role='volunteer').count(),
         'total_donors': Donation.objects.values('donor_email').distinct().count(),
     }
+
+
+def rebuild_site_statistics(dry_run=False):
+    """
+    Recalcule entièrement la ligne SiteStatistics.
+
+    Retourne (statistiques, écarts) où écarts est un dict
+    {champ: (valeur stockée, valeur réelle)} pour les compteurs qui avaient dérivé.
+    """
+    with transaction.atomic():
+        live = compute_site_statistics()
+        row = SiteStatistics.objects.select_for_update().filter(pk=SiteStatistics.SINGLETON_ID).first()
+        
+        if row is None:
+            drift = {field: (None, value) for field, value in live.items()}
+            row = SiteStatistics(pk=SiteStatistics.SINGLETON_ID)
+        else:
+            drift = {
+                field: (getattr(row, field), value)
+                for field, value in live.items()
+                if getattr(row, field) != value
+            }
+        
+        if not dry_run:
+            for field, value in live.items():
+                setattr(row, field, value)
+            row.updated_at = timezone.now()
+            row.save()
+    
+    if not dry_run:
+        cache.delete(SITE_STATISTICS_CACHE_KEY)
+    return row, drift
+
+
+@stale_while_revalidate(SITE_STATISTICS_CACHE_KEY, timeout=300, stale_timeout=3600)
+def get_site_statistics():
+    """
+    Retourne toutes les statistiques dynamiques du site.
+    
+    OPTIMISATION: lit la ligne unique SiteStatistics (tenue à jour par les
+    signaux) au lieu de recalculer les agrégations. Cache de 5 minutes en
+    stale-while-revalidate : un seul worker recalcule à l'expiration.
+    """
+    row = SiteStatistics.objects.filter(pk=SiteStatistics.SINGLETON_ID).first()
+    if row is None:
+        # Première utilisation : initialiser les compteurs depuis les données réelles
+        row, _ = rebuild_site_statistics()
+    
+    return row.as_dict()
+
+
+# ==============================================================================
+# MISE À JOUR INCRÉMENTALE DES COMPTEURS
+# ==============================================================================
+# Chaque modèle suivi déclare sa "contribution" aux compteurs :
+#   - des compteurs additifs (COUNT/SUM) : {champ: valeur}
+#   - des compteurs distincts (COUNT DISTINCT) : {champ: filtre identifiant la valeur}
+# Lors d'un save/delete, on applique la différence entre l'ancienne et la
+# nouvelle contribution avec des F() atomiques.
+
+def _money(value):
+    return Decimal(str(value or 0))
+
+
+def _coordinates(instance):
+    if instance.latitude is None or instance.longitude is None:
+        return None
+    return {'latitude': instance.latitude, 'longitude': instance.longitude}
+
+
+def _is_school_project(project):
+    name = (project.name or '').lower()
+    description = (project.description or '').lower()
+    return 'école' in name or 'school' in name or 'école' in description
+
+
+def _donation_contribution(donation):
+    return (
+        {'total_donations': _money(donation.amount) if donation.status == 'completed' else Decimal('0')},
+        {'total_donors': {'donor_email': donation.donor_email}},
+    )
+
+
+def _profile_contribution(profile):
+    return (
+        {
+            'children_profiles': int(profile.role == 'child'),
+            'families_supported': int(profile.role in ('parent', 'member')),
+            'total_volunteers': int(profile.role == 'volunteer'),
+        },
+        {'user_locations': _coordinates(profile)},
+    )
+
+
+def _mbc_participant_contribution(participant):
+    return {'mbc_participants': int(participant.status == 'confirmed')}, {}
+
+
+def _event_contribution(event):
+    return (
+        {
+            'total_events': int(event.is_active),
+            'formations_dispensed': int(event.is_active and event.event_type == 'workshop'),
+        },
+        {},
+    )
+
+
+def _project_contribution(project):
+    active = project.status == 'active'
+    return (
+        {
+            'active_projects': int(active),
+            'schools_partners': int(active and _is_school_project(project)),
+        },
+        {},
+    )
+
+
+def _impact_point_contribution(point):
+    return {}, {'impact_locations': _coordinates(point)}
+
+
+def _staff_contribution_contribution(contribution):
+    return {'staff_contributions': _money(contribution.amount) if contribution.is_recorded else Decimal('0')}, {}
+
+
+def _event_participation_contribution(participation):
+    return {'event_participations': int(participation.status in ('confirmed', 'attended'))}, {}
+
+
+def _user_contribution(user):
+    return {'total_users': int(user.is_active)}, {}
+
+
+STATISTICS_CONTRIBUTIONS = {
+    Donation: _donation_contribution,
+    UserProfile: _profile_contribution,
+    MBCParticipant: _mbc_participant_contribution,
+    Event: _event_contribution,
+    Project: _project_contribution,
+    ImpactPoint: _impact_point_contribution,
+    StaffContribution: _staff_contribution_contribution,
+    EventParticipation: _event_participation_contribution,
+    User: _user_contribution,
+}
+
+
+def record_statistics_change(previous, current):
+    """
+    Applique à SiteStatistics la différence entre l'ancien et le nouvel état
+    d'un objet suivi (previous=None pour une création, current=None pour une
+    suppression).
+    """
+    instance = current if current is not None else previous
+    contribution = STATISTICS_CONTRIBUTIONS.get(type(instance))
+    if contribution is None:
+        return
+    
+    old_counters, old_distinct = contribution(previous) if previous is not None else ({}, {})
+    new_counters, new_distinct = contribution(current) if current is not None else ({}, {})
+    
+    deltas = {}
+    for field in set(old_counters) | set(new_counters):
+        delta = new_counters.get(field, 0) - old_counters.get(field, 0)
+        if delta:
+            deltas[field] = delta
+    
+    # Compteurs distincts : ne bouger que si la valeur apparaît/disparaît
+    others = type(instance)._default_manager.exclude(pk=instance.pk)
+    for field in set(old_distinct) | set(new_distinct):
+        before, after = old_distinct.get(field), new_distinct.get(field)
+        if before == after:
+            continue
+        if before is not None and not others.filter(**before).exists():
+            deltas[field] = deltas.get(field, 0) - 1
+        if after is not None and not others.filter(**after).exists():
+            deltas[field] = deltas.get(field, 0) + 1
+    
+    if not deltas:
+        return
+    
+    # Si la ligne n'existe pas encore, rien à faire : elle sera initialisée
+    # depuis les données réelles à la première lecture (get_site_statistics)
+    SiteStatistics.objects.filter(pk=SiteStatistics.SINGLETON_ID).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+
+# ==============================================================================
+# TOTAUX DÉNORMALISÉS DES PROJETS (raised_amount, donor_count)
+# ==============================================================================
+
+def _project_donation_key(donation):
+    """(projet, email, montant) d'un don comptabilisé dans son projet, sinon None"""
+    if donation is None or donation.status != 'completed' or donation.project_id is None:
+        return None
+    return donation.project_id, donation.donor_email, _money(donation.amount)
+
+
+def record_project_totals_change(previous, current):
+    """
+    Ajuste Project.raised_amount et Project.donor_count après la création,
+    modification (validation, remboursement...) ou suppression d'un don.
+    Appelé dans la transaction de Donation.save()/delete().
+    """
+    before, after = _project_donation_key(previous), _project_donation_key(current)
+    if before == after:
+        return
+    
+    instance = current if current is not None else previous
+    deltas = {}
+    for key, sign in ((before, -1), (after, 1)):
+        if key is not None:
+            project_deltas = deltas.setdefault(key[0], {'amount': Decimal('0'), 'donors': 0})
+            project_deltas['amount'] += sign * key[2]
+    
+    # Verrou sur les projets concernés (ordre des pk : pas d'interblocage),
+    # pour que le test d'existence des autres dons du même donateur soit fiable
+    list(Project.objects.select_for_update().filter(pk__in=deltas).order_by('pk').values_list('pk', flat=True))
     
-    # Mettre en cache pour 5 minutes (300 secondes)
-    cache.set(cache_key, stats, 300)
+    others = Donation.objects.filter(status='completed').exclude(pk=instance.pk)
+    if before is not None and before[:2] != (after or (None, None))[:2]:
+        if not others.filter(project_id=before[0], donor_email=before[1]).exists():
+            deltas[before[0]]['donors'] -= 1
+    if after is not None and after[:2] != (before or (None, None))[:2]:
+        if not others.filter(project_id=after[0], donor_email=after[1]).exists():
+            deltas[after[0]]['donors'] += 1
     
-    return stats
+    now = timezone.now()
+    for project_id, delta in deltas.items():
+        if delta['amount'] or delta['donors']:
+            Project.objects.filter(pk=project_id).update(
+                raised_amount=F('raised_amount') + delta['amount'],
+                donor_count=F('donor_count') + delta['donors'],
+                updated_at=now,
+            )
+
+
+def reconcile_project_totals(dry_run=False):
+    """
+    Recalcule raised_amount et donor_count des projets avec une seule requête
+    groupée sur les dons, puis corrige les écarts en bulk_update.
+    
+    Même règle que la migration 0013 : un projet sans aucun don enregistré
+    garde ses totaux (montants saisis avant le suivi des dons).
+    
+    Retourne {projet: ((montant stocké, donateurs stockés), (montant réel, donateurs réels))}.
+    """
+    with transaction.atomic():
+        live = {
+            row['project']: (_money(row['total']), row['donors'])
+            for row in Donation.objects.filter(status='completed', project__isnull=False)
+            .values('project')
+            .annotate(total=Sum('amount'), donors=Count('donor_email', distinct=True))
+            .order_by()
+        }
+        
+        drift = {}
+        changed = []
+        now = timezone.now()
+        projects = (
+            Project.objects.select_for_update()
+            .filter(pk__in=Donation.objects.filter(project__isnull=False).values('project'))
+            .only('id', 'name', 'raised_amount', 'donor_count')
+        )
+        for project in projects:
+            stored = (_money(project.raised_amount), project.donor_count)
+            expected = live.get(project.pk, (Decimal('0.00'), 0))
+            if stored != expected:
+                drift[project] = (stored, expected)
+                project.raised_amount, project.donor_count = expected
+                project.updated_at = now
+                changed.append(project)
+        
+        if changed and not dry_run:
+            Project.objects.bulk_update(changed, ['raised_amount', 'donor_count', 'updated_at'], batch_size=500)
+    return drift
 
 def format_number(number):
     """
@@ -1,23 +1,50 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.core.paginator import Paginator
-from django.db.models import Q, Sum
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponseNotAllowed, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Substr
+from django.urls import reverse
+from urllib.parse import urlencode
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
+from django.utils.functional import SimpleLazyObject
 import json
+import time
 from .models import (
     Project, Category, Event, MutotoBikeChallenge, MBCParticipant,
     ContactMessage, NewsletterSubscription, Donation, Staff,
-    MutoScienceAdventure, ChatConversation, ChatMessage, User, VisitorFeedback
+    MutoScienceAdventure, ChatConversation, ChatMessage, ChatVisitor, VisitorFeedback,
+    DailyInformation
 )
 from .forms import ContactForm, NewsletterForm, MBCRegistrationForm, DonationForm, VisitorFeedbackForm
-from .utils import get_site_statistics
+from .utils import (
+    get_site_statistics, get_cache_versions, cache_page_for_anonymous, conditional_on, aggregate_subquery
+)
+from .pagination import CursorPaginator, RankedPaginator, CURSOR_PARAM
+from .search import search as search_documents, search_object_ids, SEARCH_LABELS
+from .chat_events import (
+    STREAM_MAX_SECONDS, identity_token, message_stream, read_identity_token, read_visitor_token, visitor_token
+)
+from .outbox import queue_email
+
+# Groupes de cache dont dépend chaque page (voir utils.invalidate_page_cache)
+HOME_CACHE_GROUPS = ('projects', 'events', 'daily_information', 'mbc')
+# Fenêtre (secondes) des contenus de l'accueil qui dépendent de l'heure (événements à venir)
+HOME_TIME_WINDOW = 300
+
+CHAT_ADMIN_PER_PAGE = 20
+CHAT_SNIPPET_LENGTH = 120
+
 
+# Événements à venir et articles du jour dépendent aussi de l'heure : fenêtre du cache de page
+@conditional_on(groups=HOME_CACHE_GROUPS, statistics=True, window=HOME_TIME_WINDOW)
+@cache_page_for_anonymous(300, groups=HOME_CACHE_GROUPS)
 def home(request):
     """Page d'accueil AIME - Optimisée"""
     # Optimisation: select_related pour éviter N+1 queries
@@ -37,14 +64,14 @@ def home(request):
     ).first()
     
     # Articles du jour - Récupérer les articles publiés
-    from .models import DailyInformation
     daily_information = DailyInformation.objects.filter(
         is_published=True,
         display_date__lte=timezone.now().date()
     ).order_by('-is_featured', '-display_date')[:3]
     
     # Statistiques dynamiques basées sur la vraie base de données
-    stats = get_site_statistics()
+    # (évaluées seulement si le fragment {% cache %} correspondant a expiré)
+    stats = SimpleLazyObject(get_site_statistics)
     
     context = {
         'title': 'Agissons Ici et Maintenant pour les Enfants',
@@ -52,10 +79,15 @@ def home(request):
         'upcoming_events': upcoming_events,
         'recent_mbc': recent_mbc,
         'daily_information': daily_information,
-        'stats': stats
+        'stats': stats,
+        'cache_versions': get_cache_versions(HOME_CACHE_GROUPS),
+        # Clés des fragments dépendant de l'heure : événements passés, article du jour
+        'cache_window': int(time.time() // HOME_TIME_WINDOW),
+        'cache_today': timezone.localdate().isoformat(),
     }
     return render(request, 'main/home.html', context)
 
+@cache_page_for_anonymous(3600, groups=('staff',))
 def about(request):
     """Page à propos d'AIME"""
     staff_members = Staff.objects.filter(is_visible=True).select_related('user')[:6]
@@ -66,6 +98,7 @@ def about(request):
     }
     return render(request, 'main/about.html', context)
 
+@conditional_on(groups=('projects', 'donations'))
 def projects(request):
     """Liste des projets - Optimisée"""
     # Optimisation: select_related et only pour charger uniquement les champs nécessaires
@@ -76,7 +109,7 @@ def projects(request):
         'coordinator'
     ).only(
         'id', 'name', 'slug', 'description', 'image',
-        'raised_amount', 'goal_amount', 'status', 'created_at',
+        'raised_amount', 'goal_amount', 'donor_count', 'status', 'created_at',
         'category__name', 'category__color',
         'coordinator__first_name', 'coordinator__last_name'
     ).order_by('-created_at')
@@ -88,17 +121,19 @@ def projects(request):
     if category_filter:
         projects_list = projects_list.filter(category__slug=category_filter)
     
-    # Recherche
+    # Recherche : index plein texte (voir search.py), tous les termes, par pertinence
     search_query = request.GET.get('search')
-    if search_query:
-        projects_list = projects_list.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
-    
-    paginator = Paginator(projects_list, 9)
-    page_number = request.GET.get('page')
-    projects = paginator.get_page(page_number)
+    ranked_ids = search_object_ids(search_query, Project) if search_query else None
+    if ranked_ids is not None:
+        paginator = RankedPaginator(projects_list, ranked_ids, per_page=9)
+    else:
+        if search_query:
+            # Aucun terme indexable (« AI », mots vides) : recherche littérale
+            projects_list = projects_list.filter(
+                Q(name__icontains=search_query) | Q(description__icontains=search_query)
+            )
+        paginator = CursorPaginator(projects_list, ordering=('-created_at', '-id'), per_page=9)
+    projects = paginator.get_page(request.GET.get(CURSOR_PARAM))
     
     context = {
         'title': 'Nos Projets',
@@ -109,6 +144,7 @@ def projects(request):
     }
     return render(request, 'main/projects.html', context)
 
+@conditional_on(groups=('projects', 'donations'))
 def project_detail(request, slug):
     """Détail d'un projet - Optimisé"""
     project = get_object_or_404(
@@ -132,12 +168,12 @@ def project_detail(request, slug):
 
 def mutoto_bike_challenge(request):
     """Page principale du Mutoto Bike Challenge"""
-    current_event = MutotoBikeChallenge.objects.filter(
+    current_event = MutotoBikeChallenge.objects.with_participant_stats().filter(
         is_active=True,
         date__gte=timezone.now()
-    ).first()
+    ).order_by('date').first()
     
-    past_events = MutotoBikeChallenge.objects.filter(
+    past_events = MutotoBikeChallenge.objects.with_participant_stats().filter(
         date__lt=timezone.now()
     ).order_by('-date')[:3]
     
@@ -158,10 +194,10 @@ def mutoto_bike_challenge(request):
 
 def mbc_registration(request):
     """Inscription au Mutoto Bike Challenge"""
-    current_event = MutotoBikeChallenge.objects.filter(
+    current_event = MutotoBikeChallenge.objects.with_participant_stats().filter(
         is_active=True,
         date__gte=timezone.now()
-    ).first()
+    ).order_by('date').first()
     
     if not current_event:
         messages.error(request, "Aucun événement ouvert aux inscriptions actuellement.")
@@ -171,8 +207,20 @@ def mbc_registration(request):
         form = MBCRegistrationForm(request.POST)
         if form.is_valid():
             participant = form.save(commit=False)
-            participant.event = current_event
-            participant.save()
+            with transaction.atomic():
+                if not current_event.register_participant(participant):
+                    messages.error(request, "Désolé, cet événement est complet.")
+                    return redirect('main:mutoto_bike_challenge')
+                queue_email(
+                    f"Inscription au {current_event.name}",
+                    f"Bonjour {participant.participant_name},\n\n"
+                    f"Votre inscription au {current_event.name} est enregistrée.\n"
+                    f"Date : {timezone.localtime(current_event.date).strftime('%d/%m/%Y %H:%M')}\n"
+                    f"Lieu : {current_event.location}\n\n"
+                    "Nous vous contacterons pour confirmer votre participation.\n\n"
+                    "L'équipe AIME",
+                    participant.participant_email,
+                )
             messages.success(
                 request, 
                 f"Inscription réussie pour {participant.participant_name}! "
@@ -194,18 +242,48 @@ def events(request):
     events_list = Event.objects.filter(
         is_active=True,
         date__gte=timezone.now()
-    ).order_by('date')
+    )
     
-    paginator = Paginator(events_list, 12)
-    page_number = request.GET.get('page')
-    events = paginator.get_page(page_number)
+    paginator = CursorPaginator(events_list, ordering=('date', 'id'), per_page=12)
+    events = paginator.get_page(request.GET.get(CURSOR_PARAM))
     
     context = {
         'title': 'Événements',
         'events': events,
+        'upcoming_events': events,
     }
     return render(request, 'main/events.html', context)
 
+def search(request):
+    """Recherche plein texte sur les projets, événements et informations"""
+    query = request.GET.get('q', '').strip()[:200]
+    results = search_documents(query, limit=50) if query else []
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'query': query,
+            'results': [
+                {
+                    'type': document.model_label,
+                    'title': document.title,
+                    'snippet': document.snippet,
+                    'url': document.url,
+                }
+                for document in results
+            ],
+        })
+
+    for document in results:
+        document.type_label = SEARCH_LABELS.get(document.model_label, document.model_label)
+
+    context = {
+        'title': 'Recherche',
+        'query': query,
+        'results': results,
+    }
+    return render(request, 'main/search.html', context)
+
+@conditional_on(groups=('events',))
 def event_detail(request, slug):
     """Détail d'un événement"""
     event = get_object_or_404(Event, slug=slug, is_public=True)
@@ -311,6 +389,7 @@ def dashboard(request):
     return render(request, 'main/dashboard.html', context)
 
 
+@cache_page_for_anonymous(3600)
 def impact_theory(request):
     """Page Théorie du Changement"""
     context = {
@@ -319,6 +398,7 @@ def impact_theory(request):
     return render(request, 'main/impact_theory.html', context)
 
 
+@cache_page_for_anonymous(3600)
 def observatory(request):
     """Page Observatoire des Droits de l'Enfant"""
     context = {
@@ -327,6 +407,7 @@ def observatory(request):
     return render(request, 'main/observatory.html', context)
 
 
+@cache_page_for_anonymous(3600)
 def research_center(request):
     """Page Centre de Recherche & Innovation"""
     context = {
@@ -335,6 +416,7 @@ def research_center(request):
     return render(request, 'main/research_center.html', context)
 
 
+@cache_page_for_anonymous(3600)
 def manifesto(request):
     """Page Manifeste AIME"""
     context = {
@@ -352,51 +434,40 @@ def chat_notification(request):
         data = json.loads(request.body)
         user_message = data.get('message', '')
         conversation_history = data.get('history', '')
-        user_email = data.get('email', 'visiteur@site.com')
-        user_name = data.get('name', 'Visiteur')
-
-        # Créer ou récupérer une conversation
-        # Pour les utilisateurs non connectés, on utilise un utilisateur temporaire
-        try:
-            user = User.objects.get(email=user_email)
-        except User.DoesNotExist:
-            # Créer un utilisateur temporaire pour les visiteurs
-            user, created = User.objects.get_or_create(
-                username=f"visitor_{user_email.replace('@', '_').replace('.', '_')}",
-                defaults={
-                    'email': user_email,
-                    'first_name': user_name,
-                    'is_active': False  # Utilisateur temporaire
-                }
+        user_email = (data.get('email') or '').strip()
+        user_name = data.get('name') or 'Visiteur'
+        # Visiteur déjà connu de ce navigateur : identité lue dans le jeton, sans requête
+        visitor_id = read_identity_token(data.get('visitor_token') or '')
+
+        # Conversation, message et email de notification validés ensemble
+        with transaction.atomic():
+            conversation, chat_message = _record_chat_request(
+                request.user, visitor_id, user_email, user_name, user_message
             )
 
-        # Créer une nouvelle conversation si nécessaire
-        conversation, created = ChatConversation.objects.get_or_create(
-            user=user,
-            closed=False,
-            defaults={'staff': None}
-        )
-
-        # Sauvegarder le message de l'utilisateur
-        ChatMessage.objects.create(
-            conversation=conversation,
-            sender=user,
-            content=user_message,
-            is_assistant=False
-        )
+            # Notification par email (envoyée par send_outbox, hors de la requête)
+            send_chat_notification_email(
+                user_name=user_name,
+                user_email=user_email,
+                message=user_message,
+                conversation_history=conversation_history,
+                conversation_id=conversation.id
+            )
 
-        # Envoyer notification par email
-        send_chat_notification_email(
-            user_name=user_name,
-            user_email=user_email,
-            message=user_message,
-            conversation_history=conversation_history,
-            conversation_id=conversation.id
-        )
+        # Flux des réponses du staff pour ce visiteur (voir chat_events.py) :
+        # la conversation est celle de l'utilisateur connecté ou du jeton
+        # d'identité présenté, jamais une conversation retrouvée par email
+        stream_url = reverse('main:chat_stream') + '?' + urlencode({
+            'token': visitor_token(conversation.id),
+            'after': chat_message.id,
+        })
 
         return JsonResponse({
             'success': True,
-            'message': 'Notification envoyée avec succès'
+            'message': 'Notification envoyée avec succès',
+            'stream_url': stream_url,
+            # À renvoyer avec les messages suivants (conservé par le navigateur)
+            'visitor_token': identity_token(conversation.visitor_id) if conversation.visitor_id else None,
         })
 
     except Exception as e:
@@ -406,8 +477,83 @@ def chat_notification(request):
         }, status=500)
 
 
+def _create_chat_visitor(user_email, user_name):
+    """
+    Nouveau visiteur. Jamais retrouvé par email : l'email n'est pas une
+    preuve d'identité, seul le jeton d'identité du navigateur en est une
+    (sinon n'importe qui lirait la conversation d'un autre).
+    """
+    return ChatVisitor.objects.create(name=user_name[:100], email=user_email).pk
+
+
+def _record_chat_request(user, visitor_id, user_email, user_name, user_message):
+    """
+    Enregistre le message dans la conversation ouverte de l'utilisateur
+    connecté ou du visiteur du jeton d'identité ; sans jeton, nouveau
+    visiteur et nouvelle conversation. Visiteur connu : une lecture indexée
+    et une insertion, sans compte User ni profil.
+    """
+    if user.is_authenticated:
+        owner, sender = {'user': user}, user
+    else:
+        if visitor_id is None:
+            visitor_id = _create_chat_visitor(user_email, user_name)
+        owner, sender = {'visitor_id': visitor_id}, None
+
+    conversation = ChatConversation.objects.filter(closed=False, **owner).order_by('-id').first()
+    if conversation is None:
+        if sender is None and not ChatVisitor.objects.filter(pk=visitor_id).exists():
+            # Jeton d'un visiteur supprimé depuis
+            owner['visitor_id'] = _create_chat_visitor(user_email, user_name)
+        conversation = ChatConversation.objects.create(**owner)
+
+    # Sauvegarder le message
+    chat_message = ChatMessage.objects.create(
+        conversation=conversation,
+        sender=sender,
+        content=user_message,
+        is_assistant=False
+    )
+    return conversation, chat_message
+
+
+async def chat_stream(request):
+    """
+    Flux SSE des messages de chat : une conversation (jeton visiteur) ou
+    toutes les conversations (staff). Vue asynchrone : une connexion en
+    attente n'occupe pas de thread (voir chat_events.py).
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    token = request.GET.get('token')
+    if token:
+        conversation_id = read_visitor_token(token)
+        if conversation_id is None:
+            return HttpResponseForbidden('Jeton invalide')
+    else:
+        is_staff = await sync_to_async(lambda: request.user.is_authenticated and request.user.is_staff)()
+        if not is_staff:
+            return HttpResponseForbidden('Accès non autorisé')
+        conversation = request.GET.get('conversation', '')
+        conversation_id = int(conversation) if conversation.isdigit() else None
+
+    # Reprise après le dernier message reçu (EventSource renvoie Last-Event-ID)
+    after = request.headers.get('Last-Event-ID') or request.GET.get('after', '')
+    after_id = int(after) if after.isdigit() else None
+
+    max_seconds = STREAM_MAX_SECONDS if isinstance(request, ASGIRequest) else 0
+    response = StreamingHttpResponse(
+        message_stream(conversation_id, after_id, max_seconds),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # pas de mise en tampon par nginx
+    return response
+
+
 def send_chat_notification_email(user_name, user_email, message, conversation_history, conversation_id):
-    """Envoie une notification par email pour une demande d'assistance humaine"""
+    """Met en file l'email de notification d'une demande d'assistance humaine (voir outbox.py)"""
     subject = f"🆘 AIDE REQUISE - Nouveau message chat de {user_name}"
 
     # Construire le corps de l'email
@@ -420,7 +566,7 @@ Un visiteur a demandé de l'assistance humaine via le chat en ligne.
 =====================================
 
 👤 Visiteur : {user_name}
-📧 Email : {user_email}
+📧 Email : {user_email or 'Non renseigné'}
 🆔 Conversation ID : {conversation_id}
 ⏰ Date/Heure : {timezone.now().strftime('%d/%m/%Y %H:%M')}
 
@@ -434,25 +580,49 @@ Un visiteur a demandé de l'assistance humaine via le chat en ligne.
 1. Connectez-vous au panneau d'administration
 2. Accédez à la section "Chat Conversations"
 3. Répondez à la conversation #{conversation_id}
-4. Ou contactez directement le visiteur à : {user_email}
+4. Ou contactez directement le visiteur à : {user_email or 'email non communiqué'}
 
 Cordialement,
 🤖 Assistant AIME
 Site Web : https://aime-rdc.org
     """
 
-    try:
-        # Envoyer l'email
-        send_mail(
-            subject=subject,
-            message=body,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=['contact@aime-rdc.org'],  # Email fourni par l'utilisateur
-            fail_silently=False
-        )
-        print(f"✅ Email de notification envoyé pour la conversation #{conversation_id}")
-    except Exception as e:
-        print(f"❌ Erreur lors de l'envoi de l'email : {e}")
+    queue_email(subject, body, settings.CONTACT_EMAIL, reply_to=user_email)
+
+
+def _visitor_messages(visitor_id):
+    """Messages écrits par le visiteur (visitor_id : OuterRef ou F vers ChatConversation.user_id)"""
+    return ChatMessage.objects.filter(is_assistant=False).filter(
+        Q(sender__isnull=True) | Q(sender_id=visitor_id)
+    )
+
+
+def _chat_inbox():
+    """
+    Conversations ouvertes annotées pour la boîte de réception du staff :
+    dernier message (id, date, extrait) et nombre de messages non lus, en
+    sous-requêtes corrélées. Une page coûte une requête, quel que soit le
+    nombre de conversations ouvertes.
+    """
+    messages_of = ChatMessage.objects.filter(conversation=OuterRef('pk'))
+    last_message = messages_of.order_by('-timestamp', '-id')
+    return ChatConversation.objects.filter(closed=False).select_related('user', 'visitor', 'staff').annotate(
+        last_message_id=Subquery(last_message.values('id')[:1]),
+        last_message_at=Subquery(last_message.values('timestamp')[:1]),
+        last_message_snippet=Subquery(
+            last_message.annotate(snippet=Substr('content', 1, CHAT_SNIPPET_LENGTH)).values('snippet')[:1]
+        ),
+        last_message_is_assistant=Subquery(last_message.values('is_assistant')[:1]),
+        message_count=aggregate_subquery(messages_of, 'COUNT'),
+        unread_count=aggregate_subquery(
+            _visitor_messages(OuterRef('user_id')).filter(
+                conversation=OuterRef('pk'),
+                id__gt=Coalesce(OuterRef('staff_last_read_message_id'), 0),
+            ),
+            'COUNT',
+        ),
+        has_visitor_messages=Exists(messages_of.filter(is_assistant=False)),
+    )
 
 
 @login_required
@@ -462,25 +632,41 @@ def chat_admin(request):
         messages.error(request, "Accès réservé au personnel autorisé.")
         return redirect('main:home')
 
-    # Conversations actives
-    active_conversations = ChatConversation.objects.filter(
-        closed=False
-    ).select_related('user', 'staff').order_by('-created_at')
-
-    # Messages récents
-    recent_messages = ChatMessage.objects.filter(
-        conversation__closed=False
-    ).select_related('conversation', 'sender').order_by('-timestamp')[:20]
+    # Conversations actives, par pages (pagination par curseur, index closed/created_at)
+    paginator = CursorPaginator(_chat_inbox(), ordering=('-created_at', '-id'), per_page=CHAT_ADMIN_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
 
+    # Statistiques : nombre de requêtes fixe
+    unread_messages = _visitor_messages(F('conversation__user_id')).filter(
+        conversation__closed=False,
+        id__gt=Coalesce(F('conversation__staff_last_read_message_id'), 0),
+    )
     context = {
         'title': 'Administration Chat',
-        'active_conversations': active_conversations,
-        'recent_messages': recent_messages,
+        'active_conversations': page_obj,
+        'page_obj': page_obj,
+        'active_count': ChatConversation.objects.filter(closed=False).count(),
+        'total_conversations': ChatConversation.objects.count(),
+        'unread_count': unread_messages.count(),
+        # Le flux SSE de la page reprend après le dernier message affiché
+        'stream_after': ChatMessage.objects.aggregate(last=Max('id'))['last'] or 0,
     }
 
     return render(request, 'main/chat_admin.html', context)
 
 
+@login_required
+@require_POST
+def mark_conversation_read(request, conversation_id):
+    """Marquer les messages d'une conversation comme lus par le staff"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Accès non autorisé'})
+
+    last_id = ChatMessage.objects.filter(conversation_id=conversation_id).aggregate(last=Max('id'))['last']
+    ChatConversation.objects.filter(id=conversation_id).update(staff_last_read_message_id=last_id)
+    return JsonResponse({'success': True, 'last_read': last_id})
+
+
 @login_required
 @require_POST
 def chat_reply(request, conversation_id):
@@ -496,17 +682,22 @@ def chat_reply(request, conversation_id):
             return JsonResponse({'success': False, 'error': 'Message vide'})
 
         # Créer le message du staff
-        ChatMessage.objects.create(
+        reply = ChatMessage.objects.create(
             conversation=conversation,
             sender=request.user,
             content=message_content,
             is_assistant=False
         )
 
+        # Répondre vaut lecture des messages précédents
+        update_fields = ['staff_last_read_message_id']
+        conversation.staff_last_read_message_id = reply.pk
+
         # Assigner le staff à la conversation si pas encore fait
         if not conversation.staff:
             conversation.staff = request.user
-            conversation.save()
+            update_fields.append('staff')
+        conversation.save(update_fields=update_fields)
 
         return JsonResponse({
             'success': True,
@@ -561,13 +752,13 @@ def submit_visitor_feedback(request):
                 feedback.ip_address = request.META.get('REMOTE_ADDR')
             
             feedback.user_agent = request.META.get('HTTP_USER_AGENT', '')
-            feedback.save()
             
-            # Envoyer une notification par email à l'équipe (optionnel)
-            try:
-                send_mail(
-                    subject=f'Nouvel avis visiteur - {feedback.get_contribution_type_display()}',
-                    message=f'''
+            # Avis et notification de l'équipe validés ensemble (email envoyé par send_outbox)
+            with transaction.atomic():
+                feedback.save()
+                queue_email(
+                    f'Nouvel avis visiteur - {feedback.get_contribution_type_display()}',
+                    f'''
                     Nouvel avis reçu !
                     
                     Nom: {feedback.name or 'Non renseigné'}
@@ -582,12 +773,9 @@ def submit_visitor_feedback(request):
                     Détails:
                     {feedback.contribution_details or 'Aucun détail supplémentaire'}
                     ''',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[settings.CONTACT_EMAIL] if hasattr(settings, 'CONTACT_EMAIL') else ['contact@aime-rdc.org'],
-                    fail_silently=True,
+                    settings.CONTACT_EMAIL,
+                    reply_to=feedback.email or '',
                 )
-            except Exception as e:
-                print(f"Erreur lors de l'envoi de l'email de notification: {e}")
             
             return JsonResponse({
                 'success': True,
@@ -602,6 +790,7 @@ def submit_visitor_feedback(request):
     return JsonResponse({'success': False, 'error': 'Méthode non autorisée'}, status=405)
 
 
+@cache_page_for_anonymous(3600, groups=('msa',))
 def mutoto_science_adventure(request):
     """Page principale de Mutoto Science Adventure (MSA)"""
     # Récupérer toutes les activités scientifiques actives
@@ -632,6 +821,7 @@ def mutoto_science_adventure(request):
     return render(request, 'main/msa.html', context)
 
 
+@cache_page_for_anonymous(3600)
 def mon_beau_metier(request):
     """Page principale de Mon Beau Métier - Valorisation des métiers étudiants"""
     # Récupérer les statistiques du projet